@@ -0,0 +1,212 @@
+# 生日提醒系统 - 基准测试
+# 项目在https://github.com/inkcoo/birthdays_reminder开源免费
+#
+# 用 gen_roster.py 生成不同规模的合成生日列表，分别测量各热点路径的耗时:
+#     read_birthdays            解析整个生日文件
+#     is_birthday_today         逐条判断今天是否生日
+#     calculate_age             逐条计算年龄
+#     format_birthday_display   逐条生成显示文字
+#     build_email               把全部记录渲染为一封 HTML 提醒邮件
+#     calendar_compile          编译全年生日日历（不读写日历文件）
+#     calendar_on               在生日日历中查询全年每一天
+#     scan_today                只扫描今天生日的候选行（today_scan.scan_today）
+# 结果保存为 JSON，并与保存的基线比较，耗时超出基线一定比例、且多出的耗时超过 --min-ms 即视为性能退化（退出代码为1）。
+# 基线只对生成它的机器有效：仓库中的 baseline.json 是在开发机上生成的，不作为 CI 的检查标准。
+# 运行平台或 Python 版本与基线不同时只列出比较结果，不判定退化；在自己的机器上先用 --update-baseline 生成基线。
+#
+# 用法（在仓库根目录）:
+#     python benchmarks/bench.py                          # 1k、10k、100k，与基线比较
+#     python benchmarks/bench.py --sizes 1M,10M --repeat 1
+#     python benchmarks/bench.py --update-baseline        # 把本次结果保存为基线
+# 1000 万行需要数 GB 内存（全部记录都读入内存）。
+import os  # 用于处理路径
+import sys  # 用于导入仓库中的模块
+import json  # 用于保存结果
+import gc  # 计时期间暂停垃圾回收
+import time  # 用于计时
+import argparse  # 用于解析命令行参数
+import platform  # 用于记录运行环境
+import tempfile  # 用于存放生成的生日列表
+from datetime import date, datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import run_log  # noqa: E402
+import birthday_engine  # noqa: E402
+from birthday_core import RunClock, read_birthdays  # noqa: E402
+from birthday_calendar import load_calendar  # noqa: E402
+from today_scan import scan_today  # noqa: E402
+from gen_roster import parse_count, write_roster  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, 'last_run.json')
+RUN_DATE = date(2025, 10, 18)  # 固定运行日期，保证每次命中的生日人数相同
+
+
+def best_of(function, repeat):
+    """运行 repeat 次，返回 (最短耗时秒数, 最后一次的返回值)；与 timeit 一样，计时期间暂停垃圾回收"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        result = None  # 先释放上一次的结果
+        gc.collect()
+        gc.disable()
+        try:
+            started = time.perf_counter()
+            result = function()
+            elapsed = time.perf_counter() - started
+        finally:
+            gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def bench_size(count, repeat, seed):
+    """
+    生成 count 行的生日列表并测量各项耗时
+
+    返回:
+        {指标名: {'seconds': 秒数, 'items': 处理条数, 'per_item_us': 每条微秒数}}
+    """
+    clock = RunClock(RUN_DATE)
+    results = {}
+
+    def record(metric, seconds, items):
+        results[metric] = {'seconds': round(seconds, 6), 'items': items,
+                           'per_item_us': round(seconds / max(items, 1) * 1e6, 4)}
+
+    with tempfile.TemporaryDirectory() as workdir:
+        filename = os.path.join(workdir, 'birthdays.txt')
+        write_roster(filename, count, seed)
+
+        seconds, birthdays = best_of(lambda: read_birthdays(filename, errors=[]), repeat)
+        record('read_birthdays', seconds, count)
+
+        seconds, _ = best_of(lambda: [b for b in birthdays if birthday_engine.is_birthday_today(b, clock)], repeat)
+        record('is_birthday_today', seconds, len(birthdays))
+
+        seconds, _ = best_of(lambda: [birthday_engine.calculate_age(b, clock) for b in birthdays], repeat)
+        record('calculate_age', seconds, len(birthdays))
+
+        seconds, _ = best_of(lambda: [birthday_engine.format_birthday_display(b, clock) for b in birthdays],
+                             repeat)
+        record('format_birthday_display', seconds, len(birthdays))
+
+        seconds, _ = best_of(lambda: birthday_engine.build_email(birthdays, clock), repeat)
+        record('build_email', seconds, len(birthdays))
+
+        seconds, calendar = best_of(lambda: load_calendar(filename, RUN_DATE.year, errors=[], use_cache=False),
+                                    repeat)
+        record('calendar_compile', seconds, count)
+
+        days = [date(RUN_DATE.year, 1, 1) + timedelta(days=i) for i in range(365)]
+        seconds, _ = best_of(lambda: [calendar.on(day) for day in days], repeat)
+        record('calendar_on', seconds, len(days))
+
+        seconds, _ = best_of(lambda: scan_today(filename, clock), repeat)
+        record('scan_today', seconds, count)
+    return results
+
+
+def compare(results, baseline, threshold, min_seconds):
+    """
+    与基线比较
+
+    参数:
+        results / baseline: {规模: {指标名: {...}}}
+        threshold: 允许比基线慢的比例，如 0.5 表示慢 50% 以内不算退化
+        min_seconds: 与基线相差不足该秒数时不算退化（避免极短耗时的计时误差）
+
+    返回:
+        退化的 (规模, 指标名, 基线秒数, 本次秒数) 列表
+    """
+    regressions = []
+    print(f"\n{'规模':>10} {'指标':<26} {'基线':>12} {'本次':>12} {'变化':>8}")
+    for size, metrics in results.items():
+        for metric, current in metrics.items():
+            base = baseline.get(size, {}).get(metric)
+            if base is None:
+                continue
+            ratio = current['seconds'] / base['seconds'] if base['seconds'] else 1.0
+            regressed = ratio > 1 + threshold and current['seconds'] - base['seconds'] > min_seconds
+            mark = ' ✗' if regressed else ''
+            print(f"{size:>10} {metric:<26} {base['seconds'] * 1000:>10.2f}ms "
+                  f"{current['seconds'] * 1000:>10.2f}ms {(ratio - 1) * 100:>+7.1f}%{mark}")
+            if regressed:
+                regressions.append((size, metric, base['seconds'], current['seconds']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生日提醒热点路径基准测试")
+    parser.add_argument('--sizes', default='1k,10k,100k',
+                        help="逗号分隔的生日列表行数，支持 k / M 后缀，默认 1k,10k,100k")
+    parser.add_argument('--repeat', type=int, default=5, help="每项重复次数，取最小值，默认5")
+    parser.add_argument('--seed', type=int, default=2025, help="生成生日列表的随机种子，默认2025")
+    parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT,
+                        help="结果 JSON 文件，默认 benchmarks/last_run.json")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="基线 JSON 文件，默认 benchmarks/baseline.json")
+    parser.add_argument('--update-baseline', action='store_true', help="把本次结果保存为基线（不做比较）")
+    parser.add_argument('--threshold', type=float, default=0.5,
+                        help="比基线慢多少比例算性能退化，默认0.5（50%%，共享的 CI 机器上计时波动较大）")
+    parser.add_argument('--min-ms', type=float, default=50.0,
+                        help="与基线相差不足该毫秒数时不算退化，默认50（百毫秒以内的指标计时波动可达一倍）")
+    args = parser.parse_args()
+    sizes = [parse_count(size) for size in args.sizes.split(',') if size.strip()]
+
+    # 合成数据中有格式不正确的行，计时期间不输出这些提示
+    with open(os.devnull, 'w', encoding='utf-8') as devnull:
+        run_log.configure(run_log.QUIET, stream=devnull)
+        results = {}
+        for count in sizes:
+            print(f"生日列表 {count} 行...", flush=True)
+            results[str(count)] = bench_size(count, args.repeat, args.seed)
+            for metric, value in results[str(count)].items():
+                print(f"    {metric:<26} {value['seconds'] * 1000:>10.2f}ms {value['per_item_us']:>10.3f}µs/条")
+        run_log.get_log().flush()
+        run_log.configure()
+
+    report = {
+        'meta': {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'repeat': args.repeat,
+            'run_date': RUN_DATE.isoformat(),
+        },
+        'results': results,
+    }
+    target = args.baseline if args.update_baseline else args.output
+    with open(target, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+        file.write('\n')
+    print(f"结果已保存: {target}")
+    if args.update_baseline:
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"没有基线文件 {args.baseline}，用 --update-baseline 生成")
+        return 0
+    with open(args.baseline, 'r', encoding='utf-8') as file:
+        baseline = json.load(file)
+    base_meta = baseline.get('meta', {})
+    fields = ('python', 'implementation', 'platform', 'seed')
+    same_machine = all(base_meta.get(field) == report['meta'][field] for field in fields)
+    regressions = compare(results, baseline.get('results', {}), args.threshold, args.min_ms / 1000)
+    if not same_machine:
+        print(f"\n注意: 基线生成于另一运行环境 ({base_meta.get('platform')}, Python {base_meta.get('python')}, "
+              f"种子 {base_meta.get('seed')})，比较结果仅供参考，不判定退化；"
+              f"用 --update-baseline 在本机生成基线")
+        return 0
+    if regressions:
+        print(f"\n✗ {len(regressions)} 项比基线慢 {args.threshold:.0%} 以上")
+        return 1
+    print("\n✓ 没有发现性能退化")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+# 生日提醒系统 - 并行解析基准
+# 项目在https://github.com/inkcoo/birthdays_reminder开源免费
+#
+# 生成合成生日列表，分别用 1、2、4 … 个进程调用 parallel_load.read_roster()，
+# 报告耗时、加速比（相对列表中的第一项，默认即单进程逐行解析）和并行效率，
+# 并检查各次结果完全相同。
+#
+# 用法（在仓库根目录）:
+#     python benchmarks/bench_parallel_load.py                   # 100 万行，进程数最多到 CPU 核数
+#     python benchmarks/bench_parallel_load.py 5M --workers 1,2,4,8
+import os  # 用于处理路径和 CPU 核数
+import sys  # 用于导入仓库中的模块
+import time  # 用于计时
+import argparse  # 用于解析命令行参数
+import tempfile  # 用于存放生成的生日列表
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import run_log  # noqa: E402
+import parallel_load  # noqa: E402
+from gen_roster import parse_count, write_roster  # noqa: E402
+
+
+def snapshot(roster):
+    """名册的全部列，用于比较两次解析结果是否相同"""
+    return (bytes(roster._names), roster._name_offsets.tobytes(), roster.years.tobytes(),
+            roster.months.tobytes(), roster.days.tobytes(), bytes(roster._lunar_bits),
+            [roster.departments[i] for i in roster.department_ids],
+            roster.birth_years.tobytes(), roster.birth_md.tobytes())
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    default_workers = sorted({1, 2, 4, 8, cpus} & set(range(1, cpus + 1)))
+    parser = argparse.ArgumentParser(description="并行解析基准")
+    parser.add_argument('count', nargs='?', type=parse_count, default=parse_count('1M'),
+                        help="生日列表行数，支持 k / M 后缀，默认 1M")
+    parser.add_argument('--workers', default=','.join(map(str, default_workers)),
+                        help=f"逗号分隔的进程数，默认 {','.join(map(str, default_workers))}")
+    args = parser.parse_args()
+    worker_counts = [int(value) for value in args.workers.split(',') if value.strip()]
+
+    parallel_load.MIN_BYTES_PER_WORKER = 1  # 基准中强制按指定进程数并行
+    with tempfile.TemporaryDirectory() as workdir, open(os.devnull, 'w', encoding='utf-8') as devnull:
+        run_log.configure(run_log.QUIET, stream=devnull)
+        filename = os.path.join(workdir, 'birthdays.txt')
+        write_roster(filename, args.count)
+        print(f"生日列表 {args.count} 行, {os.path.getsize(filename) / 1048576:.1f}MB, CPU 核数 {cpus}")
+        print(f"{'进程数':>6} {'耗时':>10} {'加速比':>8} {'并行效率':>8}")
+
+        baseline = expected = None
+        for workers in worker_counts:
+            errors = []
+            started = time.perf_counter()
+            if workers == 1:
+                roster = parallel_load.RosterColumns.from_file(filename, errors)
+            else:
+                roster = parallel_load.read_roster(filename, errors, workers)
+            elapsed = time.perf_counter() - started
+            result = (snapshot(roster), errors)
+            if expected is None:
+                expected = result
+            elif result != expected:
+                raise SystemExit(f"✗ {workers} 个进程的解析结果与逐行解析不同")
+            baseline = baseline or elapsed
+            speedup = baseline / elapsed
+            print(f"{workers:>6} {elapsed:>9.2f}秒 {speedup:>7.2f}x {speedup / workers:>8.0%}")
+        run_log.configure()
+    print("✓ 各次解析结果相同")
+
+
+if __name__ == "__main__":
+    main()
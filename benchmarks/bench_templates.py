@@ -0,0 +1,73 @@
+# 生日提醒系统 - 邮件模板渲染基准
+# 项目在https://github.com/inkcoo/birthdays_reminder开源免费
+#
+# 比较两种生成名单 HTML 的方式:
+#     字符串累加   原来的 birthday_list_html += f"<li>...</li>"（这里补上了同样的 HTML 转义）
+#     模板拼接     mail_template 预先解析模板，逐项产生片段后一次 join
+# 并测量 build_digest_email() 生成 1 千 / 1 万 / 10 万人摘要邮件的完整耗时，
+# 每人耗时应基本不随人数增长（线性）。
+#
+# 用法（在仓库根目录）:
+#     python benchmarks/bench_templates.py
+import os  # 用于处理路径
+import sys  # 用于导入仓库中的模块
+import time  # 用于计时
+from datetime import date, timedelta  # 用于构造测试数据
+from html import escape  # 与模板相同的转义
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from birthday_core import BirthdayRecord, RunClock  # noqa: E402
+from mail_template import MailTemplates  # noqa: E402
+import birthday_engine  # noqa: E402
+
+SIZES = [1000, 10000, 100000]
+
+
+def make_upcoming(count, today):
+    """生成 count 条摘要数据，分布在未来30天，姓名中带有需要转义的字符"""
+    upcoming = []
+    for i in range(count):
+        record = BirthdayRecord(f"成员<{i}>&", 1980 + i % 40, 1 + i % 12, 1 + i % 28,
+                                'a' if i % 3 else 'b', f"部门{i % 50}")
+        upcoming.append((today + timedelta(days=i % 30), record))
+    upcoming.sort(key=lambda item: item[0])
+    return upcoming
+
+
+def concat_list(names):
+    """原来的做法：逐项 += 累加字符串"""
+    birthday_list_html = ""
+    for name in names:
+        birthday_list_html += f"<li>心助会- {escape(name)}</li>"
+    return birthday_list_html
+
+
+def best_of(function, repeat=5):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    templates = MailTemplates()
+    clock = RunClock(date(2025, 1, 1))
+    print(f"{'人数':>8} {'字符串累加':>12} {'模板拼接':>12} {'完整摘要邮件':>14} {'每人':>10}")
+    for count in SIZES:
+        upcoming = make_upcoming(count, clock.today)
+        names = [birthday_engine.format_birthday_display(record, clock) for _, record in upcoming]
+        rows = [{'name': name} for name in names]
+
+        concat = best_of(lambda: concat_list(names))
+        rendered = best_of(lambda: templates.render_each('list_item.html', rows))
+        digest = best_of(lambda: birthday_engine.build_digest_email(upcoming, clock, 30), repeat=3)
+        print(f"{count:>8} {concat * 1000:>10.2f}ms {rendered * 1000:>10.2f}ms "
+              f"{digest * 1000:>12.2f}ms {digest / count * 1e6:>8.2f}µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+# 生日提醒系统 - 增量重新加载一致性检查
+# 项目在https://github.com/inkcoo/birthdays_reminder开源免费
+#
+# 用 gen_roster.py 生成合成生日列表并用 BirthdayEngine 加载（生日日历、整个名册和若干天的缓存结果），
+# 然后多轮随机修改生日文件（新增、删除、修改日期、只改写法、加入格式不正确的行），
+# 每轮调用 BirthdayEngine.refresh() 增量更新，检查:
+#   1. 返回的变化（新增、删除、修改人数）与实际的修改相同；
+#   2. 两年中每一天的查询结果（今年由生日日历查出，另一年由名册查出）、近期生日、每人的年龄和各部门的成员
+#      与重新完整加载的结果相同（同一天、同一部门内的顺序可以不同）；
+#   3. 先加载名册、修改文件再加载生日日历（或反过来）后，refresh() 的结果也与完整重新加载相同。
+# 任何一项不通过即退出代码为1。最后报告修改一行时增量更新与完整重新加载的耗时。
+#
+# 用法（在仓库根目录）:
+#     python benchmarks/check_reload.py                      # 2 万行，10 轮
+#     python benchmarks/check_reload.py 1M --rounds 3
+import os  # 用于处理路径
+import sys  # 用于导入仓库中的模块
+import time  # 用于计时
+import random  # 用于随机修改生日文件
+import argparse  # 用于解析命令行参数
+from collections import Counter
+from datetime import date, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from birthday_core import format_birthday_line, parse_birthday_line  # noqa: E402
+from birthday_engine import BirthdayEngine, beijing_today  # noqa: E402
+from gen_roster import generate_lines, parse_count  # noqa: E402
+from checks import check, report, scratch_dir  # noqa: E402
+
+YEAR = beijing_today().year  # 今年的查询使用生日日历，refresh() 由它得出变化
+OTHER_YEAR = 2024 if YEAR != 2024 else 2028  # 另一年（闰年）的查询直接在名册中查找
+
+
+def write_lines(path, lines):
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write('\n'.join(lines) + '\n')
+
+
+def edit(lines, rng, serial):
+    """
+    随机修改生日列表
+
+    返回:
+        (新的各行, 预期的 (新增, 删除, 修改) 人数)
+    """
+    lines = list(lines)
+    valid = [i for i, line in enumerate(lines) if parse_birthday_line(line) is not None]
+    names = Counter(parse_birthday_line(lines[i]).name for i in valid)
+    unique = [i for i in valid if names[parse_birthday_line(lines[i]).name] == 1]
+    picked = rng.sample(unique, 6)
+    added = rng.randint(0, 3)
+    removed = rng.randint(0, 2)
+    changed = rng.randint(0, 2)
+
+    for i in picked[:changed]:  # 修改生日日期
+        record = parse_birthday_line(lines[i])
+        day = 1 + record.day % 28
+        lines[i] = format_birthday_line(record._replace(day=day))
+    for i in picked[2:3]:  # 只改写法（月、日不带前导零），不算修改
+        lines[i] = format_birthday_line(parse_birthday_line(lines[i]))
+    for i in sorted(picked[3:3 + removed], reverse=True):
+        del lines[i]
+    for n in range(added):
+        month, day = rng.randint(1, 12), rng.randint(1, 28)
+        lines.insert(rng.randrange(len(lines)), f"新成员{serial}-{n}-1990-{month:02d}-{day:02d}-{rng.choice('ab')}")
+    lines.insert(rng.randrange(len(lines)), f"格式错误{serial}-13-45")
+    return lines, (added, removed, changed)
+
+
+def snapshot(engine):
+    """两年中每一天的结果（不计同一天的顺序）、一年内的近期生日、(记录, 年龄) 的多重集和各部门的成员"""
+    days = {}
+    for year in (YEAR, OTHER_YEAR):
+        day = date(year, 1, 1)
+        while day.year == year:
+            days[day] = Counter(engine.on(day))
+            day += timedelta(days=1)
+    upcoming = Counter(engine.upcoming(366, date(YEAR, 1, 1)))
+    ages = Counter(zip(engine.roster().records(), map(int, engine.ages(date(YEAR, 6, 1)))))
+    departments = {record.department for record in engine.roster().records()}
+    members = {name: Counter(engine.department(name)) for name in departments}
+    return days, upcoming, ages, members
+
+
+def load(path):
+    engine = BirthdayEngine(path, use_cache=False)
+    engine.on(date(YEAR, 10, 18))
+    engine.department(None)  # 构建部门索引（同时加载整个名册）
+    return engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检查增量重新加载与完整重新加载的结果是否相同")
+    parser.add_argument('count', nargs='?', type=parse_count, default=parse_count('20k'),
+                        help="生日列表行数，支持 k / M 后缀，默认 20k")
+    parser.add_argument('--rounds', type=int, default=10, help="随机修改的轮数，默认 10")
+    parser.add_argument('--seed', type=int, default=2025, help="随机种子，默认 2025")
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    ok = True
+    with scratch_dir() as workdir:
+        path = os.path.join(workdir, 'birthdays.txt')
+        lines = list(generate_lines(args.count, args.seed))
+        write_lines(path, lines)
+        engine = load(path)
+        for day in range(1, 31):  # 缓存两年中一些天的结果
+            engine.on(date(YEAR, 10, day))
+            engine.on(date(OTHER_YEAR, 2, day % 29 + 1))
+
+        for serial in range(args.rounds):
+            lines, expected = edit(lines, rng, serial)
+            write_lines(path, lines)
+            delta = engine.refresh()
+            found = (len(delta.added), len(delta.removed), len(delta.changed)) if delta else None
+            ok &= check(found == expected, f"第{serial + 1}轮: {delta}")
+            ok &= check(snapshot(engine) == snapshot(load(path)), f"第{serial + 1}轮: 查询结果与完整重新加载相同")
+
+        # 名册和生日日历在文件修改前后分别加载
+        for first, second in (('名册', '日历'), ('日历', '名册')):
+            engine = BirthdayEngine(path, use_cache=False)
+            loaders = {'名册': engine.roster, '日历': lambda: engine.on(date(YEAR, 10, 18))}
+            loaders[first]()
+            lines.append(f"先加载{first}-1990-10-18-a-测试部")
+            write_lines(path, lines)
+            loaders[second]()
+            engine.refresh()
+            ok &= check(snapshot(engine) == snapshot(load(path)), f"先加载{first}、修改后加载{second}: 查询结果与完整重新加载相同")
+
+        # 修改一行的耗时
+        i = next(i for i, line in enumerate(lines) if parse_birthday_line(line) is not None)
+        record = parse_birthday_line(lines[i])
+        lines[i] = format_birthday_line(record._replace(day=1 + record.day % 28))
+        write_lines(path, lines)
+        started = time.perf_counter()
+        delta = engine.refresh()
+        refresh_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        load(path)
+        load_seconds = time.perf_counter() - started
+        ok &= check(len(delta.changed) == 1, f"修改一行: {delta}")
+
+    print(f"生日列表 {args.count} 行，修改一行: 增量更新 {refresh_seconds * 1000:.1f} 毫秒，"
+          f"完整重新加载 {load_seconds * 1000:.1f} 毫秒")
+    return report(ok, "增量重新加载检查")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+# 生日提醒系统 - SQLite 生日数据库一致性检查
+# 项目在https://github.com/inkcoo/birthdays_reminder开源免费
+#
+# 用 gen_roster.py 生成合成生日列表并导入 roster_db.RosterDB，检查:
+#   1. 指定年份的每一天，RosterDB.on() 与完整解析后查找（find_birthdays）的结果和顺序相同；
+#   2. 若干起始日的近期生日查询，RosterDB.upcoming() 与 RosterColumns.upcoming() 相同；
+#   3. 每日查询和近期生日查询都使用 (calendar_type, month, day) 索引，按部门查询使用 department 索引；
+#   4. 导出的生日文件重新解析后与原文件的记录相同；增加、删除一人后查询结果随之变化。
+# 任何一项不通过即退出代码为1。最后报告导入耗时和数据库查找一天的平均耗时。
+#
+# 用法（在仓库根目录）:
+#     python benchmarks/check_roster_db.py                   # 2 万行，2023、2025 年每一天
+#     python benchmarks/check_roster_db.py 1M --years 2025
+import os  # 用于处理路径
+import sys  # 用于导入仓库中的模块
+import time  # 用于计时
+import argparse  # 用于解析命令行参数
+from datetime import date, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from birthday_core import BirthdayRecord, RunClock, build_birthday_index, find_birthdays, read_birthdays  # noqa: E402
+from roster_db import RosterDB, _match_keys  # noqa: E402
+from roster_store import RosterColumns  # noqa: E402
+from today_scan import today_targets  # noqa: E402
+from gen_roster import generate_lines, parse_count  # noqa: E402
+from checks import check, report, scratch_dir  # noqa: E402
+
+
+def uses_index(database, where, params, index):
+    """查询计划中是否使用了指定的索引"""
+    plan = database._db.execute(f"EXPLAIN QUERY PLAN SELECT * FROM people WHERE {where}", params).fetchall()
+    return any(index in row[-1] for row in plan)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检查 SQLite 生日数据库与完整解析的结果是否相同")
+    parser.add_argument('count', nargs='?', type=parse_count, default=parse_count('20k'),
+                        help="生日列表行数，支持 k / M 后缀，默认 20k")
+    parser.add_argument('--years', default='2023,2025', help="逗号分隔的公历年份，检查其中每一天，默认 2023,2025")
+    parser.add_argument('--seed', type=int, default=2025, help="随机种子，默认 2025")
+    args = parser.parse_args()
+    years = [int(year) for year in args.years.split(',') if year.strip()]
+
+    ok = True
+    with scratch_dir() as workdir:
+        source = os.path.join(workdir, 'birthdays.txt')
+        with open(source, 'w', encoding='utf-8') as file:
+            file.writelines(line + '\n' for line in generate_lines(args.count, args.seed))
+        records = read_birthdays(source)
+        index = build_birthday_index(records)
+
+        database = RosterDB(os.path.join(workdir, 'birthdays.db'))
+        started = time.perf_counter()
+        imported = database.import_file(source)
+        import_seconds = time.perf_counter() - started
+        ok &= check(imported == len(records) == len(database), f"导入 {imported} 条记录")
+
+        # 1. 每一天的查询结果
+        mismatched = checked = 0
+        db_seconds = 0.0
+        for year in years:
+            day = date(year, 1, 1)
+            while day.year == year:
+                clock = RunClock(day)
+                started = time.perf_counter()
+                found = database.on(day)
+                db_seconds += time.perf_counter() - started
+                mismatched += found != find_birthdays(index, clock)
+                checked += 1
+                day += timedelta(days=1)
+        ok &= check(not mismatched, f"{checked} 天的每日查询与完整解析相同" + (f"（{mismatched} 天不同）" if mismatched else ''))
+
+        # 2. 近期生日查询
+        roster = RosterColumns.from_records(records)
+        starts = [date(year, month, 1) for year in years for month in (1, 2, 6, 12)]
+        windows = (1, 7, 30, 400)
+        mismatched = sum(database.upcoming(start, days) != roster.upcoming(start, days)
+                         for start in starts for days in windows)
+        ok &= check(not mismatched, f"{len(starts) * len(windows)} 次近期生日查询与列式名册相同")
+
+        # 3. 查询计划
+        today = RunClock(date(years[0], 10, 18))
+        where, params = _match_keys(today_targets(today))
+        ok &= check(uses_index(database, where, params, 'people_date'), "每日查询使用日期索引")
+        year_keys = set()
+        for offset in range(366):
+            year_keys.update(today_targets(RunClock(today.today + timedelta(days=offset))))
+        where, params = _match_keys(year_keys)
+        ok &= check(uses_index(database, where, params, 'people_date'), "一年的近期生日查询使用日期索引")
+        ok &= check(uses_index(database, "department = ?", ('技术部',), 'people_department'), "按部门查询使用部门索引")
+        department = next((record.department for record in records if record.department), None)
+        ok &= check(database.department(department) == [record for record in records
+                                                          if record.department == department],
+                    f"按部门查询 {department}")
+
+        # 4. 导出与增删
+        exported = os.path.join(workdir, 'exported.txt')
+        ok &= check(database.export_file(exported) == len(records) and read_birthdays(exported) == records,
+                    "导出后重新解析与原文件相同")
+        day = date(years[0], 10, 18)
+        before = database.on(day)
+        person = BirthdayRecord('测试-新人', 1990, day.month, day.day, 'a', '测试部')
+        row = database.add(person)
+        solar = [record for record in before if record.calendar_type == 'a']
+        lunar = [record for record in before if record.calendar_type == 'b']
+        ok &= check(database.on(day) == solar + [person] + lunar, "增加一人后当天查询包含此人")
+        ok &= check(database.remove([row]) == 1 and database.on(day) == before, "删除后恢复原样")
+        database.close()
+
+    print(f"导入 {imported} 条: {import_seconds:.2f} 秒；"
+          f"查找一天: 数据库 {db_seconds / max(checked, 1) * 1000:.2f} 毫秒")
+    return report(ok, "生日数据库检查")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+# 生日提醒系统 - 快速扫描一致性检查
+# 项目在https://github.com/inkcoo/birthdays_reminder开源免费
+#
+# 用 gen_roster.py 生成合成生日列表（部分行改为不带前导零的月、日，并另存一份 \r\n 换行的副本），
+# 对指定年份的每一天比较 today_scan.scan_today() 与完整解析后查找的结果，
+# 任何一天不同即退出代码为1。最后报告两种方式查找一天的耗时。
+#
+# 用法（在仓库根目录）:
+#     python benchmarks/check_scan.py                        # 2 万行，2023、2025 年每一天
+#     python benchmarks/check_scan.py 100k --years 2024 --seeds 1,2,3
+import os  # 用于处理路径
+import re  # 用于去掉部分前导零
+import sys  # 用于导入仓库中的模块
+import time  # 用于计时
+import random  # 用于随机选择改写的行
+import argparse  # 用于解析命令行参数
+from datetime import date, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from birthday_core import RunClock, build_birthday_index, find_birthdays, read_birthdays  # noqa: E402
+from today_scan import scan_today  # noqa: E402
+from gen_roster import generate_lines, parse_count  # noqa: E402
+from checks import check, report, scratch_dir  # noqa: E402
+
+# 生日行中的“-月-日-类型”
+DATE_PART = re.compile(r'-0?(\d{1,2})-0?(\d{1,2})-([ab])')
+
+
+def write_variants(workdir, count, seed):
+    """
+    生成一份生日列表：约一半的行去掉月、日的前导零，另有少量空行和首尾空白；
+    同时写一份 \\r\\n 换行的副本
+
+    返回:
+        [(说明, 文件路径), ...]
+    """
+    rng = random.Random(seed)
+    lines = []
+    for line in generate_lines(count, seed):
+        if rng.random() < 0.5:
+            line = DATE_PART.sub(lambda m: f"-{int(m[1])}-{int(m[2])}-{m[3]}", line, count=1)
+        if rng.random() < 0.01:
+            line = f"  {line}\t"
+        lines.append(line)
+        if rng.random() < 0.005:
+            lines.append('')
+    files = []
+    for label, newline in (('\\n', '\n'), ('\\r\\n', '\r\n')):
+        path = os.path.join(workdir, f"birthdays-{seed}-{len(files)}.txt")
+        with open(path, 'w', encoding='utf-8', newline='') as file:
+            file.write(newline.join(lines) + newline)
+        files.append((f"种子 {seed}，{label} 换行", path))
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检查快速扫描与完整解析的结果是否相同")
+    parser.add_argument('count', nargs='?', type=parse_count, default=parse_count('20k'),
+                        help="生日列表行数，支持 k / M 后缀，默认 20k")
+    parser.add_argument('--years', default='2023,2025', help="逗号分隔的公历年份，检查其中每一天，默认 2023,2025")
+    parser.add_argument('--seeds', default='2025,7', help="逗号分隔的随机种子，默认 2025,7")
+    args = parser.parse_args()
+    years = [int(year) for year in args.years.split(',') if year.strip()]
+    seeds = [int(seed) for seed in args.seeds.split(',') if seed.strip()]
+
+    failures = 0
+    scan_seconds = full_seconds = 0.0
+    checked_days = 0
+    with scratch_dir() as workdir:
+        for seed in seeds:
+            for label, path in write_variants(workdir, args.count, seed):
+                started = time.perf_counter()
+                index = build_birthday_index(read_birthdays(path))
+                full_seconds += time.perf_counter() - started
+                mismatched = 0
+                for year in years:
+                    day = date(year, 1, 1)
+                    while day.year == year:
+                        clock = RunClock(day)
+                        expected = find_birthdays(index, clock)
+                        started = time.perf_counter()
+                        found = scan_today(path, clock)
+                        scan_seconds += time.perf_counter() - started
+                        checked_days += 1
+                        if found != expected:
+                            mismatched += 1
+                            if mismatched <= 3:
+                                print(f"✗ {label} {day}: 完整解析 {len(expected)} 人，快速扫描 {len(found)} 人")
+                        day += timedelta(days=1)
+                failures += mismatched
+                check(not mismatched, f"{label}: {len(years)} 年中 {mismatched} 天结果不同")
+
+    files = len(seeds) * 2
+    print(f"\n生日列表 {args.count} 行：完整解析平均 {full_seconds / files * 1000:.1f}ms，"
+          f"快速扫描一天平均 {scan_seconds / checked_days * 1000:.2f}ms")
+    if failures:
+        print(f"✗ 共 {failures} 天结果不同")
+    return report(not failures, "快速扫描与完整解析一致性检查")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+# 生日提醒系统 - 发送队列检查（使用本地模拟的 SMTP 服务器）
+# 项目在https://github.com/inkcoo/birthdays_reminder开源免费
+#
+# 在本机启动一个最小的 SMTP 服务器（只在内存中收下邮件，可设置为拒绝发送），检查:
+#   1. 同一封邮件重复入队只保留一封；
+#   2. 服务器拒绝时按退避时间安排重试，尝试次数达到上限后移入死信；
+#   3. 死信放回队列、服务器恢复后全部投递成功，并写入发送记录；
+#   4. 发送记录中已有的邮件再次入队时不会重复投递。
+# 检查不通过时退出代码为1。
+#
+# 用法（在仓库根目录）:
+#     python benchmarks/check_spool.py
+import os  # 用于处理路径和环境变量
+import sys  # 用于导入仓库中的模块
+import threading  # 用于在后台运行 SMTP 服务器
+import socketserver  # 用于实现 SMTP 服务器
+from datetime import date
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from birthday_core import BirthdayRecord  # noqa: E402
+from delivery import Message  # noqa: E402
+from mail_spool import DEAD, PENDING, SENT, MailSpool  # noqa: E402
+from sent_ledger import SentLedger  # noqa: E402
+from checks import check, report, scratch_dir  # noqa: E402
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """只实现发送邮件需要的命令；server.reject 为True时对 DATA 返回 451"""
+
+    def reply(self, text):
+        self.wfile.write((text + '\r\n').encode('ascii'))
+
+    def handle(self):
+        self.reply('220 localhost')
+        in_data = False
+        lines = []
+        for raw in self.rfile:
+            line = raw.decode('utf-8', 'replace').rstrip('\r\n')
+            if in_data:
+                if line == '.':
+                    in_data = False
+                    self.server.received.append('\n'.join(lines))
+                    self.reply('250 queued')
+                else:
+                    lines.append(line)
+                continue
+            command = line[:4].upper()
+            if command == 'EHLO':
+                self.reply('250 localhost')
+            elif command == 'DATA':
+                if self.server.reject:
+                    self.reply('451 try again later')
+                else:
+                    in_data, lines = True, []
+                    self.reply('354 go ahead')
+            elif command == 'QUIT':
+                self.reply('221 bye')
+                return
+            else:
+                self.reply('250 ok')
+
+
+class SMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    reject = False
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+        self.received = []
+
+
+def main():
+    server = SMTPServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ.update(SMTP_HOST='127.0.0.1', SMTP_PORT=str(server.server_address[1]), SMTP_SECURITY='plain',
+                      SMTP_USER='sender@example.com', SMTP_PASSWORD='x', SMTP_CONNECTIONS='2')
+
+    day = date(2025, 10, 18)
+    people = [BirthdayRecord('张三', 1990, 10, 18, 'a', '技术部'), BirthdayRecord('李四', None, 8, 27, 'b', None)]
+    recipients = {'a@example.com': people, 'b@example.com': people[:1]}
+    messages = [Message(email, f"生日提醒 {len(items)}人", "<p>生日快乐</p>") for email, items in recipients.items()]
+
+    ok = True
+    with scratch_dir() as workdir:
+        spool = MailSpool(os.path.join(workdir, 'spool.db'))
+        ledger = SentLedger(os.path.join(workdir, 'ledger.db'))
+
+        ok &= check(spool.enqueue(messages, day, 'roster', recipients) == 2, "入队 2 封邮件")
+        ok &= check(spool.enqueue(messages, day, 'roster', recipients) == 0, "重复入队被忽略")
+
+        server.reject = True
+        sent, retried, dead = spool.flush(max_attempts=2, ledger=ledger)
+        ok &= check((sent, retried, dead) == (0, 2, 0), "服务器拒绝时安排重试")
+        ok &= check(spool.flush(max_attempts=2, ledger=ledger) == (0, 0, 0), "未到重试时间的邮件不投递")
+        rows = spool.entries(PENDING)
+        ok &= check(all(row[2] == 1 and row[6] for row in rows), "记录尝试次数和失败原因")
+
+        spool._db.execute("UPDATE outbox SET next_attempt = 0")  # 跳过等待
+        spool._db.commit()
+        sent, retried, dead = spool.flush(max_attempts=2, ledger=ledger)
+        ok &= check((sent, retried, dead) == (0, 0, 2), "达到尝试次数上限后移入死信")
+        ok &= check(spool.stats().get(DEAD) == 2, "死信 2 封")
+
+        server.reject = False
+        ok &= check(spool.retry(dead=True) == 2, "死信放回队列")
+        sent, retried, dead = spool.flush(ledger=ledger)
+        ok &= check((sent, retried, dead) == (2, 0, 0) and len(server.received) == 2, "服务器恢复后全部投递")
+        ok &= check(spool.stats() == {SENT: 2}, "队列中全部为已发送")
+        ok &= check(len(ledger.sent_on(day, 'roster')) == 3, "发送记录中有 3 条（收件人, 生日）")
+
+        # 另一个队列（如换了机器）再次入队，发送记录中已有的邮件不再投递
+        other = MailSpool(os.path.join(workdir, 'other.db'))
+        other.enqueue(messages, day, 'roster', recipients)
+        sent, _, _ = other.flush(ledger=ledger)
+        ok &= check(sent == 2 and len(server.received) == 2, "已发送过的邮件标记为已发送，不再投递")
+
+        other.close()
+        spool.close()
+        ledger.close()
+    server.shutdown()
+    return report(ok, "发送队列检查")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+# 生日提醒系统 - 启动开销回归检查
+# 项目在https://github.com/inkcoo/birthdays_reminder开源免费
+#
+# 用 python -X importtime 运行一次“今天没有人过生日”的每日提醒，检查:
+#   1. 不应加载的模块（邮件、NumPy、pytz、lunardate 等）确实没有被导入；
+#   2. 除解释器自身启动外，导入模块的总耗时不超过预算。
+# 另外报告整个进程的墙钟时间（取多次运行的最小值），与空解释器对比。
+#
+# 用法（在仓库根目录）:
+#     python benchmarks/check_startup.py                  # 默认预算 40 毫秒
+#     python benchmarks/check_startup.py --budget-ms 20
+# 检查不通过时退出代码为1，可放在 CI 中。
+import os  # 用于处理路径
+import sys  # 用于获取当前解释器
+import argparse  # 用于解析命令行参数
+import tempfile  # 用于创建临时运行目录
+import subprocess  # 用于启动被测进程
+import time  # 用于计时
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 没有人过生日时不应导入的模块
+FORBIDDEN = ['smtplib', 'email', 'concurrent', 'pytz', 'numpy', 'lunardate',
+             'delivery', 'mailer', 'roster_store', 'sqlite3']
+
+# 运行日期与测试名册：2025-07-06 没有人过生日（农历六月十二）
+RUN_DATE = '2025-07-06'
+ROSTER = """公历测试-10-18-a
+农历测试-09-15-b
+年龄-1990-10-12-a
+部门-12-25-b-市场部
+年龄部门-1985-05-20-a-技术部
+"""
+
+
+def parse_importtime(stderr):
+    """
+    解析 -X importtime 的输出
+
+    返回:
+        (已导入模块名集合, 顶层导入的累计耗时之和，单位微秒)
+    """
+    modules = set()
+    total = 0
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules.add(name.strip())
+        if not name[1:].startswith(' '):  # 顶层导入（名称前只有一个空格）
+            total += int(cumulative)
+    return modules, total
+
+
+def run(args, cwd):
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime'] + args, cwd=cwd,
+                            capture_output=True, text=True, encoding='utf-8')
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        print(result.stdout + result.stderr)
+        raise SystemExit(f"运行失败: {' '.join(args)}")
+    return result.stderr, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检查每日提醒的启动开销")
+    parser.add_argument('--budget-ms', type=float, default=40,
+                        help="除解释器自身启动外，导入模块总耗时的上限（毫秒），默认40")
+    parser.add_argument('--runs', type=int, default=5, help="重复运行次数，取最小值，默认5")
+    args = parser.parse_args()
+
+    script = os.path.join(REPO, 'birthday_reminder.py')
+    # 先生成字节码缓存，否则刚修改过的模块每次都要重新编译，测得的导入时间偏大
+    subprocess.run([sys.executable, '-m', 'compileall', '-q', REPO], check=True)
+    with tempfile.TemporaryDirectory() as workdir:
+        with open(os.path.join(workdir, 'birthdays.txt'), 'w', encoding='utf-8') as file:
+            file.write(ROSTER)
+        run([script, '--date', RUN_DATE], workdir)  # 第一次运行编译生日日历
+
+        baseline, script_import, baseline_wall, script_wall = [], [], [], []
+        modules = set()
+        for _ in range(args.runs):
+            stderr, elapsed = run(['-c', 'pass'], workdir)
+            baseline.append(parse_importtime(stderr)[1])
+            baseline_wall.append(elapsed)
+            stderr, elapsed = run([script, '--date', RUN_DATE], workdir)
+            imported, total = parse_importtime(stderr)
+            modules |= imported
+            script_import.append(total)
+            script_wall.append(elapsed)
+
+    extra_ms = (min(script_import) - min(baseline)) / 1000
+    print(f"空解释器:   导入 {min(baseline) / 1000:.1f} 毫秒, 进程 {min(baseline_wall) * 1000:.1f} 毫秒")
+    print(f"每日提醒:   导入 {min(script_import) / 1000:.1f} 毫秒, 进程 {min(script_wall) * 1000:.1f} 毫秒")
+    print(f"额外导入耗时: {extra_ms:.1f} 毫秒 (预算 {args.budget_ms:.0f} 毫秒)")
+
+    failed = False
+    loaded = sorted({name.split('.')[0] for name in modules} & set(FORBIDDEN))
+    if loaded:
+        print(f"✗ 没有人过生日时不应导入: {', '.join(loaded)}")
+        failed = True
+    if extra_ms > args.budget_ms:
+        print("✗ 导入耗时超出预算")
+        failed = True
+    if not failed:
+        print("✓ 启动开销检查通过")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
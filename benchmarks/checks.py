@@ -0,0 +1,50 @@
+# 生日提醒系统 - 一致性检查脚本共用的辅助函数
+# 项目在https://github.com/inkcoo/birthdays_reminder开源免费
+#
+# benchmarks/check_*.py 和 load_test.py 都是“生成合成数据 → 临时目录 → 比较结果 → 逐项输出 ✓/✗”的结构:
+#     with scratch_dir() as workdir:
+#         ok = check(条件, "说明")
+#         ok &= check(...)
+#     sys.exit(report(ok, "生日数据库检查"))
+import os  # 用于打开 os.devnull
+import sys  # 用于导入仓库中的模块
+import tempfile  # 用于存放生成的数据
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import run_log  # noqa: E402
+
+
+def check(condition, message):
+    """输出一项检查的结果（✓ 或 ✗ 加说明），返回 condition，可写成 ok &= check(...)"""
+    print(f"{'✓' if condition else '✗'} {message}")
+    return condition
+
+
+def report(ok, label):
+    """
+    输出全部检查的结论
+
+    返回:
+        退出代码，全部通过为0，否则为1
+    """
+    print(f"✓ {label}通过" if ok else f"✗ {label}未通过")
+    return 0 if ok else 1
+
+
+@contextmanager
+def scratch_dir():
+    """
+    临时目录，期间运行日志只保留警告和错误并丢弃（合成数据中有格式不正确的行），结束时恢复默认日志
+
+    生成:
+        临时目录路径，结束时删除
+    """
+    with tempfile.TemporaryDirectory() as workdir, open(os.devnull, 'w', encoding='utf-8') as devnull:
+        run_log.configure(run_log.QUIET, stream=devnull)
+        try:
+            yield workdir
+        finally:
+            run_log.get_log().flush()
+            run_log.configure()
@@ -0,0 +1,131 @@
+# 生日提醒系统 - 合成生日列表生成器
+# 项目在https://github.com/inkcoo/birthdays_reminder开源免费
+#
+# 生成用于基准测试的 birthdays.txt，四种格式混合，并包含容易出错的情况:
+#     公历 / 农历生日（约 7:3），带或不带年份、部门
+#     农历闰月所在的月份（如 2023 年闰二月、2025 年闰六月）和农历三十日
+#     公历 2 月 29 日，姓名中带“-”的记录
+#     少量格式不正确的行（默认千分之一）
+# 同一个 --seed 生成的文件完全相同，便于多次基准结果互相比较。
+#
+# 用法（在仓库根目录）:
+#     python benchmarks/gen_roster.py 100k -o birthdays.txt
+#     python benchmarks/gen_roster.py 10M -o /tmp/birthdays-10m.txt --seed 7
+import sys  # 用于输出到标准输出
+import random  # 用于生成随机数据
+import argparse  # 用于解析命令行参数
+
+SURNAMES = "王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾肖田董袁潘于蒋蔡余杜叶程苏魏吕丁任沈"
+GIVEN = "伟芳娜敏静丽强磊军洋勇艳杰娟涛明超秀霞平刚桂英华玉兰萍红鹏辉建国文斌婷雪琳浩宇子涵欣怡思睿"
+DEPARTMENTS = ["技术部", "市场部", "销售部", "财务部", "人事部", "行政部", "法务部", "采购部",
+               "客服部", "运营部", "产品部", "设计部", "研发一部", "研发二部", "质量部", "物流部"]
+# 近年有闰月的农历月份（2020闰四月、2023闰二月、2025闰六月、2028闰五月），生日落在这些月份的人一年提醒两次
+LEAP_MONTHS = [2, 4, 5, 6]
+MALFORMED = [
+    "{name}",                    # 只有姓名
+    "{name}-13-01-a",            # 月份超出范围（能通过格式检查，换算日期时跳过）
+    "{name}-05-20-c",            # 类型不是 a/b
+    "{name}-1990-05-20",         # 缺少类型
+    "{name} 05 20 a",            # 分隔符错误
+    "-05-20-a",                  # 缺少姓名
+    "{name}-05-20-a-",           # 部门为空
+]
+
+
+def parse_count(value):
+    """解析行数参数，支持 k / M 后缀，如 100k、10M"""
+    value = value.strip()
+    scale = {'k': 1000, 'K': 1000, 'm': 1000000, 'M': 1000000}.get(value[-1:], 1)
+    if scale != 1:
+        value = value[:-1]
+    try:
+        count = int(float(value) * scale)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无效的行数: {value}")
+    if count <= 0:
+        raise argparse.ArgumentTypeError("行数必须大于0")
+    return count
+
+
+def generate_lines(count, seed=2025, malformed_rate=0.001):
+    """
+    生成 count 行生日数据
+
+    参数:
+        count: 行数
+        seed: 随机种子
+        malformed_rate: 格式不正确的行所占比例
+
+    生成:
+        不带换行符的文本行
+    """
+    rng = random.Random(seed)
+    random_value = rng.random
+    randint = rng.randint
+    choice = rng.choice
+    for i in range(count):
+        name = choice(SURNAMES) + choice(GIVEN) + (choice(GIVEN) if random_value() < 0.6 else '')
+        if random_value() < 0.01:
+            name += '-' + choice(GIVEN)  # 姓名中带“-”
+        name += str(i)  # 保证姓名不重复
+
+        if random_value() < malformed_rate:
+            yield choice(MALFORMED).format(name=name)
+            continue
+
+        if random_value() < 0.7:  # 公历
+            calendar_type = 'a'
+            if random_value() < 0.003:
+                month, day = 2, 29
+            else:
+                month = randint(1, 12)
+                day = randint(1, 31 if month in (1, 3, 5, 7, 8, 10, 12) else 30 if month != 2 else 28)
+        else:  # 农历
+            calendar_type = 'b'
+            month = choice(LEAP_MONTHS) if random_value() < 0.15 else randint(1, 12)
+            day = 30 if random_value() < 0.05 else randint(1, 29)
+
+        # 四种格式大致各占四分之一
+        year = f"{randint(1950, 2020)}-" if random_value() < 0.5 else ''
+        department = f"-{choice(DEPARTMENTS)}" if random_value() < 0.5 else ''
+        yield f"{name}-{year}{month:02d}-{day:02d}-{calendar_type}{department}"
+
+
+def write_roster(path, count, seed=2025, malformed_rate=0.001):
+    """
+    生成 count 行生日数据并写入 path
+
+    返回:
+        写入的行数
+    """
+    with open(path, 'w', encoding='utf-8') as file:
+        chunk = []
+        for line in generate_lines(count, seed, malformed_rate):
+            chunk.append(line)
+            if len(chunk) >= 100000:
+                file.write('\n'.join(chunk) + '\n')
+                chunk = []
+        if chunk:
+            file.write('\n'.join(chunk) + '\n')
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成用于基准测试的合成生日列表")
+    parser.add_argument('count', type=parse_count, help="行数，支持 k / M 后缀，如 1k、100k、10M")
+    parser.add_argument('-o', '--output', default='-', help="输出文件，默认输出到标准输出")
+    parser.add_argument('--seed', type=int, default=2025, help="随机种子，默认2025")
+    parser.add_argument('--malformed-rate', type=float, default=0.001,
+                        help="格式不正确的行所占比例，默认0.001")
+    args = parser.parse_args()
+
+    if args.output == '-':
+        for line in generate_lines(args.count, args.seed, args.malformed_rate):
+            sys.stdout.write(line + '\n')
+    else:
+        write_roster(args.output, args.count, args.seed, args.malformed_rate)
+        print(f"已生成 {args.count} 行: {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
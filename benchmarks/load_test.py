@@ -0,0 +1,193 @@
+# 生日提醒系统 - 生日查询服务压力测试
+# 项目在https://github.com/inkcoo/birthdays_reminder开源免费
+#
+# 用 gen_roster.py 生成合成生日列表，在子进程中启动 birthday_server.py，
+# 先检查各接口的响应与 BirthdayEngine 直接查询的结果相同，然后用若干条 HTTP/1.1 长连接
+# 轮流请求 /today、/date/...、/upcoming?days=N、/department/... 持续一段时间，
+# 报告每秒处理的请求数和延迟（中位数、p99）。有请求失败、结果不同或每秒请求数低于 --min-rps 时退出代码为1。
+#
+# 压测客户端与服务在同一台机器上运行，单核机器上两者分享同一个 CPU，测得的是服务能力的下限。
+#
+# 用法（在仓库根目录）:
+#     python benchmarks/load_test.py                         # 2 万行，4 条连接，5 秒
+#     python benchmarks/load_test.py 1M --connections 16 --duration 10 --min-rps 2000
+import os  # 用于处理路径
+import sys  # 用于导入仓库中的模块
+import json  # 用于解析响应
+import time  # 用于计时
+import socket  # 用于发送请求
+import argparse  # 用于解析命令行参数
+import threading  # 每条连接一个线程
+import subprocess  # 用于在子进程中运行查询服务
+from datetime import datetime, timedelta
+from urllib.parse import quote
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+
+from birthday_core import BEIJING_TZ, read_birthdays  # noqa: E402
+from birthday_engine import BirthdayEngine  # noqa: E402
+from gen_roster import parse_count, write_roster  # noqa: E402
+from checks import check, report, scratch_dir  # noqa: E402
+
+
+class Connection:
+    """一条 HTTP/1.1 长连接，只实现 GET 和按 Content-Length 读取响应（比 http.client 开销小，压测时客户端少占 CPU）"""
+
+    def __init__(self, port):
+        self.sock = socket.create_connection(('127.0.0.1', port))
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.buffer = b''
+
+    def get(self, path):
+        """返回 (状态码, 响应正文)"""
+        self.sock.sendall(f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n".encode('ascii'))
+        while b'\r\n\r\n' not in self.buffer:
+            self._receive()
+        head, self.buffer = self.buffer.split(b'\r\n\r\n', 1)
+        lines = head.split(b'\r\n')
+        status = int(lines[0].split()[1])
+        length = next(int(line.split(b':', 1)[1]) for line in lines[1:]
+                      if line.lower().startswith(b'content-length:'))
+        while len(self.buffer) < length:
+            self._receive()
+        body, self.buffer = self.buffer[:length], self.buffer[length:]
+        return status, body
+
+    def _receive(self):
+        chunk = self.sock.recv(65536)
+        if not chunk:
+            raise ConnectionError("服务关闭了连接")
+        self.buffer += chunk
+
+    def close(self):
+        self.sock.close()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(port, process, timeout=60):
+    """等待服务开始处理请求"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("查询服务启动失败")
+        try:
+            connection = Connection(port)
+        except OSError:
+            time.sleep(0.1)
+            continue
+        connection.close()
+        return
+    raise RuntimeError("等待查询服务启动超时")
+
+
+def run_load(port, paths, connections, duration):
+    """
+    用 connections 条长连接轮流请求 paths，持续 duration 秒
+
+    返回:
+        (成功的请求数, 失败的请求数, 全部请求的延迟列表（秒）)
+    """
+    latencies = []
+    errors = []
+    start = threading.Barrier(connections + 1)
+    deadline = []
+
+    def worker(offset):
+        connection = Connection(port)
+        local, failed = [], 0
+        start.wait()
+        i = offset
+        try:
+            while time.perf_counter() < deadline[0]:
+                began = time.perf_counter()
+                status, _ = connection.get(paths[i % len(paths)])
+                local.append(time.perf_counter() - began)
+                failed += status != 200
+                i += 1
+        except OSError:
+            failed += 1
+        connection.close()
+        latencies.extend(local)
+        errors.append(failed)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(connections)]
+    for thread in threads:
+        thread.start()
+    deadline.append(time.perf_counter() + duration)
+    start.wait()
+    for thread in threads:
+        thread.join()
+    failed = sum(errors)
+    return len(latencies) - failed, failed, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生日查询服务压力测试")
+    parser.add_argument('count', nargs='?', type=parse_count, default=parse_count('20k'),
+                        help="生日列表行数，支持 k / M 后缀，默认 20k")
+    parser.add_argument('--connections', type=int, default=4, help="并发长连接数，默认 4")
+    parser.add_argument('--duration', type=float, default=5, help="压测持续秒数，默认 5")
+    parser.add_argument('--min-rps', type=float, default=1000, help="每秒请求数低于此值时检查不通过，默认 1000")
+    args = parser.parse_args()
+
+    ok = True
+    with scratch_dir() as workdir:
+        source = os.path.join(workdir, 'birthdays.txt')
+        write_roster(source, args.count)
+        department = next(record.department for record in read_birthdays(source) if record.department)
+        today = datetime.now(BEIJING_TZ).date()
+        paths = ['/today', f"/date/{today + timedelta(days=1)}", '/upcoming?days=7', '/upcoming?days=30',
+                 f"/department/{quote(department)}"]
+
+        port = free_port()
+        started = time.perf_counter()
+        process = subprocess.Popen([sys.executable, os.path.join(REPO_DIR, 'birthday_server.py'), '--quiet',
+                                    '--file', source, '--port', str(port)], cwd=workdir,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_ready(port, process)
+            print(f"生日列表 {args.count} 行，服务启动 {time.perf_counter() - started:.2f} 秒")
+
+            # 1. 响应与直接查询相同
+            engine = BirthdayEngine(source, use_cache=False)
+            connection = Connection(port)
+            responses = {path: connection.get(path) for path in paths}
+            connection.close()
+            ok &= check(all(status == 200 for status, _ in responses.values()), f"{len(paths)} 个接口返回 200")
+            names = [item['name'] for item in json.loads(responses['/today'][1])['birthdays']]
+            ok &= check(names == [record.name for record in engine.today()], f"/today 与直接查询相同（{len(names)} 人）")
+            upcoming = json.loads(responses['/upcoming?days=30'][1])['birthdays']
+            ok &= check([(item['date'], item['name']) for item in upcoming] ==
+                        [(day.isoformat(), record.name) for day, record in engine.upcoming(30, today)],
+                        f"/upcoming?days=30 与直接查询相同（{len(upcoming)} 人）")
+            members = json.loads(responses[paths[-1]][1])['members']
+            ok &= check([item['name'] for item in members] ==
+                        [record.name for record in engine.department(department)],
+                        f"/department/{department} 与直接查询相同（{len(members)} 人）")
+
+            # 2. 压测
+            succeeded, failed, latencies = run_load(port, paths, args.connections, args.duration)
+        finally:
+            process.terminate()
+            process.wait()
+
+    latencies.sort()
+    rps = succeeded / args.duration
+    median = latencies[len(latencies) // 2] * 1000 if latencies else 0
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0
+    print(f"{args.connections} 条连接 {args.duration:g} 秒: {succeeded} 个请求成功，{failed} 个失败；"
+          f"每秒 {rps:.0f} 个请求，延迟中位数 {median:.2f} 毫秒，p99 {p99:.2f} 毫秒")
+    ok &= check(not failed, "没有失败的请求")
+    ok &= check(rps >= args.min_rps, f"每秒请求数不低于 {args.min_rps:g}")
+    return report(ok, "查询服务压力测试")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
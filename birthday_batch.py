@@ -0,0 +1,263 @@
+# 生日提醒系统 - 多名册批量模式：一个进程处理多个组织的生日提醒
+# 项目在https://github.com/inkcoo/birthdays_reminder开源免费
+#
+# 每个组织（名册）各有自己的生日文件、收件人、邮件模板和姓名前的显示前缀，
+# 写在一个 JSON 清单中（路径相对于清单所在目录）:
+#     {
+#       "defaults": {"recipients": ["admin@example.com"]},
+#       "rosters": [
+#         {"name": "心助会", "file": "xinzhu/birthdays.txt", "prefix": "心助会-",
+#          "recipients": ["xinzhu@example.com"], "departments": "xinzhu/departments.txt"},
+#         {"name": "读书会", "file": "dushu/birthdays.txt", "prefix": "读书会-",
+#          "template_dir": "dushu/templates"}
+#       ]
+#     }
+# defaults 中的设置对每个名册都生效，名册中的同名设置优先。
+# 未写 name 时以生日文件相对于清单的路径（如 xinzhu/birthdays.txt）为名称。
+#
+# 与逐个名册分别运行 birthday_reminder.py 相比，这里只计算一次当前时间和今天的农历日期，
+# 农历生日换算结果（birthday_calendar.birthday_slots）在各名册之间共用，
+# 全部名册的邮件一次投递，共用同一组 SMTP 连接，每个连接只登录一次。
+#
+# 用法:
+#     python birthday_batch.py rosters.json
+#     python birthday_batch.py rosters.json --date 2025-10-18 --dry-run
+import os  # 用于访问环境变量和处理路径
+import sys  # 用于退出程序
+import json  # 用于读取清单
+import argparse  # 用于解析命令行参数
+from collections import namedtuple
+import run_log
+import run_metrics
+import sent_ledger
+import mail_spool
+from birthday_core import DEFAULT_PREFIX, RunClock, parse_date
+from birthday_engine import BirthdayEngine, build_email, format_birthday_display
+
+# 清单中的一个名册
+# name: 名称（用于日志，也是发送记录和发送队列中区分名册的键，各名册不能相同）；filename: 生日文件；prefix: 姓名前的显示前缀；
+# recipients: 收到该名册全部生日的邮箱；departments: 部门收件人配置文件（可为None）；
+# template_dir: 邮件模板目录（可为None，使用默认模板）
+Roster = namedtuple('Roster', ['name', 'filename', 'prefix', 'recipients', 'departments', 'template_dir'])
+
+
+def read_manifest(path):
+    """
+    读取名册清单
+
+    参数:
+        path: JSON 清单文件路径
+
+    返回:
+        Roster 列表，按清单中的顺序
+
+    异常:
+        ValueError: 清单格式不正确，或有两个名册名称相同
+    """
+    with open(path, 'r', encoding='utf-8') as file:
+        try:
+            data = json.load(file)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"名册清单不是有效的 JSON: {e}")
+    if not isinstance(data, dict) or not isinstance(data.get('rosters'), list) or not data['rosters']:
+        raise ValueError("名册清单中缺少 rosters 列表")
+    base = os.path.dirname(os.path.abspath(path))
+    defaults = data.get('defaults') or {}
+
+    def resolve(value):
+        return os.path.join(base, value) if value else None
+
+    rosters = []
+    names = set()
+    for i, entry in enumerate(data['rosters'], 1):
+        if not isinstance(entry, dict) or not entry.get('file'):
+            raise ValueError(f"第{i}个名册缺少 file")
+        settings = dict(defaults, **entry)
+        recipients = settings.get('recipients') or []
+        if isinstance(recipients, str):
+            recipients = [email.strip() for email in recipients.split(',') if email.strip()]
+        filename = resolve(entry['file'])
+        # 名称是发送记录和发送队列的键，默认取相对路径，不同目录下的同名文件不会混在一起
+        name = entry.get('name') or os.path.relpath(filename, base).replace(os.sep, '/')
+        if name in names:
+            raise ValueError(f"第{i}个名册的名称 {name} 与前面的名册相同")
+        names.add(name)
+        rosters.append(Roster(
+            name=name,
+            filename=filename,
+            prefix=settings.get('prefix', DEFAULT_PREFIX),
+            recipients=recipients,
+            departments=resolve(settings.get('departments')),
+            template_dir=resolve(settings.get('template_dir')),
+        ))
+    return rosters
+
+
+def remind_roster(roster, clock, templates, use_cache=True, ledger=None):
+    """
+    查找一个名册今天过生日的人并生成提醒邮件（不发送）
+
+    参数:
+        roster: Roster 对象
+        clock: 各名册共用的 RunClock 对象
+        templates: 该名册使用的 MailTemplates 对象
+        use_cache: 是否使用生日日历文件
+        ledger: 可选，SentLedger 发送记录，今天已发送过的生日不再生成邮件
+
+    返回:
+        (有效记录数, 今天过生日的人数, {收件人邮箱: [生日记录, ...]}, 与之顺序相同的 Message 列表)
+    """
+    from delivery import Message, read_department_recipients, route_birthdays
+
+    log = run_log.get_log()
+    metrics = run_metrics.get_metrics()
+    engine = BirthdayEngine(roster.filename, use_cache=use_cache, lazy=True)
+    with metrics.phase('load') as phase:
+        calendar = engine.calendar(clock.today.year)
+        phase.count = len(calendar)
+    with metrics.phase('match') as phase:
+        today_birthdays = engine.on(clock.today)
+        phase.count = len(today_birthdays)
+    log.info(f"[{roster.name}] 共 {len(calendar)} 条生日记录，今天有 {len(today_birthdays)} 人过生日",
+             event='roster', roster=roster.name, records=len(calendar), birthdays=len(today_birthdays))
+    if not today_birthdays:
+        return len(calendar), 0, {}, []
+
+    with metrics.phase('format', len(today_birthdays)):
+        for i, birthday in enumerate(today_birthdays, 1):
+            log.info(f"{i}. {roster.prefix} {format_birthday_display(birthday, clock)}", event='birthday',
+                     roster=roster.name, name=birthday.name, department=birthday.department,
+                     calendar_type=birthday.calendar_type)
+
+    recipients = {email: today_birthdays for email in roster.recipients}
+    if roster.departments:
+        routes = route_birthdays(today_birthdays, read_department_recipients(roster.departments))
+        for email, birthdays in routes.items():
+            recipients.setdefault(email, birthdays)
+    if not recipients:
+        log.warning(f"[{roster.name}] 警告：未配置收件人，跳过邮件发送", event='no_recipients', roster=roster.name)
+        return len(calendar), len(today_birthdays), {}, []
+    if ledger is not None:
+        recipients = ledger.pending(clock.today, roster.name, recipients)
+    with metrics.phase('render', len(recipients)):
+        messages = [Message(email, *build_email(birthdays, clock, roster.prefix, templates))
+                    for email, birthdays in recipients.items()]
+    return len(calendar), len(today_birthdays), recipients, messages
+
+
+def run_batch(rosters, clock, use_cache=True, dry_run=False, ledger=None, spool=False):
+    """
+    依次处理全部名册，最后一次投递所有邮件
+
+    参数:
+        rosters: Roster 列表
+        clock: 本次运行的 RunClock 对象
+        use_cache: 是否使用生日日历文件
+        dry_run: 为True时只生成邮件，不发送
+        ledger: 可选，SentLedger 发送记录，按名册名称记录，今天已发送过的邮件不再发送
+        spool: 为True时只把邮件放入发送队列，由 mail_spool.py flush 投递
+
+    返回:
+        退出代码，0表示成功，1表示有名册读取失败、邮件发送失败或无法写入发送队列
+    """
+    from mail_template import MailTemplates, default_templates
+
+    log = run_log.get_log()
+    metrics = run_metrics.get_metrics()
+    template_sets = {None: default_templates()}  # 模板目录 -> MailTemplates，同一目录的模板只解析一次
+    exit_code = 0
+    records = birthdays = 0
+    messages = []
+    sent_groups = []  # (名册名称, 收件人及其生日, 该名册第一封邮件在 messages 中的位置)
+    for roster in rosters:
+        templates = template_sets.get(roster.template_dir)
+        if templates is None:
+            templates = template_sets[roster.template_dir] = MailTemplates(roster.template_dir)
+        try:
+            count, today_count, recipients, roster_messages = remind_roster(roster, clock, templates, use_cache,
+                                                                            ledger)
+        except (OSError, UnicodeDecodeError) as e:
+            log.error(f"[{roster.name}] 无法读取生日文件 {roster.filename}: {e}", event='roster_failed',
+                      roster=roster.name, error=str(e))
+            exit_code = 1
+            continue
+        records += count
+        birthdays += today_count
+        sent_groups.append((roster.name, recipients, len(messages)))
+        messages.extend(roster_messages)
+    metrics.set('rosters', len(rosters))
+    metrics.set('records', records)
+    metrics.set('birthdays_today', birthdays)
+
+    log.info("="*50)
+    log.info(f"{len(rosters)} 个名册，今天共 {birthdays} 人过生日，待发送 {len(messages)} 封邮件",
+             event='batch', rosters=len(rosters), birthdays=birthdays, messages=len(messages))
+    if not messages:
+        return exit_code
+    if dry_run:
+        for message in messages:
+            log.info(f"(未发送) {message.to_email}: {message.subject}", event='mail_skipped',
+                     to_email=message.to_email, subject=message.subject)
+        return exit_code
+    if spool:
+        for name, recipients, start in sent_groups:
+            if recipients:
+                exit_code |= mail_spool.spool_messages(messages[start:start + len(recipients)], clock.today,
+                                                       name, recipients)
+        return exit_code
+
+    from delivery import deliver, print_delivery_report
+    # 全部名册的邮件一起投递，共用同一组 SMTP 连接
+    results = deliver(messages)
+    if ledger is not None:
+        for name, recipients, start in sent_groups:
+            ledger.record_results(clock.today, name, recipients, results[start:start + len(recipients)])
+    if print_delivery_report(results):
+        exit_code = 1
+    return exit_code
+
+
+def main():
+    """
+    主函数：读取名册清单并处理全部名册
+    """
+    parser = argparse.ArgumentParser(description="多名册批量生日提醒")
+    parser.add_argument('manifest', help="名册清单（JSON 文件）")
+    parser.add_argument('--date', type=parse_date,
+                        help="按指定日期运行（格式 YYYY-MM-DD），用于回放或补发，默认为北京时间今天")
+    parser.add_argument('--no-cache', action='store_true', help="不使用也不更新各名册的生日日历，每次重新解析")
+    parser.add_argument('--dry-run', action='store_true', help="只输出今天的生日和待发送的邮件，不发送")
+    sent_ledger.add_arguments(parser)
+    mail_spool.add_arguments(parser)
+    run_log.add_arguments(parser)
+    run_metrics.add_arguments(parser)
+    args = parser.parse_args()
+    log = run_log.configure(args.verbosity, args.log_json)
+    metrics = run_metrics.get_metrics()
+    metrics.labels['mode'] = 'batch'
+
+    try:
+        rosters = read_manifest(args.manifest)
+    except (OSError, ValueError) as e:
+        log.error(f"无法读取名册清单 {args.manifest}: {e}", event='manifest_failed', error=str(e))
+        sys.exit(1)
+
+    # 时区、当前时间和今天的农历日期只计算一次，各名册共用
+    clock = RunClock(args.date)
+    if clock.is_override:
+        log.info(f"按指定日期运行: {clock.today.isoformat()}")
+    log.info(f"程序运行时间: {clock.formatted_time}", event='start', date=clock.today, override=clock.is_override)
+
+    ledger = sent_ledger.from_args(args)
+    exit_code = run_batch(rosters, clock, use_cache=not args.no_cache, dry_run=args.dry_run, ledger=ledger,
+                          spool=args.spool)
+    if ledger is not None:
+        ledger.close()
+    metrics.set('exit_code', exit_code)
+    log.info(metrics.summary(), event='finish', **metrics.to_dict())
+    run_metrics.export(metrics, args)
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()  # 程序入口点
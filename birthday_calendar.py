@@ -0,0 +1,538 @@
+# 生日提醒系统 - 全年生日日历（预先编译，每日运行只读取当天一格）
+# 项目在https://github.com/inkcoo/birthdays_reminder开源免费
+#
+# 农历生日每年对应的公历日期都不同。编译时把生日列表中的每一行换算到某个公历年的
+# 366 个日期格中（公历生日一格，农历生日通常一格，遇到同月闰月时两格），
+# 保存为生日文件旁边的 birthdays.txt.calendar。每日运行只读取今天那一格的几行并解析。
+#
+# 生日文件修改后按行内容增量更新：只有新增或删除的行会重新换算并放入/移出日期格，
+# 其余行保持不动；只有跨年（日历年份与需要的年份不同）时才整体重建。
+# 常驻进程中已完整读入内存的日历保留生日文件的原始内容，文件修改后用 reload_calendar() 增量更新:
+# 前后相同的部分按块比较（在 C 中完成），只有夹在中间、确实变化的几行才逐行比较和换算。
+#
+# 日历文件格式（小端序）:
+#     文件头: 魔数 b'BCAL'、版本号、公历年、有效记录数、生日文件大小、修改时间、SHA-256
+#     偏移表: 368 个偏移量，依次为 366 个日期格、格式错误行列表、编译时全部行的起始位置
+#     日期格: 当天过生日的原始行，UTF-8 编码，以换行分隔
+#     格式错误行列表: 每行为“行号\t内容”，UTF-8 编码，每次运行都会重新提示
+#     编译时全部行: UTF-8 编码，以换行分隔，仅在增量更新时读取，用于找出变化的行
+#
+# 也可以提前手动编译:
+#     python birthday_calendar.py                  # 编译北京时间今年的日历
+#     python birthday_calendar.py --year 2026      # 编译指定年份
+import os  # 用于读取文件状态
+import struct  # 用于读写文件头和偏移表
+from collections import Counter
+from functools import lru_cache
+from datetime import date  # 用于处理日期
+from birthday_core import BIRTHDAY_LINE, parse_birthday_line
+from occurrences import lunar_birthday
+from run_log import get_log
+
+CALENDAR_SUFFIX = '.calendar'
+CALENDAR_VERSION = 2
+DAYS_PER_YEAR = 366  # 平年最后一格为空
+
+_MAGIC = b'BCAL'
+_HEADER = struct.Struct('<4sHHQQq32s')
+_OFFSETS = struct.Struct(f'<{DAYS_PER_YEAR + 2}Q')
+_BLOCK = 1 << 16  # 比较生日文件的两个版本时每次比较的字节数
+
+
+@lru_cache(maxsize=None)  # 进程内共用：批量处理多个名册时，相同的 (类型, 月, 日, 年) 只换算一次
+def birthday_slots(calendar_type, month, day, year):
+    """
+    计算某个生日在公历 year 年落在哪几格
+
+    参数:
+        calendar_type: a=公历, b=农历
+        month, day: 生日的月、日
+        year: 公历年
+
+    返回:
+        日期格下标（当年的第几天，从0开始）的元组，按日期排序；当年不过生日时为空元组
+        （公历2月29日只在闰年出现；农历生日的规则见 occurrences.lunar_birthday()，
+        公历年内可能跨两个农历年，因此两个农历年都要换算）
+    """
+    first = date(year, 1, 1).toordinal()
+    if calendar_type == 'a':
+        try:
+            return (date(year, month, day).toordinal() - first,)
+        except ValueError:
+            return ()  # 该年没有这一天（如平年的2月29日）
+
+    slots = set()
+    for lunar_year in (year - 1, year):
+        for is_leap in (False, True):
+            occurrence = lunar_birthday(lunar_year, month, day, is_leap)
+            if occurrence is not None and occurrence.year == year:
+                slots.add(occurrence.toordinal() - first)
+    return tuple(sorted(slots))
+
+
+class OccurrenceCalendar:
+    """
+    某一公历年的生日日历
+
+    参数:
+        year: 公历年
+
+    用法:
+        calendar = load_calendar('birthdays.txt', clock.today.year)
+        today_birthdays = calendar.on(clock.today)   # BirthdayRecord 列表
+    """
+
+    def __init__(self, year):
+        self.year = year
+        self.count = 0  # 有效记录数（含当年不过生日的，如平年的2月29日）
+        self.buckets = [[] for _ in range(DAYS_PER_YEAR)]  # 每格为当天过生日的原始行
+        self.source = []  # 上次编译时的全部非空行，用于比较哪些行有变化（保留 data 后不再需要，为None）
+        self.data = None  # 生日文件的原始内容（bytes），仅完整读入内存时保留，见 reload_calendar()
+        self.bad_lines = []  # 格式不正确的行 (行号, 内容)
+        self._reader = None  # 延迟读取时，按下标读取一格的函数
+
+    def __len__(self):
+        return self.count
+
+    def bucket(self, day):
+        """返回 day（datetime.date）那一格的原始行列表"""
+        if day.year != self.year:
+            raise ValueError(f"日期 {day} 不在 {self.year} 年的生日日历中")
+        index = day.toordinal() - date(self.year, 1, 1).toordinal()
+        if self._reader is not None:
+            return self._reader(index)
+        return self.buckets[index]
+
+    def on(self, day):
+        """
+        查找某天过生日的人
+
+        参数:
+            day: datetime.date，须在日历年份内
+
+        返回:
+            BirthdayRecord 列表，公历生日在前，农历生日在后
+        """
+        records = [parse_birthday_line(line) for line in self.bucket(day)]
+        return ([record for record in records if record.calendar_type == 'a']
+                + [record for record in records if record.calendar_type == 'b'])
+
+    def update(self, lines):
+        """
+        按行内容的增减更新日历，只有新增或删除的行会重新换算并移动
+
+        参数:
+            lines: 生日文件的全部行（已去除首尾空白，下标+1 即行号）
+
+        返回:
+            (新增的行, 删除的行)，均为 {行内容: 次数}（含格式不正确的行）
+        """
+        entries = [line for line in lines if line]  # 跳过空行
+        if not self.source:
+            added, removed = Counter(entries), {}  # 首次编译或跨年重建
+        else:
+            added, removed = diff_lines(self.source, entries)
+        bad = self.apply(added, removed)
+        bad.update(line for _, line in self.bad_lines)  # 已删除的行下面定位行号时自然找不到
+
+        self.source = entries
+        # 格式不正确的行很少，按当前文件重新定位行号
+        self.bad_lines = [(line_no, line) for line_no, line in enumerate(lines, 1)
+                          if line in bad] if bad else []
+        return added, removed
+
+    def apply(self, added, removed):
+        """
+        把新增的行换算后放入日期格，把删除的行移出日期格，其余行不动
+
+        参数:
+            added, removed: {行内容: 次数}
+
+        返回:
+            新增的行中格式不正确的行（集合）
+        """
+        match_line = BIRTHDAY_LINE.fullmatch
+        resolved = {}  # 同一个 (类型, 月, 日) 只换算一次
+
+        def slots_of(line):
+            match = match_line(line)
+            if match is None:
+                return None
+            key = match.group(5, 3, 4)  # 只需类型、月、日，不必构建完整记录
+            slots = resolved.get(key)
+            if slots is None:
+                slots = resolved[key] = birthday_slots(key[0], int(key[1]), int(key[2]), self.year)
+            return slots
+
+        # 删除的行：按格收集后，每格只过滤一遍
+        drops = {}
+        for line, count in removed.items():
+            slots = slots_of(line)
+            if slots is None:
+                continue
+            self.count -= count
+            for slot in slots:
+                drops.setdefault(slot, Counter())[line] += count
+        for slot, drop in drops.items():
+            kept = []
+            for line in self.buckets[slot]:
+                if drop[line]:
+                    drop[line] -= 1
+                else:
+                    kept.append(line)
+            self.buckets[slot] = kept
+
+        bad = set()
+        buckets = self.buckets
+        for line, count in added.items():
+            slots = slots_of(line)
+            if slots is None:
+                bad.add(line)
+                continue
+            self.count += count
+            for slot in slots:
+                if count == 1:
+                    buckets[slot].append(line)
+                else:
+                    buckets[slot].extend([line] * count)
+        return bad
+
+
+def diff_lines(old, new):
+    """
+    按行内容比较两个版本的生日文件（行的顺序变化不算修改）
+
+    参数:
+        old, new: 去除空行后的全部行
+
+    返回:
+        (新增的行, 删除的行)，均为 {行内容: 次数}
+    """
+    added, removed = {}, {}
+    if new == old:
+        return added, removed
+    old_counts, new_counts = Counter(old), Counter(new)
+    # 出现次数有变化的行（按行哈希计数，集合运算在 C 中完成，未变化的行不经过 Python 循环）
+    for line in {line for line, _ in old_counts.items() ^ new_counts.items()}:
+        change = new_counts[line] - old_counts[line]
+        if change > 0:
+            added[line] = change
+        else:
+            removed[line] = -change
+    return added, removed
+
+
+def _common_length(old, new, limit, from_end=False):
+    """
+    old 与 new 开头（from_end 为True时为结尾）相同部分的字节数，不超过 limit
+
+    先按 64KB 的块比较，再在第一个不同的块内二分查找，比较都在 C 中完成
+    """
+    def same(start, stop):
+        if from_end:
+            return old[len(old) - stop:len(old) - start] == new[len(new) - stop:len(new) - start]
+        return old[start:stop] == new[start:stop]
+
+    length = 0
+    while length < limit and same(length, min(length + _BLOCK, limit)):
+        length = min(length + _BLOCK, limit)
+    if length < limit:
+        low, high = length, min(length + _BLOCK, limit) - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if same(length, middle):
+                low = middle
+            else:
+                high = middle - 1
+        length = low
+    return length
+
+
+def _changed_region(old, new):
+    """
+    找出生日文件两个版本中不同的部分
+
+    返回:
+        (start, old_end, new_end)：old[start:old_end] 与 new[start:new_end] 以外的内容完全相同，
+        两段都从行首开始，到换行之后或文件末尾结束
+    """
+    prefix = _common_length(old, new, min(len(old), len(new)))
+    start = old.rfind(b'\n', 0, prefix) + 1  # 退回到行首
+    suffix = _common_length(old, new, min(len(old), len(new)) - start, from_end=True)
+    newline = old.find(b'\n', len(old) - suffix)  # 前进到行尾（两个版本在这里相同）
+    if newline == -1:
+        return start, len(old), len(new)
+    return start, newline + 1, newline + 1 + len(new) - len(old)
+
+
+def _digest(data):
+    """计算文件内容的 SHA-256（hashlib 只在需要比较内容时才导入）"""
+    import hashlib
+    return hashlib.sha256(data).digest()
+
+
+def _split_lines(data):
+    """把生日文件的内容（bytes）分成去除首尾空白的各行"""
+    lines = [line.strip() for line in data.decode('utf-8').split('\n')]
+    if lines and not lines[-1]:
+        lines.pop()  # 文件末尾的换行
+    return lines
+
+
+def _read_source(filename):
+    """读取生日文件，返回 (去除首尾空白的各行, 内容的 SHA-256, 原始内容)"""
+    with open(filename, 'rb') as file:
+        data = file.read()
+    return _split_lines(data), _digest(data), data
+
+
+def _keep_data(calendar, data):
+    """完整读入内存的日历保留生日文件的原始内容（代替逐行列表，占用内存更少），供 reload_calendar() 使用"""
+    calendar.data = data
+    calendar.source = None
+
+
+def _encode_bad_lines(bad_lines):
+    return '\n'.join(f"{line_no}\t{line}" for line_no, line in bad_lines).encode('utf-8')
+
+
+def _decode_bad_lines(data):
+    bad_lines = []
+    for entry in data.decode('utf-8').split('\n') if data else ():
+        line_no, line = entry.split('\t', 1)
+        bad_lines.append((int(line_no), line))
+    return bad_lines
+
+
+def _read_header(calendar_path):
+    """读取日历文件头，返回 (文件头, 偏移表)；文件不存在或损坏时返回 (None, None)"""
+    try:
+        with open(calendar_path, 'rb') as file:
+            header = _HEADER.unpack(file.read(_HEADER.size))
+            offsets = _OFFSETS.unpack(file.read(_OFFSETS.size))
+    except (OSError, struct.error):
+        return None, None
+    if header[0] != _MAGIC or header[1] != CALENDAR_VERSION:
+        return None, None
+    return header, offsets
+
+
+def _read_section(calendar_path, start, end):
+    with open(calendar_path, 'rb') as file:
+        file.seek(start)
+        return file.read(end - start)
+
+
+def _open_calendar(calendar_path, header, offsets):
+    """不读取整个文件，只在查询时读取需要的那一格"""
+    calendar = OccurrenceCalendar(header[2])
+    calendar.count = header[3]
+    calendar.buckets = calendar.source = None
+    calendar.bad_lines = _decode_bad_lines(_read_section(calendar_path, offsets[-2], offsets[-1]))
+
+    def read_bucket(index):
+        data = _read_section(calendar_path, offsets[index], offsets[index + 1])
+        return data.decode('utf-8').split('\n') if data else []
+    calendar._reader = read_bucket
+    return calendar
+
+
+def _load_calendar(calendar_path, header, offsets):
+    """完整读取日历（增量更新时使用），文件损坏时返回None"""
+    try:
+        with open(calendar_path, 'rb') as file:
+            data = file.read()
+        calendar = OccurrenceCalendar(header[2])
+        calendar.count = header[3]
+        sections = [data[offsets[i]:offsets[i + 1]].decode('utf-8')
+                    for i in range(DAYS_PER_YEAR)] + [data[offsets[-1]:].decode('utf-8')]
+        calendar.buckets = [section.split('\n') if section else [] for section in sections[:-1]]
+        calendar.source = sections[-1].split('\n') if sections[-1] else []
+        calendar.bad_lines = _decode_bad_lines(data[offsets[-2]:offsets[-1]])
+    except Exception:
+        return None
+    return calendar
+
+
+def _write_calendar(calendar_path, calendar, stat, digest):
+    """写入日历文件（先写临时文件再替换，避免中途失败留下损坏的文件）"""
+    sections = [('\n'.join(bucket)).encode('utf-8') for bucket in calendar.buckets]
+    sections.append(_encode_bad_lines(calendar.bad_lines))
+    sections.append('\n'.join(calendar.source).encode('utf-8'))
+    offsets = []
+    position = _HEADER.size + _OFFSETS.size
+    for section in sections:
+        offsets.append(position)
+        position += len(section)
+
+    temp_path = f"{calendar_path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'wb') as file:
+            file.write(_HEADER.pack(_MAGIC, CALENDAR_VERSION, calendar.year, calendar.count,
+                                    stat.st_size, stat.st_mtime_ns, digest))
+            file.write(_OFFSETS.pack(*offsets))
+            file.writelines(sections)
+        os.replace(temp_path, calendar_path)
+    except OSError as e:
+        get_log().warning(f"无法写入生日日历 {calendar_path}: {e}",
+                          event='calendar_write_failed', path=calendar_path)
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def _touch_header(calendar_path, header, mtime_ns):
+    """内容未变而修改时间变了（如重新 checkout）时，只改写文件头中的修改时间"""
+    try:
+        with open(calendar_path, 'r+b') as file:
+            file.write(_HEADER.pack(*header[:5], mtime_ns, header[6]))
+    except OSError:
+        pass  # 下次运行再比较一次哈希即可
+
+
+def _report(bad_lines, errors):
+    for line_no, line in bad_lines:
+        get_log().warning(f"跳过格式不正确的行 (第{line_no}行): {line}",
+                          event='bad_line', line_no=line_no, line=line)
+    if errors is not None:
+        errors.extend(bad_lines)
+
+
+def load_calendar(filename, year, errors=None, use_cache=True, lazy=True):
+    """
+    读取生日文件在 year 年的生日日历，必要时编译或增量更新
+
+    日历文件以生日文件的大小、修改时间和内容哈希为键：
+    内容没变且年份相同时直接使用（只读取文件头，查询时再读需要的那一格）；
+    内容变了且年份相同时只重新换算变化的行；年份不同时整体重建。
+
+    参数:
+        filename: 包含生日数据的文件名
+        year: 公历年
+        errors: 可选列表，用于收集格式不正确的行 (行号, 内容)
+        use_cache: 为False时不读也不写日历文件，在内存中编译
+        lazy: 为True（默认）时日历文件未变化就只读取文件头，查询时再读取需要的那一格；
+              常驻进程应传入False，把整个日历读入内存，以免日历文件被其他进程重写后读错位置，
+              并保留生日文件的原始内容，修改后可用 reload_calendar() 增量更新
+
+    返回:
+        OccurrenceCalendar 对象
+    """
+    if not use_cache:
+        calendar = OccurrenceCalendar(year)
+        lines, _, data = _read_source(filename)
+        calendar.update(lines)
+        _report(calendar.bad_lines, errors)
+        if not lazy:
+            _keep_data(calendar, data)
+        return calendar
+
+    calendar_path = filename + CALENDAR_SUFFIX
+    stat = os.stat(filename)
+    header, offsets = _read_header(calendar_path)
+    if header is not None and header[2] == year and header[4] == stat.st_size:
+        unchanged = header[5] == stat.st_mtime_ns
+        data = None
+        if not unchanged or not lazy:
+            # 修改时间变了时比较内容；完整读入时也核对，以免保留的原始内容与日历不一致
+            with open(filename, 'rb') as file:
+                data = file.read()
+            same_content = _digest(data) == header[6]
+            if same_content and not unchanged:
+                _touch_header(calendar_path, header, stat.st_mtime_ns)
+            unchanged = same_content
+        if unchanged:
+            try:
+                if lazy:
+                    calendar = _open_calendar(calendar_path, header, offsets)
+                else:
+                    calendar = _load_calendar(calendar_path, header, offsets)
+            except Exception:
+                calendar = None
+            if calendar is not None:
+                _report(calendar.bad_lines, errors)
+                if not lazy:
+                    _keep_data(calendar, data)
+                return calendar
+            # 日历文件损坏，重新编译
+
+    calendar = None
+    if header is not None and header[2] == year:
+        calendar = _load_calendar(calendar_path, header, offsets)  # 同一年：增量更新
+    if calendar is None:
+        calendar = OccurrenceCalendar(year)  # 没有日历或跨年：整体重建
+    lines, digest, data = _read_source(filename)
+    calendar.update(lines)
+    _report(calendar.bad_lines, errors)
+    _write_calendar(calendar_path, calendar, stat, digest)
+    if not lazy:
+        _keep_data(calendar, data)
+    return calendar
+
+
+def reload_calendar(calendar, filename, errors=None):
+    """
+    生日文件修改后增量更新已完整读入内存的日历（常驻进程使用）
+
+    与上次的原始内容相比，前后相同的部分按块比较，只有夹在中间的行才解码、按行比较，
+    新增、删除的行重新换算并放入/移出日期格，修改一行的开销与变化的行数成正比。
+    不读取也不重写日历文件（下一个进程加载时会自己增量更新）。
+    只提示新增的格式不正确的行，已提示过的不再重复（其行号也不再更新）。
+
+    参数:
+        calendar: load_calendar(..., lazy=False) 返回的 OccurrenceCalendar
+        filename: 生日文件
+        errors: 可选列表，用于收集新增的格式不正确的行 (行号, 内容)
+
+    返回:
+        (新增的行, 删除的行)，均为 {行内容: 次数}；calendar 没有保留原始内容（lazy=True）时无法增量更新，返回None
+    """
+    if calendar.data is None:
+        return None
+    with open(filename, 'rb') as file:
+        data = file.read()
+    start, old_end, new_end = _changed_region(calendar.data, data)
+    old_lines = _split_lines(calendar.data[start:old_end])
+    new_lines = _split_lines(data[start:new_end])
+    added, removed = diff_lines([line for line in old_lines if line], [line for line in new_lines if line])
+    bad = calendar.apply(added, removed)
+
+    first_line_no = data.count(b'\n', 0, start) + 1
+    new_bad_lines = [(first_line_no + i, line) for i, line in enumerate(new_lines) if line in bad]
+    calendar.bad_lines = [entry for entry in calendar.bad_lines if entry[1] not in removed] + new_bad_lines
+    calendar.data = data
+    _report(new_bad_lines, errors)
+    return added, removed
+
+
+def calendar_for_year(calendar, year):
+    """
+    由已完整读入内存的日历保留的原始内容编译另一年的日历（常驻进程查询其他年份时使用）
+
+    不读取生日文件，也不读写日历文件（日历文件只保存今年的，供每日运行使用）；
+    两个日历共用同一份原始内容，格式不正确的行已在加载时提示过，这里不再提示。
+
+    参数:
+        calendar: load_calendar(..., lazy=False) 返回的 OccurrenceCalendar
+        year: 公历年
+
+    返回:
+        OccurrenceCalendar 对象
+    """
+    other = OccurrenceCalendar(year)
+    other.update(_split_lines(calendar.data))
+    _keep_data(other, calendar.data)
+    return other
+
+
+if __name__ == "__main__":
+    import argparse
+    from birthday_core import RunClock
+
+    parser = argparse.ArgumentParser(description="编译全年生日日历")
+    parser.add_argument('--year', type=int, help="公历年，默认为北京时间今年")
+    parser.add_argument('--file', default='birthdays.txt', help="生日文件路径")
+    args = parser.parse_args()
+
+    year = args.year or RunClock().today.year
+    calendar = load_calendar(args.file, year)
+    print(f"已编译 {year} 年生日日历 {args.file}{CALENDAR_SUFFIX}: {len(calendar)} 条记录")
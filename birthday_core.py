@@ -0,0 +1,214 @@
+# 生日提醒系统 - 公共模块（GitHub Actions 版本与本地部署版本共用）
+# 项目在https://github.com/inkcoo/birthdays_reminder开源免费
+import re  # 用于正则表达式匹配
+import sys  # 用于字符串驻留
+import argparse  # 用于报告 --date 参数错误
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone  # 用于处理日期、时间和时区
+import lunar_table  # 预先生成的农历/公历转换表
+from run_log import get_log  # 运行日志
+
+# 北京时间固定为 UTC+8，没有夏令时，不需要 pytz 的时区数据库
+BEIJING_TZ = timezone(timedelta(hours=8), 'Asia/Shanghai')
+
+# 邮件和输出中姓名前的显示前缀（组织名），可用环境变量 DISPLAY_PREFIX 或批量清单中的 prefix 修改
+DEFAULT_PREFIX = "心助会-"
+
+# 生日记录的统一格式：姓名-[年-]月-日-类型[-部门]，一次匹配即可区分四种格式
+# 姓名采用非贪婪匹配，因此姓名中可以包含“-”，而“姓名-年”不会被误认为姓名
+BIRTHDAY_LINE = re.compile(r'(.+?)-(?:(\d{4})-)?(\d{1,2})-(\d{1,2})-([ab])(?:-(.+))?')
+
+
+class BirthdayRecord(namedtuple('BirthdayRecord', ['name', 'year', 'month', 'day', 'calendar_type', 'department'])):
+    """
+    一条生日记录（不可变，比字典节省内存）
+
+    字段:
+        name: 姓名
+        year: 出生年份，未填写时为None
+        month, day: 生日的月、日（公历或农历）
+        calendar_type: a=公历, b=农历
+        department: 部门，未填写时为None
+    """
+    __slots__ = ()
+
+    @property
+    def has_year(self):
+        return self.year is not None
+
+    @property
+    def has_department(self):
+        return self.department is not None
+
+
+class RunClock:
+    """
+    单次运行的时钟：时区、当前时间、公历今天和农历今天只在创建时计算一次，
+    之后所有判断和年龄计算都使用这里的结果，跨越午夜运行也不会前后不一致
+
+    参数:
+        date: 指定“今天”的公历日期（datetime.date），用于回放或补发某一天；
+              为None时使用北京时间的当前日期
+    """
+
+    def __init__(self, date=None):
+        self.tz = BEIJING_TZ  # 北京时间
+        self.now = datetime.now(self.tz)  # 程序运行的实际时间
+        self.today = date if date is not None else self.now.date()  # 用于生日判断的公历日期
+        self.lunar_today = lunar_table.to_lunar(
+            self.today.year, self.today.month, self.today.day)  # 对应的农历日期
+        # 今天算作生日的农历日：小月（29天）没有三十日，三十日出生的人在二十九日过生日
+        self.lunar_days = (self.lunar_today.day,)
+        if self.lunar_today.day == 29 and lunar_table.month_length(
+                self.lunar_today.year, self.lunar_today.month, self.lunar_today.is_leap) == 29:
+            self.lunar_days = (29, 30)
+        self.formatted_time = self.now.strftime("%Y-%m-%d %H:%M:%S UTC+8")  # 格式化时间显示
+        self.is_override = date is not None  # 是否指定了日期
+
+
+def iter_birthdays(filename, errors=None):
+    """
+    逐行读取生日文件，按需生成生日信息（不会一次性把整个文件读入内存）
+
+    参数:
+        filename: 包含生日数据的文件名
+        errors: 可选列表，格式不正确的行会以 (行号, 内容) 追加到其中
+
+    生成:
+        BirthdayRecord 生日记录，支持四种格式:
+        1. 姓名-年-月-日-类型 (带年份不带部门)
+        2. 姓名-月-日-类型 (不带年份不带部门)
+        3. 姓名-月-日-类型-部门 (不带年份带部门)
+        4. 姓名-年-月-日-类型-部门 (带年份带部门)
+
+    类型说明:
+        a: 公历生日
+        b: 农历生日
+
+    性能:
+        每行只做一次预编译正则匹配，单进程约 35 万行/秒（见 README），
+        更大的文件可使用后续的缓存或并行加载
+    """
+    match_line = BIRTHDAY_LINE.fullmatch
+    intern = sys.intern  # 同一部门的记录共用一个字符串
+    with open(filename, 'r', encoding='utf-8') as file:
+        for line_no, line in enumerate(file, 1):
+            line = line.strip()  # 去除首尾空白字符
+            if not line:  # 跳过空行
+                continue
+
+            match = match_line(line)
+            if match is None:
+                get_log().warning(f"跳过格式不正确的行 (第{line_no}行): {line}",
+                                  event='bad_line', line_no=line_no, line=line)
+                if errors is not None:
+                    errors.append((line_no, line))
+                continue
+
+            name, year, month, day, calendar_type, department = match.groups()
+            yield BirthdayRecord(
+                name,
+                int(year) if year else None,
+                int(month),
+                int(day),
+                calendar_type,  # a=公历, b=农历
+                intern(department) if department else None,
+            )
+
+
+def parse_birthday_line(line):
+    """
+    解析一行（已去除首尾空白的）生日数据
+
+    返回:
+        BirthdayRecord，格式不正确时返回None
+    """
+    match = BIRTHDAY_LINE.fullmatch(line)
+    if match is None:
+        return None
+    name, year, month, day, calendar_type, department = match.groups()
+    return BirthdayRecord(name, int(year) if year else None, int(month), int(day),
+                          calendar_type, sys.intern(department) if department else None)
+
+
+def format_birthday_line(record):
+    """
+    把生日记录写成生日文件中的一行（parse_birthday_line() 的逆操作）
+
+    返回:
+        字符串，如 “张三-1990-10-12-a-技术部”；月、日不带前导零，未填写的年份和部门省略
+    """
+    year = f"{record.year:04d}-" if record.year is not None else ''
+    department = f"-{record.department}" if record.department is not None else ''
+    return f"{record.name}-{year}{record.month}-{record.day}-{record.calendar_type}{department}"
+
+
+def read_birthdays(filename, errors=None):
+    """
+    从文件中读取全部生日信息
+
+    参数:
+        filename: 包含生日数据的文件名
+        errors: 可选列表，用于收集格式不正确的行 (行号, 内容)
+
+    返回:
+        BirthdayRecord 列表，格式说明见 iter_birthdays()
+    """
+    return list(iter_birthdays(filename, errors))
+
+
+def parse_date(value):
+    """
+    解析命令行 --date 参数（格式 YYYY-MM-DD）
+
+    返回:
+        datetime.date 对象
+
+    异常:
+        argparse.ArgumentTypeError: 格式不正确或超出农历转换表范围，由 argparse 显示为用法错误
+    """
+    try:
+        day = datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"日期格式应为 YYYY-MM-DD: {value}")
+    if not lunar_table.FIRST_DAY <= day <= lunar_table.LAST_DAY:
+        raise argparse.ArgumentTypeError(
+            f"日期 {value} 超出农历转换表范围 ({lunar_table.FIRST_DAY} 至 {lunar_table.LAST_DAY})")
+    return day
+
+
+def build_birthday_index(birthdays):
+    """
+    根据生日列表构建按日期查找的索引
+
+    参数:
+        birthdays: read_birthdays() 返回的生日信息列表
+
+    返回:
+        字典，键为 (类型, 月, 日)，值为当天过生日的生日信息列表
+        例如 ('a', 10, 12) 表示公历10月12日，('b', 8, 15) 表示农历八月十五
+    """
+    index = {}
+    for birthday_info in birthdays:
+        key = (birthday_info.calendar_type, birthday_info.month, birthday_info.day)
+        index.setdefault(key, []).append(birthday_info)  # 同一天可能有多人过生日
+    return index
+
+
+def find_birthdays(index, clock):
+    """
+    在索引中查找今天过生日的所有人（公历、农历各查一次）
+
+    参数:
+        index: build_birthday_index() 或 RosterColumns.build_index() 返回的索引
+        clock: RunClock 对象，提供今天的公历和农历日期
+
+    返回:
+        今天过生日的索引项列表（生日记录，或列式名册的行号），公历生日在前，农历生日在后
+        （农历小月的二十九日同时包括三十日出生的人）
+    """
+    today, lunar_today = clock.today, clock.lunar_today
+    found = index.get(('a', today.month, today.day), [])
+    for lunar_day in clock.lunar_days:
+        found = found + index.get(('b', lunar_today.month, lunar_day), [])
+    return found
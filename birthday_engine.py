@@ -0,0 +1,616 @@
+# 生日提醒系统 - 生日查询引擎（可在其他程序中导入使用的库接口）
+# 项目在https://github.com/inkcoo/birthdays_reminder开源免费
+#
+# 生日列表只加载一次，之后“今天谁过生日”“某天谁过生日”“未来一周谁过生日”“每人几岁”
+# 都在内存中的索引上查询，同一天的结果会被缓存，适合在常驻的程序（如内部门户）中反复调用，
+# 不必每次启动子进程、重新解析生日文件:
+#     from birthday_engine import BirthdayEngine
+#     engine = BirthdayEngine('birthdays.txt')
+#     engine.today()                        # 今天（北京时间）过生日的 BirthdayRecord 列表
+#     engine.on(date(2025, 10, 18))         # 某天过生日的人
+#     engine.upcoming(7)                    # 未来7天（含今天）[(公历日期, BirthdayRecord), ...]
+#     engine.ages()                         # 所有人今天的年龄（与 engine.roster() 的行对应）
+#     engine.department('技术部')            # 某个部门的人
+#     engine.refresh()                      # 生日文件修改后增量更新，返回 RosterDelta（如“新增 3 人，删除 1 人”）
+#     engine.reload()                       # 丢弃全部已加载的内容，下次查询时重新加载
+#
+# 年龄计算、显示格式、邮件渲染、收件人规则和邮件投递也都在这里，
+# birthday_reminder.py（GitHub Actions）和 birthday_reminder-local.py（本地部署）只是它的命令行界面。
+import os  # 用于访问环境变量
+from collections import Counter, namedtuple
+from datetime import date, datetime  # 用于取北京时间的今天
+import lunar_table  # 预先生成的农历/公历转换表
+import run_metrics
+import sent_ledger
+import mail_spool
+from birthday_core import BEIJING_TZ, DEFAULT_PREFIX, RunClock, parse_birthday_line
+from birthday_calendar import birthday_slots, calendar_for_year, load_calendar, reload_calendar  # 预先编译的全年生日日历
+from run_log import get_log
+# 解析快照（roster_store，可能加载 NumPy）、近期生日查询（occurrences）、快速扫描（today_scan）和
+# 邮件投递（delivery，加载 smtplib 和 email）只在用到时才导入
+
+# 邮件页脚显示的来源，本地部署版本传入 “来自本地自动任务”
+MAIL_SOURCE = "来自 GitHub 自动任务"
+MAX_CACHED_DAYS = 400  # 最多缓存多少天的查询结果，超过时清空重新缓存
+MAX_CACHED_YEARS = 3  # 最多在内存中保留几年的生日日历，超过时丢弃最早加载的一年（今年的除外）
+MAX_CACHED_UPCOMING = 4  # 最多保留几个起算日期的近期生日索引，超过时清空重新构建
+
+
+def beijing_today():
+    """返回北京时间的今天（datetime.date）"""
+    return datetime.now(BEIJING_TZ).date()
+
+
+class FileWatcher:
+    """轮询文件的修改时间和大小，changed() 返回自上次检查以来是否有变化"""
+
+    def __init__(self, path):
+        self.path = path
+        self._stamp = self._stat()
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None  # 文件暂时不存在（如编辑器保存时先删除再写入）
+        return stat.st_mtime_ns, stat.st_size
+
+    def changed(self):
+        stamp = self._stat()
+        changed, self._stamp = stamp != self._stamp, stamp
+        return changed and stamp is not None
+
+
+class RosterDelta(namedtuple('RosterDelta', ['added', 'removed', 'changed'])):
+    """
+    增量重新加载时生日列表的变化（格式不正确的行，以及只改了写法、解析结果相同的行都不计入）
+
+    字段:
+        added: 新增的 BirthdayRecord 列表
+        removed: 删除的 BirthdayRecord 列表
+        changed: 修改的 [(原记录, 新记录), ...]，同名的一条删除、一条新增视为修改
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_lines(cls, added, removed):
+        """由新增、删除的行（{行内容: 次数}，见 birthday_calendar.diff_lines()）构建"""
+        def parse(lines):
+            records = Counter()
+            for line, count in sorted(lines.items()):
+                birthday_info = parse_birthday_line(line)
+                if birthday_info is not None:
+                    records[birthday_info] += count
+            return records
+
+        added_records, removed_records = parse(added), parse(removed)
+        unchanged = added_records & removed_records  # 只改了写法的行
+        added_records -= unchanged
+        removed_records -= unchanged
+
+        by_name = {}  # 姓名 -> 删除的记录
+        for birthday_info in removed_records.elements():
+            by_name.setdefault(birthday_info.name, []).append(birthday_info)
+        new, changed = [], []
+        for birthday_info in added_records.elements():
+            old = by_name.get(birthday_info.name)
+            if old:
+                changed.append((old.pop(0), birthday_info))
+            else:
+                new.append(birthday_info)
+        return cls(new, [birthday_info for old in by_name.values() for birthday_info in old], changed)
+
+    def __str__(self):
+        parts = [f"{label} {len(items)} 人" for label, items in
+                 (("新增", self.added), ("删除", self.removed), ("修改", self.changed)) if items]
+        return "，".join(parts) or "没有变化"
+
+
+def calculate_age(birthday_info, clock):
+    """
+    计算年龄（仅适用于有年份的情况）
+    
+    参数:
+        birthday_info: BirthdayRecord 生日记录
+        clock: RunClock 对象，提供本次运行的“今天”
+        
+    返回:
+        年龄数值（整数）或None（无年份信息时）
+    """
+    if not birthday_info.has_year:  # 检查是否有年份信息
+        return None
+        
+    today = clock.today  # 本次运行的公历日期
+    calendar_type = birthday_info.calendar_type
+    birth_year = birthday_info.year
+    birth_month = birthday_info.month
+    birth_day = birthday_info.day
+    
+    if calendar_type == 'a':  # 公历生日
+        age = today.year - birth_year  # 计算年份差
+        # 如果今年生日还没过，年龄减1
+        if (today.month, today.day) < (birth_month, birth_day):
+            age -= 1
+        return age
+    elif calendar_type == 'b':  # 农历生日
+        try:
+            # 将农历生日转换为公历日期
+            solar_date = lunar_table.to_solar(birth_year, birth_month, birth_day)
+            age = today.year - solar_date.year
+            # 如果今年生日还没过，年龄减1
+            if (today.month, today.day) < (solar_date.month, solar_date.day):
+                age -= 1
+            return age
+        except Exception as e:
+            get_log().warning(f"农历年龄计算错误: {e}")
+            return None
+    return None
+
+
+def is_birthday_today(birthday_info, clock):
+    """
+    检查今天是否是某人的生日
+    
+    参数:
+        birthday_info: BirthdayRecord 生日记录
+        clock: RunClock 对象，提供本次运行的公历和农历日期
+        
+    返回:
+        True表示今天是生日，False表示不是
+    """
+    today = clock.today  # 本次运行的公历日期
+    calendar_type = birthday_info.calendar_type
+
+    if calendar_type == 'a':  # 公历生日
+        # 比较月份和日期是否匹配
+        return today.month == birthday_info.month and today.day == birthday_info.day
+    elif calendar_type == 'b':  # 农历生日
+        lunar_today = clock.lunar_today  # 本次运行的农历日期
+        # 比较农历月份和日期是否匹配（小月的二十九日也是三十日出生的人的生日）
+        return lunar_today.month == birthday_info.month and birthday_info.day in clock.lunar_days
+    return False
+
+
+def format_birthday_display(birthday_info, clock):
+    """
+    格式化生日显示信息
+    
+    参数:
+        birthday_info: BirthdayRecord 生日记录
+        clock: RunClock 对象，用于计算年龄
+        
+    返回:
+        格式化后的生日显示字符串
+    """
+    name = birthday_info.name
+    department = birthday_info.department  # 获取部门信息（可能为None）
+    calendar_type = "(公历)" if birthday_info.calendar_type == 'a' else "(农历)"  # 日历类型显示
+    
+    # 计算年龄（如果有年份信息）
+    age_info = ""
+    if birthday_info.has_year:
+        age = calculate_age(birthday_info, clock)
+        if age is not None:
+            age_info = f"，{age}岁"
+    
+    # 根据是否有部门信息构建不同的显示格式
+    if department:
+        display_name = f"({department}) {name} {calendar_type}{age_info}"
+    else:
+        display_name = f"{name} {calendar_type}{age_info}"
+    
+    return display_name
+
+
+def render_body(heading, content, clock, templates=None, source=MAIL_SOURCE):
+    """
+    把正文套入邮件页面模板 templates/layout.html
+
+    参数:
+        heading: 页面标题
+        content: 已渲染的正文 HTML
+        clock: RunClock 对象，用于显示发送时间
+        templates: 可选，MailTemplates 对象，默认使用 mail_template.default_templates()
+        source: 页脚显示的邮件来源
+
+    返回:
+        完整的邮件 HTML
+    """
+    if templates is None:
+        from mail_template import default_templates  # 只在需要发邮件时才加载模板
+        templates = default_templates()
+    return templates.render('layout.html', heading=heading, time_label="邮件发送时间",
+                            sent_at=clock.formatted_time, source=source,
+                            raw={'content': content})
+
+
+def build_email(birthdays, clock, prefix=DEFAULT_PREFIX, templates=None, source=MAIL_SOURCE):
+    """
+    构建生日提醒邮件的主题和HTML正文
+
+    参数:
+        birthdays: 今天过生日的 BirthdayRecord 列表（至少一人）
+        clock: RunClock 对象，用于计算年龄和显示发送时间
+        prefix: 姓名前的显示前缀（组织名）
+        templates: 可选，MailTemplates 对象，默认使用 mail_template.default_templates()
+        source: 页脚显示的邮件来源
+
+    返回:
+        (邮件主题, 邮件正文)
+    """
+    if templates is None:
+        from mail_template import default_templates
+        templates = default_templates()
+    if len(birthdays) == 1:
+        # 单人生日邮件内容
+        display_name = format_birthday_display(birthdays[0], clock)
+        subject = f"生日提醒: 今天是{prefix}{display_name}的生日"
+        content = templates.render('single.html', prefix=prefix, name=display_name)
+    else:
+        # 多人生日邮件内容：名单逐项渲染后一次性拼接
+        subject = "生日提醒: 今天有多位成员的生日"
+        items = templates.render_each('list_item.html', (
+            {'prefix': prefix, 'name': format_birthday_display(birthday, clock)} for birthday in birthdays))
+        content = templates.render('list.html', raw={'items': items})
+
+    return subject, render_body("生日提醒", content, clock, templates, source)
+
+
+def build_digest_email(upcoming, clock, days, prefix=DEFAULT_PREFIX, templates=None, source=MAIL_SOURCE):
+    """
+    构建近期生日摘要邮件的主题和HTML正文
+
+    参数:
+        upcoming: [(公历日期, BirthdayRecord), ...]，按日期排序
+        clock: 本次运行的 RunClock 对象
+        days: 查询的天数
+        prefix: 姓名前的显示前缀（组织名）
+        templates: 可选，MailTemplates 对象，默认使用 mail_template.default_templates()
+        source: 页脚显示的邮件来源
+
+    返回:
+        (邮件主题, 邮件正文)
+    """
+    if templates is None:
+        from mail_template import default_templates
+        templates = default_templates()
+    weekdays = "一二三四五六日"
+    day_clocks = {}  # 按生日当天计算年龄，同一天只创建一个时钟
+
+    def rows():
+        for occurrence, birthday in upcoming:
+            if occurrence not in day_clocks:
+                day_clocks[occurrence] = RunClock(occurrence)
+            offset = (occurrence - clock.today).days
+            yield {
+                'month': occurrence.month,
+                'day': occurrence.day,
+                'weekday': weekdays[occurrence.weekday()],
+                'when': "今天" if offset == 0 else f"{offset}天后",
+                'prefix': prefix,
+                'name': format_birthday_display(birthday, day_clocks[occurrence]),
+            }
+
+    subject = f"生日提醒: 未来{days}天有{len(upcoming)}位成员过生日"
+    content = templates.render('digest.html', days=days, month=clock.today.month, day=clock.today.day,
+                               raw={'items': templates.render_each('digest_item.html', rows())})
+    return subject, render_body("近期生日", content, clock, templates, source)
+
+
+def reminder_recipients(items, department_of=None):
+    """
+    确定提醒邮件的收件人（两个提醒脚本共用同一规则）
+
+    成员（SMTP_USER）和管理员（ADMIN_EMAIL）收到全部生日，
+    部门收件人（departments.txt）只收到自己负责部门的生日
+
+    参数:
+        items: 生日记录列表，或近期生日的 (公历日期, 生日记录) 列表
+        department_of: 可选，从列表元素取部门的函数（元素不是 BirthdayRecord 时使用）
+
+    返回:
+        {收件人邮箱: [该收件人应收到的元素, ...]}
+    """
+    from delivery import read_department_recipients, route_birthdays
+
+    recipients = {email: items for email in (os.getenv('SMTP_USER'), os.getenv('ADMIN_EMAIL')) if email}
+    for email, entries in route_birthdays(items, read_department_recipients(), department_of).items():
+        recipients.setdefault(email, entries)
+    return recipients
+
+
+def send_mail(recipients, clock, render, roster=sent_ledger.DEFAULT_ROSTER, ledger=None, spool=False,
+              key=sent_ledger.person_key):
+    """
+    渲染并投递提醒邮件（或放入发送队列），今天已发送过的不再发送
+
+    参数:
+        recipients: reminder_recipients() 返回的 {收件人邮箱: [元素, ...]}
+        clock: 本次运行的 RunClock 对象
+        render: 函数，由一位收件人的元素列表生成 (邮件主题, 邮件正文)
+        roster: 发送记录和发送队列中的名册名称
+        ledger: 可选，SentLedger 发送记录
+        spool: 为True时只把邮件放入发送队列，由 mail_spool.py flush 投递
+        key: 从列表元素取发送记录键的函数
+
+    返回:
+        退出代码，0表示成功，1表示有邮件发送失败（或无法写入发送队列）
+    """
+    from delivery import Message, deliver, print_delivery_report
+
+    if not recipients:
+        get_log().warning("警告：未配置 SMTP_USER、ADMIN_EMAIL 或部门收件人，跳过邮件发送", event='no_recipients')
+        return 0
+    metrics = run_metrics.get_metrics()
+    # 重新运行或重试时，今天已发送过的邮件不再发送，只补发缺少的
+    if ledger is not None:
+        recipients = ledger.pending(clock.today, roster, recipients, key)
+    with metrics.phase('render', len(recipients)):
+        messages = [Message(email, *render(items)) for email, items in recipients.items()]
+    if spool:
+        return mail_spool.spool_messages(messages, clock.today, roster, recipients, key)
+    # 多个SMTP连接并发发送，每个连接只登录一次，可用 SMTP_RATE 限速
+    results = deliver(messages)
+    if ledger is not None:
+        ledger.record_results(clock.today, roster, recipients, results, key)
+    return 1 if print_delivery_report(results) else 0
+
+
+class BirthdayEngine:
+    """
+    生日查询引擎
+
+    参数:
+        filename: 生日文件，默认 birthdays.txt
+        database: 可选，RosterDB 生日数据库，给出时从数据库查询，不读取 filename
+        use_cache: 是否使用并更新生日日历（birthdays.txt.calendar）和解析快照（birthdays.txt.cache）
+        workers: 需要重新解析大生日文件时使用的进程数（见 parallel_load.read_roster()）
+        lazy: 为True时生日日历只读取文件头，查询时再读取需要的那一格，适合只查询一次的命令行；
+              常驻进程应保持默认的False，把日历整个读入内存
+        scan: 为True时 on() 直接扫描生日文件中月、日相同的候选行（见 today_scan），不加载生日日历
+
+    某天的生日由该年的生日日历查出（农历生日已换算为公历日期），近期生日和年龄由整个名册
+    （RosterColumns）计算，两者都在第一次用到时才加载。文件不存在或无法读取时抛出 OSError。
+    日历文件只保存北京时间今年的，不会被其他年份的查询覆盖；on() 查询其他年份的某天时直接在整个名册中
+    查找（RosterColumns.birthdays_on()），不必为偶尔查询的年份编译整年的日历。
+    """
+
+    def __init__(self, filename='birthdays.txt', database=None, use_cache=True, workers=None, lazy=False,
+                 scan=False):
+        self.filename = filename
+        self.database = database
+        self.use_cache = use_cache
+        self.workers = workers
+        self.lazy = lazy
+        self.scan = scan
+        self._calendars = {}  # 年份 -> OccurrenceCalendar（完整读入内存时共用同一份生日文件原始内容）
+        self._roster = None  # RosterColumns，近期生日和年龄查询时才加载
+        self._roster_data = None  # 名册由哪一份生日文件原始内容构建（直接读取文件时为None）
+        self._days = {}  # 日期 -> 当天过生日的记录（元组）
+        self._upcoming = {}  # 起算日期 -> UpcomingIndex，名册的行号变化后失效
+        self._departments = None  # 部门 -> 该部门的记录列表（按生日列表中的顺序），第一次按部门查询时构建
+
+    def reload(self):
+        """丢弃已加载的名册和缓存的查询结果，下一次查询时重新读取（生日文件修改后调用）"""
+        self._calendars.clear()
+        self._roster = None
+        self._roster_data = None
+        self._days.clear()
+        self._upcoming.clear()
+        self._departments = None
+
+    def refresh(self):
+        """
+        生日文件修改后增量更新已加载的名册（常驻进程使用）
+
+        与上次加载的版本比较（见 birthday_calendar.reload_calendar()），只解析、换算新增和删除的行：
+        生日日历的日期格、整个名册（RosterColumns）和缓存的查询结果都只改动受影响的部分，
+        修改一行的开销与变化的行数成正比，不必重新解析整个文件。
+        已加载的每一年的日历和部门索引都按同一组变化更新；近期生日索引（行号已变化）全部丢弃。
+        生日日历未完整读入内存（lazy=True 或尚未查询）、使用生日数据库或快速扫描时无法增量更新，
+        改为调用 reload()；读取生日文件失败时也调用 reload()，下一次查询时再报告错误。
+
+        返回:
+            RosterDelta；调用了 reload() 时返回None
+        """
+        lines = None
+        calendars = list(self._calendars.values())
+        if self.database is None and calendars and all(calendar.data is not None for calendar in calendars):
+            try:
+                lines = reload_calendar(calendars[0], self.filename)
+            except (OSError, UnicodeDecodeError):
+                lines = None
+        if lines is None:
+            self.reload()
+            return None
+        if self._roster is not None and self._roster_data is None:
+            # 名册不是由日历保留的原始内容构建的，可能来自另一个版本的文件，不能套用这次的变化
+            self._roster = None
+            self._departments = None
+        for other in calendars[1:]:  # 各年的日历共用同一份原始内容，变化相同
+            other.apply(*lines)
+            other.data, other.bad_lines = calendars[0].data, calendars[0].bad_lines
+
+        delta = RosterDelta.from_lines(*lines)
+        removed = delta.removed + [old for old, _ in delta.changed]
+        added = delta.added + [new for _, new in delta.changed]
+        if self._roster is not None:
+            rows = []
+            for birthday_info, count in Counter(removed).items():
+                rows.extend(self._roster.find(birthday_info)[:count])
+            self._roster.delete(rows)
+            for birthday_info in added:
+                self._roster.append(birthday_info)
+            self._roster_data = calendars[0].data
+        if self._departments is not None:
+            for birthday_info in removed:  # 与名册一样，找不到的记录直接跳过
+                members = self._departments.get(birthday_info.department)
+                if members and birthday_info in members:
+                    members.remove(birthday_info)
+            for birthday_info in added:
+                self._departments.setdefault(birthday_info.department, []).append(birthday_info)
+        self._upcoming.clear()
+        self._forget(removed + added)
+        return delta
+
+    def _forget(self, records):
+        """丢弃这些记录过生日的那几天的缓存结果，其他日期的缓存保留"""
+        if not records or not self._days:
+            return
+        keys = {(record.calendar_type, record.month, record.day) for record in records}
+        for year in {day.year for day in self._days}:
+            first = date(year, 1, 1).toordinal()
+            for key in keys:
+                for slot in birthday_slots(*key, year):
+                    self._days.pop(date.fromordinal(first + slot), None)
+
+    def calendar(self, year):
+        """
+        返回 year 年的生日日历，必要时加载（最多保留 MAX_CACHED_YEARS 年）
+
+        只有北京时间今年的日历读写日历文件；其他年份已有完整读入内存的日历时由其原始内容编译，
+        否则重新读取生日文件，都只保存在内存中。
+
+        返回:
+            OccurrenceCalendar；使用生日数据库时返回数据库本身（查询接口相同）
+        """
+        if self.database is not None:
+            return self.database
+        calendar = self._calendars.get(year)
+        if calendar is not None:
+            return calendar
+        persist = self.use_cache and year == beijing_today().year
+        loaded = next((other for other in self._calendars.values() if other.data is not None), None)
+        if loaded is not None and not persist:
+            calendar = calendar_for_year(loaded, year)
+        else:
+            calendar = load_calendar(self.filename, year, use_cache=persist, lazy=self.lazy)
+            if calendar.data is not None and (loaded is not None and calendar.data != loaded.data
+                                              or self._roster is not None and calendar.data != self._roster_data):
+                self.reload()  # 生日文件已修改（或名册直接读自文件），其他年份的日历、名册和缓存的结果都可能已过时
+        if len(self._calendars) >= MAX_CACHED_YEARS:  # 丢弃最早加载的一年，今年的保留
+            this_year = beijing_today().year
+            self._calendars.pop(next(other for other in self._calendars if other != this_year))
+        self._calendars[year] = calendar
+        return calendar
+
+    def roster(self):
+        """
+        返回整个名册，必要时加载（内容未变时直接使用解析快照）
+
+        已有完整读入内存的生日日历时，名册由日历保留的原始内容构建，不再读取文件，
+        保证两者来自同一版本的生日文件，refresh() 的变化才能同时用于两者。
+
+        返回:
+            RosterColumns；使用生日数据库时返回数据库本身
+        """
+        if self.database is not None:
+            return self.database
+        if self._roster is None:
+            from roster_store import RosterColumns, load_roster  # 生日名册及解析快照
+            data = next((calendar.data for calendar in self._calendars.values() if calendar.data is not None), None)
+            if data is not None:
+                # 格式不正确的行已在加载日历时提示过
+                lines = (line.strip() for line in data.decode('utf-8').split('\n'))
+                self._roster = RosterColumns.from_records(
+                    birthday_info for birthday_info in map(parse_birthday_line, lines) if birthday_info is not None)
+            else:
+                self._roster = load_roster(self.filename, use_cache=self.use_cache, workers=self.workers)[0]
+            self._roster_data = data
+        return self._roster
+
+    def __len__(self):
+        """有效记录数"""
+        if self._roster is not None:
+            return len(self._roster)
+        return len(self.calendar(beijing_today().year))
+
+    def records(self):
+        """逐条生成全部生日记录（格式不正确的行已在加载时提示，这里直接跳过）"""
+        if self.database is not None or self._roster is not None:
+            yield from self.roster().records()
+            return
+        with open(self.filename, 'r', encoding='utf-8') as file:
+            for line in file:
+                birthday_info = parse_birthday_line(line.strip())
+                if birthday_info is not None:
+                    yield birthday_info
+
+    def on(self, day):
+        """
+        查找某天过生日的人
+
+        参数:
+            day: datetime.date
+
+        返回:
+            BirthdayRecord 列表，公历生日在前，农历生日在后（农历小月的二十九日包括三十日出生的人）
+        """
+        found = self._days.get(day)
+        if found is None:
+            if self.scan and self.database is None:
+                from today_scan import scan_today  # 只完整解析候选行
+                found = scan_today(self.filename, RunClock(day))
+            elif self.database is None and day.year != beijing_today().year and day.year not in self._calendars:
+                # 其他年份：在名册中按月、日查找，不编译整年的日历
+                records = list(self.roster().records(self.roster().birthdays_on(RunClock(day))))
+                found = ([record for record in records if record.calendar_type == 'a']
+                         + [record for record in records if record.calendar_type == 'b'])
+            else:
+                found = self.calendar(day.year).on(day)
+            if len(self._days) >= MAX_CACHED_DAYS:
+                self._days.clear()
+            found = self._days[day] = tuple(found)
+        return list(found)
+
+    def today(self):
+        """查找今天（北京时间）过生日的人，见 on()"""
+        return self.on(beijing_today())
+
+    def upcoming(self, days, start=None):
+        """
+        查询从 start 起 days 天内（含当天）过生日的人
+
+        参数:
+            days: 天数，1 表示只查当天
+            start: datetime.date，默认为北京时间的今天
+
+        返回:
+            [(公历日期, BirthdayRecord), ...]，按日期排序
+        """
+        start = start or beijing_today()
+        roster = self.roster()
+        if self.database is not None:
+            return roster.upcoming(start, days)
+        index = self._upcoming.get(start)
+        if index is None:
+            from occurrences import UpcomingIndex  # 近期生日查询
+            if len(self._upcoming) >= MAX_CACHED_UPCOMING:
+                self._upcoming.clear()
+            index = self._upcoming[start] = UpcomingIndex(roster, start)  # 排序一次，之后每次只二分查找
+        return [(occurrence, roster[row]) for occurrence, row in index.window(days)]
+
+    def ages(self, day=None):
+        """
+        计算所有人在 day（默认为北京时间的今天）的年龄
+
+        返回:
+            与 roster() 等长、行号对应的年龄序列，没有年份或无法计算的为-1（见 RosterColumns.ages()）
+        """
+        return self.roster().ages(RunClock(day))
+
+    def department(self, name):
+        """返回某个部门的全部记录（按生日列表中的顺序），没有这个部门时返回空列表"""
+        if self.database is not None:
+            return self.database.department(name)
+        if self._departments is None:
+            # 由整个名册构建一次，之后每次查询只查字典；refresh() 时随名册一起增量更新
+            departments = {}
+            for record in self.roster().records():
+                departments.setdefault(record.department, []).append(record)
+            self._departments = departments
+        return list(self._departments.get(name, ()))
+
+    def age(self, birthday_info, day=None):
+        """计算一个人在 day（默认为北京时间的今天）的年龄，没有年份时返回None"""
+        return calculate_age(birthday_info, RunClock(day))
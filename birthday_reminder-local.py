@@ -1,284 +1,288 @@
-# 生日提醒系统 - 本地部署版本
-import smtplib
-from email.mime.text import MIMEText
-from datetime import datetime
-import lunardate
-import pytz
+# 生日提醒系统 - 本地部署版本（birthday_engine 的命令行界面，另有常驻模式）
 import os
 import sys
-import re
+import signal
+import argparse
+import threading
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
+import run_log
+import run_metrics
+import sent_ledger
+import mail_spool
+import roster_db
+from birthday_core import DEFAULT_PREFIX, RunClock, parse_date
+from birthday_engine import BirthdayEngine, FileWatcher, build_digest_email, build_email, \
+    format_birthday_display, reminder_recipients, send_mail
+# roster_store、occurrences、delivery（邮件相关模块）只在用到时才导入，没有人过生日时启动更快
 
 # 加载环境变量
 load_dotenv('email.env')
 
-def read_birthdays(filename):
-    """读取生日列表文件"""
-    birthdays = []
-    if not os.path.exists(filename):
-        print(f"错误：找不到文件 {filename}")
-        return birthdays
-        
-    with open(filename, 'r', encoding='utf-8') as file:
-        for line in file:
-            line = line.strip()
-            if not line:
-                continue
-            
-            # 匹配四种格式
-            patterns = [
-                r'^(.+)-(\d{4})-(\d{1,2})-(\d{1,2})-(a|b)-(.+)$',  # 姓名-年-月-日-类型-部门
-                r'^(.+)-(\d{1,2})-(\d{1,2})-(a|b)-(.+)$',          # 姓名-月-日-类型-部门
-                r'^(.+)-(\d{4})-(\d{1,2})-(\d{1,2})-(a|b)$',      # 姓名-年-月-日-类型
-                r'^(.+)-(\d{1,2})-(\d{1,2})-(a|b)$'               # 姓名-月-日-类型
-            ]
-            
-            for i, pattern in enumerate(patterns):
-                match = re.match(pattern, line)
-                if match:
-                    groups = match.groups()
-                    if i in [0, 1]:  # 带部门
-                        if i == 0:  # 带年份带部门
-                            name, year, month, day, calendar_type, department = groups
-                            year = int(year)
-                        else:  # 不带年份带部门
-                            name, month, day, calendar_type, department = groups
-                            year = None
-                    else:  # 不带部门
-                        if i == 2:  # 带年份不带部门
-                            name, year, month, day, calendar_type = groups
-                            year = int(year)
-                        else:  # 不带年份不带部门
-                            name, month, day, calendar_type = groups
-                            year = None
-                        department = None
-                    
-                    birthdays.append({
-                        'name': name,
-                        'year': year,
-                        'month': int(month),
-                        'day': int(day),
-                        'calendar_type': calendar_type,
-                        'department': department,
-                        'has_year': year is not None,
-                        'has_department': department is not None
-                    })
-                    break
-            else:
-                print(f"跳过格式错误的行: {line}")
-    
-    return birthdays
+# 姓名前的显示前缀（组织名），可在 email.env 中用 DISPLAY_PREFIX 修改
+DISPLAY_PREFIX = os.getenv('DISPLAY_PREFIX') or DEFAULT_PREFIX
+MAIL_SOURCE = "来自本地自动任务"  # 邮件页脚显示的来源
 
-def calculate_age(birthday_info):
-    """计算年龄"""
-    if not birthday_info['has_year']:
-        return None
+def send_upcoming_digest(engine, clock, days, ledger=None, spool=False):
+    """查询未来 days 天的生日，输出并发送摘要邮件（engine 为生日查询引擎；
+    ledger 为发送记录，今天已发送过的生日不再发送；spool 为True时只放入发送队列）"""
+    log = run_log.get_log()
+    metrics = run_metrics.get_metrics()
+    with metrics.phase('match', len(engine.roster())):
+        upcoming = engine.upcoming(days, clock.today)
+    metrics.set('birthdays_upcoming', len(upcoming))
     
-    tz = pytz.timezone('Asia/Shanghai')
-    today = datetime.now(tz)
+    log.info("="*50)
+    if not upcoming:
+        log.info(f"未来{days}天没有人过生日。", event='upcoming', days=days, count=0)
+        return
+    log.info(f"未来{days}天生日 ({len(upcoming)}人):", event='upcoming', days=days, count=len(upcoming))
+    with metrics.phase('format', len(upcoming)):
+        for i, (occurrence, birthday) in enumerate(upcoming, 1):
+            log.info(f"{i}. {occurrence.isoformat()} {DISPLAY_PREFIX} {format_birthday_display(birthday, clock)}",
+                     event='upcoming_birthday', date=occurrence, name=birthday.name, department=birthday.department)
     
-    if birthday_info['calendar_type'] == 'a':  # 公历
-        age = today.year - birthday_info['year']
-        if (today.month, today.day) < (birthday_info['month'], birthday_info['day']):
-            age -= 1
-        return age
-    else:  # 农历
-        try:
-            solar_date = lunardate.LunarDate(birthday_info['year'], birthday_info['month'], birthday_info['day']).toSolarDate()
-            age = today.year - solar_date.year
-            if (today.month, today.day) < (solar_date.month, solar_date.day):
-                age -= 1
-            return age
-        except Exception as e:
-            print(f"农历年龄计算错误: {e}")
-            return None
+    recipients = reminder_recipients(upcoming, department_of=lambda item: item[1].department)
+    send_mail(recipients, clock, lambda entries: build_digest_email(entries, clock, days, DISPLAY_PREFIX,
+                                                                    source=MAIL_SOURCE),
+              sent_ledger.DEFAULT_ROSTER + sent_ledger.UPCOMING_SUFFIX, ledger, spool, sent_ledger.occurrence_key)
 
-def is_birthday_today(birthday_info):
-    """检查是否是今天生日"""
-    tz = pytz.timezone('Asia/Shanghai')
-    today = datetime.now(tz)
-    
-    if birthday_info['calendar_type'] == 'a':  # 公历
-        return today.month == birthday_info['month'] and today.day == birthday_info['day']
-    else:  # 农历
-        lunar_today = lunardate.LunarDate.fromSolarDate(today.year, today.month, today.day)
-        return lunar_today.month == birthday_info['month'] and lunar_today.day == birthday_info['day']
+def log_other_birthdays(engine, today_birthdays, clock):
+    """逐条输出不是今天生日的记录（仅 --verbose）"""
+    log = run_log.get_log()
+    todays = set(today_birthdays)
+    for birthday_info in engine.records():  # 格式不正确的行已在读取日历时提示
+        if birthday_info not in todays:
+            log.detail(f"{DISPLAY_PREFIX} {format_birthday_display(birthday_info, clock)} 今天不是生日。",
+                       event='not_birthday', name=birthday_info.name)
 
-def format_display(birthday_info):
-    """格式化显示信息"""
-    name = birthday_info['name']
-    department = birthday_info.get('department')
-    calendar_type = "(公历)" if birthday_info['calendar_type'] == 'a' else "(农历)"
+def remind_today(engine, clock, ledger=None, spool=False):
+    """查找今天过生日的人并发送提醒邮件（engine 为生日查询引擎；
+    ledger 为发送记录，今天已发送过的邮件不再发送；spool 为True时只放入发送队列）"""
+    metrics = run_metrics.get_metrics()
+    # 只读取日历中今天那一格的公历、农历生日；--scan 时只解析月、日与今天相同的候选行
+    with metrics.phase('match') as phase:
+        today_birthdays = engine.on(clock.today)
+        phase.count = len(today_birthdays)
+    metrics.set('birthdays_today', len(today_birthdays))
+    log = run_log.get_log()
+    # 不是今天生日的记录只在 --verbose 时才格式化（需要计算年龄、换算农历）
+    if log.enabled(run_log.VERBOSE):
+        log_other_birthdays(engine, today_birthdays, clock)
     
-    age_info = ""
-    if birthday_info['has_year']:
-        age = calculate_age(birthday_info)
-        if age is not None:
-            age_info = f"，{age}岁"
+    # 显示结果
+    log.info(f"\n运行时间: {clock.formatted_time}", event='run', date=clock.today, birthdays=len(today_birthdays))
+    log.info("="*50)
     
-    if department:
-        return f"({department}) {name} {calendar_type}{age_info}"
+    if today_birthdays:
+        log.info(f"今日生日总结 ({len(today_birthdays)}人):")
+        with metrics.phase('format', len(today_birthdays)):
+            for i, birthday in enumerate(today_birthdays, 1):
+                display_name = format_birthday_display(birthday, clock)
+                log.info(f"{i}. {DISPLAY_PREFIX} {display_name}", event='birthday', name=birthday.name,
+                         department=birthday.department, calendar_type=birthday.calendar_type)
+        
+        # 发送邮件：成员和管理员收到全部生日，部门收件人（departments.txt）只收到自己负责部门的生日；
+        # 今天已发送过的邮件不再发送，只补发缺少的
+        send_mail(reminder_recipients(today_birthdays), clock,
+                  lambda birthdays: build_email(birthdays, clock, DISPLAY_PREFIX, source=MAIL_SOURCE),
+                  ledger=ledger, spool=spool)
     else:
-        return f"{name} {calendar_type}{age_info}"
-
-def send_email(subject, body, to_email):
-    """发送邮件"""
-    smtp_server = "smtp.qq.com"
-    smtp_port = 465
-    smtp_user = os.getenv('SMTP_USER')
-    smtp_password = os.getenv('SMTP_PASSWORD')
+        log.info("今日生日总结: 今天没有人过生日。")
     
-    if not all([smtp_user, smtp_password]):
-        print("错误：邮件配置不完整，请检查 email.env 文件")
-        return False
+    log.info("="*50)
+
+def parse_fire_time(value):
+    """解析 --at 参数（格式 HH:MM）"""
+    return datetime.strptime(value, '%H:%M').time()
+
+def next_fire_time(now, fire_time):
+    """计算 now 之后的下一次提醒时间（now 为北京时间）"""
+    target = now.replace(hour=fire_time.hour, minute=fire_time.minute, second=0, microsecond=0)
+    if target <= now:
+        target += timedelta(days=1)  # 北京时间没有夏令时，直接加一天即可
+    return target
+
+def load_today_calendar(engine, clock):
+    """读取今年的生日日历（或打开生日数据库），计入运行指标的 load 阶段"""
+    metrics = run_metrics.get_metrics()
+    with metrics.phase('load') as phase:
+        calendar = engine.calendar(clock.today.year)
+        phase.count = len(calendar)
+    metrics.set('records', len(calendar))
+    return calendar
+
+def finish_run(args):
+    """输出运行时长和各阶段耗时，按 --metrics / --prometheus 导出运行指标"""
+    metrics = run_metrics.get_metrics()
+    run_log.get_log().info(metrics.summary(), event='finish', **metrics.to_dict())
+    run_metrics.export(metrics, args)
+
+def run_daemon(args, database=None):
+    """常驻运行：每天在 --at 指定的时间（北京时间）发送提醒，生日列表或邮箱配置修改后自动重新加载
+    （使用生日数据库 database 时每次提醒前丢弃缓存的查询结果，直接查询数据库，数据库修改后不需要重新加载）"""
+    fire_time = args.at
+    wake = threading.Event()
+    if hasattr(signal, 'SIGUSR1'):  # Windows 没有 SIGUSR1
+        signal.signal(signal.SIGUSR1, lambda signum, frame: wake.set())
+    roster_watcher = FileWatcher('birthdays.txt')
+    env_watcher = FileWatcher('email.env')
+    log = run_log.get_log()
     
-    # 创建邮件内容对象，支持HTML格式
-    msg = MIMEText(body, 'html', 'utf-8')
-    msg['Subject'] = subject
-    msg['From'] = smtp_user
-    msg['To'] = to_email
+    # 生日日历整个读入内存，之后只有文件变化或跨年时才重新加载
+    engine = BirthdayEngine(database=database, use_cache=not args.no_cache)
+    clock = RunClock()
+    calendar = load_today_calendar(engine, clock)
+    loaded_year = clock.today.year  # 已加载的日历年份，生日列表修改后为None
+    log.info(f"成功加载 {len(calendar)} 条生日记录", event='roster', records=len(calendar))
+    next_fire = next_fire_time(clock.now, fire_time)
+    log.info(f"常驻模式已启动（进程号 {os.getpid()}），每天北京时间 {fire_time:%H:%M} 发送提醒，"
+             f"下一次: {next_fire:%Y-%m-%d %H:%M}", event='daemon_start', pid=os.getpid(), next_fire=next_fire)
+    if hasattr(signal, 'SIGUSR1'):
+        log.info(f"立即运行一次: kill -USR1 {os.getpid()}")
+    log.flush()
     
-    try:
-        with smtplib.SMTP_SSL(smtp_server, smtp_port) as server:
-            server.login(smtp_user, smtp_password)
-            server.sendmail(smtp_user, [to_email], msg.as_string())
-        return True
-    except Exception as e:
-        print(f"邮件发送失败: {e}")
-        return False
+    while True:
+        now = datetime.now(clock.tz)
+        try:
+            triggered = wake.wait(max(0.0, min((next_fire - now).total_seconds(), args.poll)))
+        except KeyboardInterrupt:
+            log.info("常驻模式已停止", event='daemon_stop')
+            log.flush()
+            return
+        wake.clear()
+        
+        if env_watcher.changed():
+            load_dotenv('email.env', override=True)
+            log.info("检测到 email.env 已修改，已重新加载邮箱配置", event='env_reload')
+        if database is None and roster_watcher.changed():
+            delta = engine.refresh()  # 只重新解析、换算变化的行
+            if delta is None:
+                loaded_year = None
+                log.info("检测到 birthdays.txt 已修改，将重新加载生日列表", event='roster_changed')
+            else:
+                log.info(f"检测到 birthdays.txt 已修改: {delta}", event='roster_changed', added=len(delta.added),
+                         removed=len(delta.removed), changed=len(delta.changed))
+        
+        now = datetime.now(clock.tz)
+        due = now >= next_fire
+        if not triggered and not due:
+            log.flush()
+            continue
+        
+        clock = RunClock()
+        run_metrics.reset().labels['mode'] = 'daemon'  # 每次提醒单独统计
+        if database is None and loaded_year != clock.today.year:
+            # 生日列表修改后只重新换算变化的行，跨年时整体重建
+            calendar = load_today_calendar(engine, clock)
+            loaded_year = clock.today.year
+            log.info(f"成功加载 {len(calendar)} 条生日记录", event='roster', records=len(calendar))
+        elif database is not None:
+            engine.reload()  # 丢弃缓存的当天结果，数据库修改后收到 SIGUSR1 再运行一次时按最新内容查询
+        if triggered:
+            log.info("收到 SIGUSR1，立即运行一次")
+        ledger = sent_ledger.from_args(args)  # 收到 SIGUSR1 再运行一次时，今天已发送过的邮件不再发送
+        try:
+            remind_today(engine, clock, ledger, args.spool)
+        except Exception as e:
+            # 常驻进程不因单次运行出错而退出，第二天照常运行
+            log.error(f"本次运行出错: {e}", event='run_failed', error=str(e))
+        finally:
+            if ledger is not None:
+                ledger.close()
+        finish_run(args)
+        if due:
+            next_fire = next_fire_time(now, fire_time)
+        log.info(f"下一次提醒: {next_fire:%Y-%m-%d %H:%M}")
+        log.flush()  # 常驻进程每次运行后写出日志，不等到退出
 
 def main():
-    print("=== 生日提醒系统启动 ===")
+    parser = argparse.ArgumentParser(description="生日提醒系统（本地部署版本）")
+    parser.add_argument('--date', type=parse_date,
+                        help="按指定日期运行（格式 YYYY-MM-DD），用于回放或补发，默认为北京时间今天")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="不使用也不更新生日日历 birthdays.txt.calendar 和解析快照 birthdays.txt.cache，每次重新解析")
+    parser.add_argument('--scan', action='store_true',
+                        help="不编译生日日历，直接扫描生日文件中月、日与今天相同的行（不检查其他行的格式）")
+    parser.add_argument('--upcoming', type=int, metavar='N',
+                        help="发送未来 N 天（含今天）的生日摘要，而不是当天提醒，如 --upcoming 7")
+    parser.add_argument('--workers', type=int, metavar='N',
+                        help="--upcoming 需要重新解析大生日文件时使用的进程数，默认取环境变量 PARSE_WORKERS 或 CPU 核数")
+    parser.add_argument('--daemon', action='store_true',
+                        help="常驻运行，每天在 --at 指定的时间发送提醒，代替 cron")
+    parser.add_argument('--at', type=parse_fire_time, default=parse_fire_time('08:00'), metavar='HH:MM',
+                        help="常驻模式每天发送提醒的时间（北京时间），默认 08:00")
+    parser.add_argument('--poll', type=float, default=30, metavar='SECONDS',
+                        help="常驻模式检查 birthdays.txt 和 email.env 是否修改的间隔秒数，默认30")
+    roster_db.add_arguments(parser)
+    sent_ledger.add_arguments(parser)
+    mail_spool.add_arguments(parser)
+    run_log.add_arguments(parser)
+    run_metrics.add_arguments(parser)
+    args = parser.parse_args()
+    if args.daemon and (args.date or args.upcoming):
+        parser.error("--daemon 不能与 --date 或 --upcoming 同时使用")
+    if args.scan and args.roster_db:
+        parser.error("--scan 不能与 --roster-db 同时使用")
+    log = run_log.configure(args.verbosity, args.log_json)
+    
+    log.info("=== 生日提醒系统启动 ===")
     
     # 检查必要文件
     if not os.path.exists('email.env'):
-        print("错误：找不到 email.env 文件，请创建邮箱配置文件")
+        log.error("错误：找不到 email.env 文件，请创建邮箱配置文件")
         return
     
-    if not os.path.exists('birthdays.txt'):
-        print("错误：找不到 birthdays.txt 文件，请创建生日列表文件")
+    try:
+        database = roster_db.from_args(args)  # 未配置 --roster-db 或 ROSTER_DB 时为None
+    except FileNotFoundError as e:
+        log.error(f"错误：{e}")
         return
-    
-    # 读取生日列表
-    birthdays = read_birthdays('birthdays.txt')
-    if not birthdays:
-        print("警告：没有找到有效的生日记录")
+    if database is None and not os.path.exists('birthdays.txt'):
+        log.error("错误：找不到 birthdays.txt 文件，请创建生日列表文件")
         return
     
-    print(f"成功加载 {len(birthdays)} 条生日记录")
-    
-    # 检查今日生日
-    tz = pytz.timezone('Asia/Shanghai')
-    now = datetime.now(tz)
-    formatted_time = now.strftime("%Y-%m-%d %H:%M:%S UTC+8")
+    if args.daemon:
+        run_daemon(args, database)
+        return
     
-    today_birthdays = []
-    for birthday_info in birthdays:
-        if is_birthday_today(birthday_info):
-            today_birthdays.append(birthday_info)
+    # 时区和今天的农历日期只计算一次
+    clock = RunClock(args.date)
+    if clock.is_override:
+        log.info(f"按指定日期运行: {clock.today.isoformat()}")
     
-    # 显示结果
-    print(f"\n运行时间: {formatted_time}")
-    print("="*50)
+    # 读取生日列表：摘要模式读取整个名册，当天提醒只需今年的生日日历（--scan 时不读取，直接扫描）；
+    # 生日数据库按日期建立了索引，两种模式都直接查询
+    engine = BirthdayEngine(database=database, use_cache=not args.no_cache, workers=args.workers, lazy=True,
+                            scan=args.scan)
+    run_metrics.get_metrics().labels['mode'] = 'upcoming' if args.upcoming else 'daily'
+    birthdays = None
+    if args.upcoming:
+        with run_metrics.get_metrics().phase('load') as phase:
+            birthdays = engine.roster()
+            phase.count = len(birthdays)
+        run_metrics.get_metrics().set('records', len(birthdays))
+    elif not args.scan:
+        birthdays = load_today_calendar(engine, clock)
+    if birthdays is not None:
+        if not len(birthdays):
+            log.warning("警告：没有找到有效的生日记录")
+            return
+        log.info(f"成功加载 {len(birthdays)} 条生日记录", event='roster', records=len(birthdays))
     
-    if today_birthdays:
-        print(f"今日生日总结 ({len(today_birthdays)}人):")
-        for i, birthday in enumerate(today_birthdays, 1):
-            display_name = format_display(birthday)
-            print(f"{i}. 心助会- {display_name}")
-        
-        # 发送邮件
-        admin_email = os.getenv('ADMIN_EMAIL')
-        if admin_email:
-            if len(today_birthdays) == 1:
-                birthday = today_birthdays[0]
-                display_name = format_display(birthday)
-                subject = f"生日提醒: 今天是心助会-{display_name}的生日"
-                # 使用HTML格式的邮件内容
-                body = f"""
-                <html>
-                <head>
-                    <meta charset="utf-8">
-                    <style>
-                        body {{ font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; }}
-                        .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                        .header {{ background-color: #f8f9fa; padding: 15px; text-align: center; border-radius: 5px; }}
-                        .content {{ padding: 20px; }}
-                        .footer {{ background-color: #f8f9fa; padding: 15px; text-align: center; font-size: 12px; color: #6c757d; }}
-                        .highlight {{ color: #007bff; font-weight: bold; }}
-                    </style>
-                </head>
-                <body>
-                    <div class="container">
-                        <div class="header">
-                            <h2>🎂 生日提醒</h2>
-                        </div>
-                        <div class="content">
-                            <p>今天是心助会- <span class="highlight">{display_name}</span> 的生日，请记得祝福 TA！</p>
-                        </div>
-                        <div class="footer">
-                            <p>发送时间: {formatted_time}<br>
-                            来自本地自动任务</p>
-                        </div>
-                    </div>
-                </body>
-                </html>
-                """
-            else:
-                subject = "生日提醒: 今天有多位成员的生日"
-                # 构建HTML格式的生日列表
-                birthday_list_html = ""
-                for i, birthday in enumerate(today_birthdays, 1):
-                    display_name = format_display(birthday)
-                    birthday_list_html += f"<li>心助会- {display_name}</li>"
-                
-                # 使用HTML格式的邮件内容
-                body = f"""
-                <html>
-                <head>
-                    <meta charset="utf-8">
-                    <style>
-                        body {{ font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; }}
-                        .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                        .header {{ background-color: #f8f9fa; padding: 15px; text-align: center; border-radius: 5px; }}
-                        .content {{ padding: 20px; }}
-                        .birthday-list {{ padding-left: 20px; }}
-                        .footer {{ background-color: #f8f9fa; padding: 15px; text-align: center; font-size: 12px; color: #6c757d; }}
-                        .highlight {{ color: #007bff; font-weight: bold; }}
-                    </style>
-                </head>
-                <body>
-                    <div class="container">
-                        <div class="header">
-                            <h2>🎂 生日提醒</h2>
-                        </div>
-                        <div class="content">
-                            <p>今天有多名成员的生日：</p>
-                            <ol class="birthday-list">
-                                {birthday_list_html}
-                            </ol>
-                            <p class="highlight">请记得送上祝福哦 🎉</p>
-                        </div>
-                        <div class="footer">
-                            <p>发送时间: {formatted_time}<br>
-                            来自本地自动任务</p>
-                        </div>
-                    </div>
-                </body>
-                </html>
-                """
-            
-            if send_email(subject, body, admin_email):
-                print(f"✓ 邮件已发送至管理员: {admin_email}")
-            else:
-                print("✗ 邮件发送失败")
+    ledger = sent_ledger.from_args(args)
+    try:
+        if args.upcoming:
+            # 近期生日摘要模式
+            send_upcoming_digest(engine, clock, args.upcoming, ledger, args.spool)
+            log.info("="*50)
         else:
-            print("警告：未配置 ADMIN_EMAIL，跳过邮件发送")
-    else:
-        print("今日生日总结: 今天没有人过生日。")
-    
-    print("="*50)
-    print("=== 程序运行完成 ===")
+            remind_today(engine, clock, ledger, args.spool)
+    finally:
+        if ledger is not None:
+            ledger.close()
+    finish_run(args)
+    log.info("=== 程序运行完成 ===")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,295 @@
+# 生日提醒系统 - 生日查询服务：以 HTTP/JSON 接口提供“今天谁过生日”等查询
+# 项目在https://github.com/inkcoo/birthdays_reminder开源免费
+#
+# 供办公室的看板、聊天机器人等定时轮询，不必运行整个提醒脚本再解析输出。
+# 名册只加载一次（BirthdayEngine），接口:
+#     GET /today                      今天（北京时间）过生日的人
+#     GET /date/2025-10-18            某天过生日的人
+#     GET /upcoming?days=7            未来 N 天（含今天）过生日的人，默认7天，最多366天
+#     GET /department/技术部           某个部门的全部成员（部门名需 URL 编码）
+# 返回 UTF-8 JSON，每位成员为 {"name", "department", "calendar": "solar"/"lunar", "year", "month", "day",
+# "age", "display"}；出错时返回 {"error": 说明} 和相应的状态码（400 参数不正确，404 路径或部门不存在）。
+#
+# 每个请求路径的 JSON 响应生成一次后缓存在内存中，之后同一路径直接返回缓存的字节（出错的响应不缓存）。
+# 北京时间跨过午夜（“今天”和年龄都变了）或生日文件（--roster-db 时为数据库文件）修改后清空缓存，
+# 文件是否修改每秒最多检查一次；生日文件修改后名册增量更新（BirthdayEngine.refresh()），只重新换算变化的行。
+#
+# 用法:
+#     python birthday_server.py                          # 监听 127.0.0.1:8080，读取 birthdays.txt
+#     python birthday_server.py --host 0.0.0.0 --port 9000 --roster-db birthdays.db
+#     curl http://127.0.0.1:8080/today
+# python benchmarks/load_test.py 测量每秒能处理的请求数。
+import sys  # 用于退出程序
+import json  # 用于生成响应
+import time  # 用于判断缓存是否过期
+import argparse  # 用于解析命令行参数
+import threading  # 多个连接同时查询时加锁
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+import lunar_table
+import run_log
+import roster_db
+from birthday_core import BEIJING_TZ, RunClock
+from birthday_engine import BirthdayEngine, FileWatcher, calculate_age, format_birthday_display
+
+DEFAULT_PORT = 8080
+DEFAULT_UPCOMING_DAYS = 7
+MAX_UPCOMING_DAYS = 366
+MAX_CACHED_RESPONSES = 1024  # 最多缓存多少个路径的响应，超过时丢弃最早缓存的一个
+CHECK_INTERVAL = 1.0  # 检查生日文件是否修改的间隔（秒）
+
+
+class QueryError(Exception):
+    """请求不正确，status 为返回的 HTTP 状态码"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def person_json(birthday_info, clock):
+    """
+    把一条生日记录转换为 JSON 对象
+
+    参数:
+        birthday_info: BirthdayRecord 生日记录
+        clock: RunClock 对象，按这一天计算年龄
+
+    返回:
+        dict
+    """
+    return {
+        'name': birthday_info.name,
+        'department': birthday_info.department,
+        'calendar': 'solar' if birthday_info.calendar_type == 'a' else 'lunar',
+        'year': birthday_info.year,
+        'month': birthday_info.month,
+        'day': birthday_info.day,
+        'age': calculate_age(birthday_info, clock),
+        'display': format_birthday_display(birthday_info, clock),
+    }
+
+
+class BirthdayService:
+    """
+    生成并缓存各接口的 JSON 响应
+
+    参数:
+        engine: BirthdayEngine 对象
+        watch_path: 生日文件（或生日数据库文件），修改后重新加载名册并清空缓存
+        check_interval: 检查文件是否修改的间隔（秒）
+
+    respond() 可以在多个线程中同时调用；缓存未命中时查询名册，查询过程加锁，一次只查一个。
+    只缓存成功的响应，不存在的部门、不正确的参数等每次重新生成（只查内存中的索引，开销很小），
+    不会占满缓存而挤掉 /today 等常用路径。
+    """
+
+    def __init__(self, engine, watch_path, check_interval=CHECK_INTERVAL):
+        self.engine = engine
+        self.watcher = FileWatcher(watch_path)
+        self.check_interval = check_interval
+        self._responses = {}  # 请求路径 -> (状态码, JSON 字节)
+        self._lock = threading.Lock()
+        self._today = None  # 当前缓存对应的北京时间日期
+        self._expires = 0.0  # 下一个北京时间午夜（时间戳）
+        self._next_check = 0.0  # 下一次检查文件的时间（时间戳）
+
+    def _refresh(self, now):
+        """跨过北京时间午夜或生日文件修改后清空缓存（调用者持有锁）"""
+        log = run_log.get_log()
+        if now >= self._next_check:
+            self._next_check = now + self.check_interval
+            if self.watcher.changed():
+                delta = self.engine.refresh()  # 只重新解析、换算变化的行
+                self._responses.clear()
+                if delta is None:
+                    log.info(f"检测到 {self.watcher.path} 已修改，已重新加载生日列表", event='roster_changed')
+                else:
+                    log.info(f"检测到 {self.watcher.path} 已修改: {delta}", event='roster_changed',
+                             added=len(delta.added), removed=len(delta.removed), changed=len(delta.changed))
+                log.flush()
+        if now >= self._expires:
+            self._today = datetime.fromtimestamp(now, BEIJING_TZ).date()
+            tomorrow = self._today + timedelta(days=1)
+            self._expires = datetime(tomorrow.year, tomorrow.month, tomorrow.day, tzinfo=BEIJING_TZ).timestamp()
+            self._responses.clear()
+
+    def respond(self, target):
+        """
+        返回请求路径对应的响应
+
+        参数:
+            target: 请求行中的路径（含查询字符串），如 /upcoming?days=7
+
+        返回:
+            (HTTP 状态码, UTF-8 编码的 JSON)
+        """
+        now = time.time()
+        if now >= self._next_check or now >= self._expires:
+            with self._lock:
+                self._refresh(now)
+        response = self._responses.get(target)
+        if response is not None:
+            return response
+        with self._lock:
+            response = self._responses.get(target)
+            if response is None:
+                try:
+                    status, payload = 200, self.query(target)
+                except QueryError as e:
+                    status, payload = e.status, {'error': str(e)}
+                response = status, json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                if status == 200:
+                    if len(self._responses) >= MAX_CACHED_RESPONSES:
+                        self._responses.pop(next(iter(self._responses)))
+                    self._responses[target] = response
+        return response
+
+    def query(self, target):
+        """
+        按请求路径查询名册（不使用缓存）
+
+        返回:
+            可转换为 JSON 的 dict
+
+        异常:
+            QueryError: 路径或参数不正确
+        """
+        parts = urlsplit(target)
+        path = parts.path.rstrip('/')
+        if path == '/today':
+            return self.day_json(self._today)
+        if path.startswith('/date/'):
+            try:
+                day = date.fromisoformat(path[len('/date/'):])
+            except ValueError:
+                raise QueryError(400, "日期格式应为 YYYY-MM-DD")
+            return self.day_json(day)
+        if path == '/upcoming':
+            value = parse_qs(parts.query).get('days', [str(DEFAULT_UPCOMING_DAYS)])[-1]
+            try:
+                days = int(value)
+            except ValueError:
+                days = 0
+            if not 1 <= days <= MAX_UPCOMING_DAYS:
+                raise QueryError(400, f"days 应为 1 至 {MAX_UPCOMING_DAYS} 之间的整数")
+            return self.upcoming_json(days)
+        if path.startswith('/department/'):
+            return self.department_json(unquote(path[len('/department/'):]))
+        raise QueryError(404, "路径不存在，可用: /today、/date/YYYY-MM-DD、/upcoming?days=N、/department/部门名")
+
+    def day_json(self, day):
+        """某天过生日的人（其他年份的日期在名册中查找，不在锁内编译整年的日历，见 BirthdayEngine.on()）"""
+        if not lunar_table.FIRST_DAY <= day <= lunar_table.LAST_DAY:
+            raise QueryError(400, f"日期超出农历转换表范围 ({lunar_table.FIRST_DAY} 至 {lunar_table.LAST_DAY})")
+        birthdays = self.engine.on(day)
+        clock = RunClock(day)
+        return {'date': day.isoformat(), 'count': len(birthdays),
+                'birthdays': [person_json(birthday, clock) for birthday in birthdays]}
+
+    def upcoming_json(self, days):
+        """从今天起 days 天内过生日的人，年龄按生日当天计算"""
+        day_clocks = {}
+        items = []
+        for occurrence, birthday in self.engine.upcoming(days, self._today):
+            if occurrence not in day_clocks:
+                day_clocks[occurrence] = RunClock(occurrence)
+            item = {'date': occurrence.isoformat(), 'in_days': (occurrence - self._today).days}
+            item.update(person_json(birthday, day_clocks[occurrence]))
+            items.append(item)
+        return {'start': self._today.isoformat(), 'days': days, 'count': len(items), 'birthdays': items}
+
+    def department_json(self, name):
+        """某个部门的全部成员，年龄按今天计算"""
+        members = self.engine.department(name)
+        if not name or not members:
+            raise QueryError(404, f"没有部门为 {name} 的成员")
+        clock = RunClock(self._today)
+        return {'department': name, 'count': len(members),
+                'members': [person_json(member, clock) for member in members]}
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """只处理 GET 请求，响应由 server.service 生成；支持 HTTP/1.1 长连接"""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # 响应头和正文分两次写出，不关闭 Nagle 算法时长连接上每个请求会多等 40 毫秒
+
+    def do_GET(self):
+        status, body = self.server.service.respond(self.path)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 访问日志只在 --verbose 时输出，默认不为每个请求格式化和写出
+        log = run_log.get_log()
+        if log.enabled(run_log.VERBOSE):
+            log.detail(f"{self.address_string()} {format % args}")
+
+
+def create_server(engine, watch_path, host='127.0.0.1', port=DEFAULT_PORT):
+    """
+    创建查询服务（尚未开始处理请求，调用 serve_forever() 开始）
+
+    参数:
+        engine: BirthdayEngine 对象
+        watch_path: 修改后需要重新加载的生日文件或数据库文件
+        host, port: 监听地址和端口，port 为0时由系统分配
+
+    返回:
+        ThreadingHTTPServer，server.service 为 BirthdayService
+    """
+    server = ThreadingHTTPServer((host, port), RequestHandler)
+    server.daemon_threads = True
+    server.service = BirthdayService(engine, watch_path)
+    return server
+
+
+def main():
+    """
+    主函数：加载名册并启动查询服务
+    """
+    parser = argparse.ArgumentParser(description="生日查询服务（HTTP/JSON）")
+    parser.add_argument('--host', default='127.0.0.1', help="监听地址，默认 127.0.0.1（只允许本机访问）")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"监听端口，默认 {DEFAULT_PORT}")
+    parser.add_argument('--file', default='birthdays.txt', help="生日文件，默认 birthdays.txt")
+    parser.add_argument('--no-cache', action='store_true', help="不使用也不更新生日日历和解析快照")
+    roster_db.add_arguments(parser)
+    run_log.add_arguments(parser)
+    args = parser.parse_args()
+    log = run_log.configure(args.verbosity, args.log_json)
+
+    try:
+        # 多个线程共用同一个数据库连接，查询由 BirthdayService 加锁
+        database = roster_db.from_args(args, shared=True)
+        engine = BirthdayEngine(args.file, database, use_cache=not args.no_cache)
+        count = len(engine)
+    except (OSError, UnicodeDecodeError) as e:
+        log.error(f"无法读取生日列表: {e}", event='roster_failed', error=str(e))
+        sys.exit(1)
+    watch_path = database.path if database is not None else args.file
+    log.info(f"成功加载 {count} 条生日记录", event='roster', records=count)
+
+    try:
+        server = create_server(engine, watch_path, args.host, args.port)
+    except OSError as e:
+        log.error(f"无法监听 {args.host}:{args.port}: {e}", event='server_failed', error=str(e))
+        sys.exit(1)
+    host, port = server.server_address[:2]
+    log.info(f"生日查询服务已启动: http://{host}:{port}/today", event='server_start', host=host, port=port)
+    log.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        log.info("生日查询服务已停止", event='server_stop')
+    server.server_close()
+    if database is not None:
+        database.close()
+
+
+if __name__ == "__main__":
+    main()  # 程序入口点
@@ -0,0 +1,169 @@
+# 生日提醒系统 - 批量投递：按部门分发收件人，并发、限速发送
+# 项目在https://github.com/inkcoo/birthdays_reminder开源免费
+#
+# 部门收件人配置文件（默认 departments.txt，可用环境变量 DEPARTMENT_RECIPIENTS 指定）:
+#     # 注释行
+#     技术部=tech-lead@example.com,hr@example.com
+#     市场部=market@example.com
+#     *=boss@example.com            # * 表示接收所有人的生日提醒
+# 每位收件人只收到一封邮件，内容为其负责的所有部门今天过生日的成员。
+import os  # 用于访问环境变量
+import time  # 用于限速和计时
+import threading  # 用于线程间共享限速器和连接
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor  # 用于并发发送
+from mailer import MailerSession
+from run_log import get_log
+from run_metrics import get_metrics
+
+ALL_DEPARTMENTS = '*'
+
+# 一封待发送的邮件
+Message = namedtuple('Message', ['to_email', 'subject', 'body'])
+
+# 一封邮件的投递结果：ok 为是否成功，error 为失败原因，elapsed 为耗时（秒）
+DeliveryResult = namedtuple('DeliveryResult', ['to_email', 'subject', 'ok', 'error', 'elapsed'])
+
+
+def read_department_recipients(filename=None):
+    """
+    读取部门收件人配置
+
+    参数:
+        filename: 配置文件路径，为None时使用环境变量 DEPARTMENT_RECIPIENTS 或 departments.txt
+
+    返回:
+        字典 {部门: [收件人邮箱, ...]}，文件不存在时返回空字典
+    """
+    filename = filename or os.getenv('DEPARTMENT_RECIPIENTS') or 'departments.txt'
+    mapping = {}
+    if not os.path.exists(filename):
+        return mapping
+    with open(filename, 'r', encoding='utf-8') as file:
+        for line_no, line in enumerate(file, 1):
+            line = line.split('#', 1)[0].strip()  # 去掉注释和空白
+            if not line:
+                continue
+            department, sep, emails = line.partition('=')
+            recipients = [email.strip() for email in emails.split(',') if email.strip()]
+            if not sep or not department.strip() or not recipients:
+                get_log().warning(f"跳过格式不正确的部门收件人配置 (第{line_no}行): {line}",
+                                  event='bad_department_line', line_no=line_no, line=line)
+                continue
+            mapping.setdefault(department.strip(), []).extend(recipients)
+    return mapping
+
+
+def route_birthdays(birthdays, mapping, department_of=None):
+    """
+    按部门把今天的生日分配给收件人
+
+    参数:
+        birthdays: 今天过生日的 BirthdayRecord 列表
+        mapping: read_department_recipients() 返回的配置
+        department_of: 可选，从列表元素取部门的函数（元素不是 BirthdayRecord 时使用）
+
+    返回:
+        字典 {收件人邮箱: [该收件人应收到的元素, ...]}，保持原有顺序
+    """
+    routes = {}
+    everyone = mapping.get(ALL_DEPARTMENTS, [])
+    for birthday in birthdays:
+        department = department_of(birthday) if department_of else birthday.department
+        recipients = (everyone + mapping.get(department, [])) if department else everyone
+        for email in dict.fromkeys(recipients):  # 同一部门重复配置的邮箱只算一次
+            routes.setdefault(email, []).append(birthday)
+    return routes
+
+
+class RateLimiter:
+    """
+    线程安全的发送限速器：保证相邻两次发送之间至少间隔 1/rate 秒
+
+    参数:
+        rate: 每秒最多发送的邮件数，0或None表示不限速
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def deliver(messages, max_connections=None, rate=None, mailer_factory=MailerSession):
+    """
+    并发发送一批邮件
+
+    参数:
+        messages: Message 列表
+        max_connections: 同时使用的 SMTP 连接数（即工作线程数），
+                         默认取环境变量 SMTP_CONNECTIONS，未设置时为4
+        rate: 每秒最多发送的邮件数，默认取环境变量 SMTP_RATE，未设置时不限速
+        mailer_factory: 创建 MailerSession 的函数，每个工作线程各用一个连接
+
+    返回:
+        与 messages 顺序一致的 DeliveryResult 列表
+    """
+    if not messages:
+        return []
+    max_connections = int(max_connections or os.getenv('SMTP_CONNECTIONS') or 4)
+    rate = float(rate if rate is not None else os.getenv('SMTP_RATE') or 0)
+    limiter = RateLimiter(rate)
+    local = threading.local()
+    sessions = []
+    sessions_lock = threading.Lock()
+
+    def send_one(message):
+        mailer = getattr(local, 'mailer', None)
+        if mailer is None:
+            mailer = local.mailer = mailer_factory()
+            with sessions_lock:
+                sessions.append(mailer)
+        limiter.wait()
+        started = time.perf_counter()
+        ok = mailer.send(message.subject, message.body, message.to_email)
+        return DeliveryResult(message.to_email, message.subject, ok,
+                              None if ok else mailer.last_error, time.perf_counter() - started)
+
+    workers = max(1, min(max_connections, len(messages)))
+    try:
+        with get_metrics().phase('deliver', len(messages)), ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(send_one, messages))
+    finally:
+        for mailer in sessions:
+            mailer.close()
+
+
+def print_delivery_report(results):
+    """
+    输出投递结果：失败的邮件总是输出，成功的邮件只在 --verbose 时逐封输出
+
+    返回:
+        失败的邮件数
+    """
+    log = get_log()
+    failed = 0
+    for result in results:
+        if result.ok:
+            log.detail(f"✓ {result.to_email}: {result.subject} ({result.elapsed:.2f}秒)", event='mail_sent',
+                       to_email=result.to_email, subject=result.subject, elapsed=round(result.elapsed, 3))
+        else:
+            failed += 1
+            log.error(f"✗ {result.to_email}: {result.subject} 发送失败: {result.error}", event='mail_failed',
+                      to_email=result.to_email, subject=result.subject, error=result.error)
+    log.info(f"邮件投递完成: 成功 {len(results) - failed} 封, 失败 {failed} 封", event='delivery',
+             sent=len(results) - failed, failed=failed)
+    metrics = get_metrics()
+    metrics.set('mails_sent', len(results) - failed)
+    metrics.set('mails_failed', failed)
+    return failed
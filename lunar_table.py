@@ -0,0 +1,202 @@
+# 生日提醒系统 - 农历/公历转换表
+# 项目在https://github.com/inkcoo/birthdays_reminder开源免费
+#
+# lunar_table.bin 预先保存了 1900-01-31 至 2100-02-08 每一天对应的农历日期，
+# 运行时只需按下标读取，不再逐条调用 lunardate 做换算。
+# lunardate 只在生成和校验转换表时使用：
+#     python lunar_table.py build    # 重新生成 lunar_table.bin
+#     python lunar_table.py verify   # 与 lunardate 逐日比对
+#
+# 文件格式（小端序）:
+#     文件头 24 字节: 魔数 b'LUNR'、版本号、起始日期序号(date.toordinal)、天数、农历月数
+#     每日记录 2 字节: 农历月 << 6 | 农历日 << 1 | 是否闰月
+#     每月记录 8 字节: 农历年、农历月、是否闰月、该月初一在每日记录中的下标
+import os  # 用于定位转换表文件
+import sys  # 用于系统相关操作
+import mmap  # 用于内存映射转换表文件
+import struct  # 用于读写二进制记录
+from collections import namedtuple
+from datetime import date, timedelta  # 用于处理日期
+from functools import lru_cache  # 用于缓存转换结果
+
+TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lunar_table.bin')
+FIRST_DAY = date(1900, 1, 31)  # 农历1900年正月初一
+LAST_DAY = date(2100, 2, 8)  # 农历2099年十二月三十
+
+_MAGIC = b'LUNR'
+_VERSION = 1
+_HEADER = struct.Struct('<4sHHIII')
+_DAY = struct.Struct('<H')
+_MONTH = struct.Struct('<HBBI')
+
+# 农历日期：年、月、日、是否闰月
+LunarDay = namedtuple('LunarDay', ['year', 'month', 'day', 'is_leap'])
+
+_table = None  # 延迟加载的转换表
+
+
+class _Table:
+    """内存映射的转换表，首次使用时才打开文件"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, self.first_ordinal, self.day_count, self.month_count = \
+            _HEADER.unpack_from(self.data, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"农历转换表格式不正确: {path}")
+        self.days_offset = _HEADER.size
+        self.months_offset = self.days_offset + self.day_count * _DAY.size
+        self._month_starts = None
+
+    def day(self, index):
+        """读取第 index 天的农历月、日、闰月标记"""
+        value, = _DAY.unpack_from(self.data, self.days_offset + index * _DAY.size)
+        return value >> 6, (value >> 1) & 0x1F, bool(value & 1)
+
+    def month_starts(self):
+        """(农历年, 月, 是否闰月) -> (初一的下标, 该月天数)，约2500项，首次反查时构建"""
+        if self._month_starts is None:
+            months = [_MONTH.unpack_from(self.data, self.months_offset + i * _MONTH.size)
+                      for i in range(self.month_count)]
+            starts = {}
+            for i, (year, month, leap, start) in enumerate(months):
+                end = months[i + 1][3] if i + 1 < len(months) else self.day_count
+                starts[(year, month, bool(leap))] = (start, end - start)
+            self._month_starts = starts
+        return self._month_starts
+
+
+def _get_table():
+    global _table
+    if _table is None:
+        if not os.path.exists(TABLE_PATH):
+            raise FileNotFoundError(
+                f"找不到农历转换表 {TABLE_PATH}，请运行 python lunar_table.py build 生成")
+        _table = _Table(TABLE_PATH)
+    return _table
+
+
+@lru_cache(maxsize=4096)
+def to_lunar(year, month, day):
+    """
+    公历转农历
+
+    参数:
+        year, month, day: 公历年、月、日
+
+    返回:
+        LunarDay(year, month, day, is_leap)
+
+    异常:
+        ValueError: 日期超出转换表范围
+    """
+    table = _get_table()
+    solar = date(year, month, day)
+    index = solar.toordinal() - table.first_ordinal
+    if not 0 <= index < table.day_count:
+        raise ValueError(f"日期 {solar} 超出农历转换表范围 ({FIRST_DAY} 至 {LAST_DAY})")
+    lunar_month, lunar_day, is_leap = table.day(index)
+    # 公历年初（1、2月）的冬月、腊月仍属于上一个农历年
+    lunar_year = year - 1 if month <= 2 and lunar_month >= 11 else year
+    return LunarDay(lunar_year, lunar_month, lunar_day, is_leap)
+
+
+@lru_cache(maxsize=65536)
+def to_solar(year, month, day, is_leap=False):
+    """
+    农历转公历
+
+    参数:
+        year, month, day: 农历年、月、日
+        is_leap: 是否为闰月
+
+    返回:
+        datetime.date 对象
+
+    异常:
+        ValueError: 农历日期不存在（如小月三十、当年没有该闰月）或超出转换表范围
+    """
+    table = _get_table()
+    start = table.month_starts().get((year, month, bool(is_leap)))
+    if start is None or not 1 <= day <= start[1]:
+        leap_text = "闰" if is_leap else ""
+        raise ValueError(f"农历日期不存在: {year}年{leap_text}{month}月{day}日")
+    return date.fromordinal(table.first_ordinal + start[0] + day - 1)
+
+
+def month_length(year, month, is_leap=False):
+    """
+    返回农历某月的天数（29或30），该月不存在时返回None
+    """
+    start = _get_table().month_starts().get((year, month, bool(is_leap)))
+    return start[1] if start else None
+
+
+def build(path=TABLE_PATH):
+    """
+    使用 lunardate 生成转换表文件
+
+    参数:
+        path: 输出文件路径
+    """
+    import lunardate  # 仅生成和校验时需要
+
+    days = bytearray()
+    months = []
+    count = (LAST_DAY - FIRST_DAY).days + 1
+    for i in range(count):
+        solar = FIRST_DAY + timedelta(days=i)
+        lunar = lunardate.LunarDate.from_solar_date(solar.year, solar.month, solar.day)
+        days += _DAY.pack(lunar.month << 6 | lunar.day << 1 | int(lunar.isLeapMonth))
+        if lunar.day == 1:
+            months.append(_MONTH.pack(lunar.year, lunar.month, int(lunar.isLeapMonth), i))
+
+    with open(path, 'wb') as file:
+        file.write(_HEADER.pack(_MAGIC, _VERSION, 0, FIRST_DAY.toordinal(), count, len(months)))
+        file.write(days)
+        file.write(b''.join(months))
+    print(f"已生成农历转换表 {path}: {count} 天, {len(months)} 个农历月")
+
+
+def verify(path=TABLE_PATH):
+    """
+    与 lunardate 逐日比对转换表（双向）
+
+    返回:
+        不一致的天数，0表示完全一致
+    """
+    import lunardate  # 仅生成和校验时需要
+
+    global _table
+    _table = _Table(path)
+    to_lunar.cache_clear()
+    to_solar.cache_clear()
+
+    errors = 0
+    solar = FIRST_DAY
+    while solar <= LAST_DAY:
+        expected = lunardate.LunarDate.from_solar_date(solar.year, solar.month, solar.day)
+        lunar = to_lunar(solar.year, solar.month, solar.day)
+        back = to_solar(lunar.year, lunar.month, lunar.day, lunar.is_leap)
+        if (lunar.year, lunar.month, lunar.day, lunar.is_leap) != \
+                (expected.year, expected.month, expected.day, bool(expected.isLeapMonth)) or back != solar:
+            print(f"不一致: {solar} 转换表={lunar} 反查={back} lunardate={expected}")
+            errors += 1
+        solar += timedelta(days=1)
+    print(f"校验完成: {(LAST_DAY - FIRST_DAY).days + 1} 天, {errors} 处不一致")
+    return errors
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="生成或校验农历转换表")
+    parser.add_argument('command', choices=['build', 'verify'], help="build: 生成转换表; verify: 与 lunardate 比对")
+    parser.add_argument('--path', default=TABLE_PATH, help="转换表文件路径")
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        build(args.path)
+    else:
+        sys.exit(1 if verify(args.path) else 0)
@@ -0,0 +1,365 @@
+# 生日提醒系统 - 发送队列：查找生日与投递邮件分开，失败自动重试
+# 项目在https://github.com/inkcoo/birthdays_reminder开源免费
+#
+# SMTP 服务器很慢或拒绝发送时，原先这次提醒就丢了，只能手动重新运行整个任务，
+# 而且每次网络超时都会卡住运行。加 --spool 参数运行时，提醒脚本只把渲染好的邮件放入
+# SQLite 发送队列（默认 mail_spool.db，可用环境变量 MAIL_SPOOL 指定）后立即结束；
+# 另由 “python mail_spool.py flush”（如每10分钟由 cron 运行一次）投递到期的邮件:
+#     发送失败时按指数退避安排下一次尝试（1分钟、2分钟、4分钟……最长6小时，并加入随机抖动，
+#     避免大量邮件在同一时刻重试）；
+#     尝试次数达到上限（默认8次）后移入死信，不再自动重试，可用 retry 命令重新放回队列。
+# 同一天、同一名册、同一收件人、同样生日的邮件只会入队一次，重新运行不会重复入队；
+# 投递成功的邮件同时写入发送记录（sent_ledger），与直接发送时一样不会重复发送。
+#
+# 用法:
+#     python birthday_reminder.py --spool            # 只入队
+#     python mail_spool.py flush                     # 投递到期的邮件
+#     python mail_spool.py list [--status dead]      # 查看队列
+#     python mail_spool.py stats                     # 各状态的邮件数
+#     python mail_spool.py retry --dead              # 死信重新放回队列
+#     python mail_spool.py purge --days 30           # 删除30天前已发送的邮件
+import os  # 用于访问环境变量
+import sys  # 用于退出程序
+import time  # 用于计算重试时间
+import argparse  # 用于解析命令行参数
+from datetime import date, datetime
+import run_log
+import run_metrics
+import sent_ledger
+from run_log import get_log
+
+DEFAULT_SPOOL = 'mail_spool.db'
+MAX_ATTEMPTS = 8  # 每封邮件最多尝试的次数，之后移入死信
+BACKOFF_BASE = 60.0  # 第一次重试前等待的秒数，之后每次翻倍
+BACKOFF_MAX = 6 * 3600.0  # 重试间隔上限（秒）
+LEASE_SECONDS = 600.0  # 投递进程取出邮件后占用的时间，进程中途退出时到期后由下一次投递接手
+
+# 邮件状态
+PENDING, SENDING, SENT, DEAD = 'pending', 'sending', 'sent', 'dead'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY,
+    day TEXT NOT NULL,
+    roster TEXT NOT NULL,
+    to_email TEXT NOT NULL,
+    people TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    body TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL,
+    last_error TEXT,
+    created REAL NOT NULL,
+    sent_at REAL,
+    UNIQUE (day, roster, to_email, people)
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt);
+"""
+
+
+def backoff_delay(attempts, base=BACKOFF_BASE, maximum=BACKOFF_MAX, rng=None):
+    """
+    第 attempts 次发送失败后，到下一次尝试的等待秒数
+
+    指数退避: base * 2^(attempts-1)，不超过 maximum；
+    再取其一半加上 [0, 一半) 的随机数，多封邮件同时失败时不会在同一时刻一起重试。
+    rng 为可选的 random.Random 对象（用于得到可重复的结果）。
+    """
+    if rng is None:
+        import random  # 只在需要重试时导入
+        rng = random
+    delay = min(maximum, base * 2 ** (attempts - 1))
+    return delay / 2 + rng.random() * delay / 2
+
+
+class MailSpool:
+    """
+    SQLite 发送队列
+
+    参数:
+        path: 数据库文件，不存在时自动创建
+
+    用法:
+        with MailSpool('mail_spool.db') as spool:
+            spool.enqueue(messages, clock.today, 'birthdays.txt', recipients)
+            spool.flush()
+    """
+
+    def __init__(self, path):
+        import sqlite3  # 只在使用发送队列时导入
+        self.path = path
+        self._db = sqlite3.connect(path, timeout=30)
+        with self._db:
+            self._db.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self._db.close()
+
+    def enqueue(self, messages, day, roster, recipients, key=sent_ledger.person_key):
+        """
+        把邮件放入队列，已在队列中（或已发送）的同一封邮件不会重复入队
+
+        参数:
+            messages: delivery.Message 列表
+            day: 提醒日期（datetime.date）
+            roster: 名册名称
+            recipients: 生成邮件时使用的 {收件人邮箱: [元素, ...]}，顺序与 messages 相同
+            key: 从列表元素取记录键的函数，与发送记录相同
+
+        返回:
+            新入队的邮件数
+        """
+        now = time.time()
+        rows = [(day.isoformat(), roster, message.to_email, '\n'.join(sorted(key(item) for item in items)),
+                 message.subject, message.body, now, now)
+                for message, items in zip(messages, recipients.values())]
+        with self._db:
+            before = self._db.total_changes
+            self._db.executemany(
+                "INSERT OR IGNORE INTO outbox (day, roster, to_email, people, subject, body, next_attempt, created)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            return self._db.total_changes - before
+
+    def claim(self, limit=None, now=None):
+        """
+        取出到期的邮件并标记为发送中（多个投递进程同时运行时不会取到同一封）
+
+        返回:
+            [(id, day, roster, to_email, people, subject, body, attempts), ...]
+        """
+        now = time.time() if now is None else now
+        with self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            rows = self._db.execute(
+                "SELECT id, day, roster, to_email, people, subject, body, attempts FROM outbox"
+                " WHERE status IN (?, ?) AND next_attempt <= ? ORDER BY next_attempt, id LIMIT ?",
+                (PENDING, SENDING, now, -1 if limit is None else limit)).fetchall()
+            self._db.executemany("UPDATE outbox SET status = ?, next_attempt = ? WHERE id = ?",
+                                 [(SENDING, now + LEASE_SECONDS, row[0]) for row in rows])
+        return rows
+
+    def flush(self, limit=None, max_attempts=MAX_ATTEMPTS, ledger=None, deliver=None):
+        """
+        投递到期的邮件
+
+        参数:
+            limit: 本次最多投递的邮件数，默认不限
+            max_attempts: 每封邮件最多尝试的次数，达到后移入死信
+            ledger: 可选，SentLedger；投递成功后写入，已全部发送过的邮件直接标记为已发送
+            deliver: 投递函数，默认 delivery.deliver（多个 SMTP 连接并发发送）
+
+        返回:
+            (发送成功数, 安排重试数, 移入死信数)
+        """
+        from delivery import Message, print_delivery_report
+        if deliver is None:
+            from delivery import deliver
+
+        log = get_log()
+        rows = self.claim(limit)
+        if not rows:
+            log.info("发送队列中没有到期的邮件", event='spool_empty')
+            return 0, 0, 0
+
+        # 已经由其他方式发送过的邮件（如未使用队列的一次运行）不再发送
+        sent_sets = {}
+        to_send = []
+        already_sent = []
+        for row in rows:
+            day, roster, to_email, people = row[1], row[2], row[3], row[4]
+            if ledger is not None:
+                if (day, roster) not in sent_sets:
+                    sent_sets[day, roster] = ledger.sent_on(date.fromisoformat(day), roster)
+                if all((to_email, person) in sent_sets[day, roster] for person in people.split('\n')):
+                    already_sent.append(row)
+                    continue
+            to_send.append(row)
+
+        results = deliver([Message(row[3], row[5], row[6]) for row in to_send])
+        now = time.time()
+        updates = [(SENT, row[7], now, None, now, row[0]) for row in already_sent]
+        retried = dead = 0
+        for row, result in zip(to_send, results):
+            attempts = row[7] + 1
+            if result.ok:
+                updates.append((SENT, attempts, now, None, now, row[0]))
+                if ledger is not None:
+                    ledger.record(date.fromisoformat(row[1]), row[2], row[3], row[4].split('\n'))
+            elif attempts >= max_attempts:
+                dead += 1
+                updates.append((DEAD, attempts, now, result.error, None, row[0]))
+                log.error(f"✗ {row[3]}: {row[5]} 已尝试 {attempts} 次，移入死信", event='spool_dead',
+                          id=row[0], to_email=row[3], attempts=attempts, error=result.error)
+            else:
+                retried += 1
+                next_attempt = now + backoff_delay(attempts)
+                updates.append((PENDING, attempts, next_attempt, result.error, None, row[0]))
+                log.warning(f"{row[3]}: 第 {attempts} 次发送失败，"
+                            f"{_format_time(next_attempt)} 重试", event='spool_retry', id=row[0],
+                            to_email=row[3], attempts=attempts, next_attempt=_format_time(next_attempt))
+        with self._db:
+            self._db.executemany("UPDATE outbox SET status = ?, attempts = ?, next_attempt = ?, last_error = ?,"
+                                 " sent_at = ? WHERE id = ?", updates)
+
+        print_delivery_report(results)
+        if already_sent:
+            log.info(f"{len(already_sent)} 封邮件已由其他运行发送过，不再发送", event='spool_already_sent',
+                     count=len(already_sent))
+        sent = len(results) - retried - dead + len(already_sent)
+        metrics = run_metrics.get_metrics()
+        metrics.set('mails_retried', retried)
+        metrics.set('mails_dead', dead)
+        return sent, retried, dead
+
+    def stats(self):
+        """返回 {状态: 邮件数}"""
+        return dict(self._db.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status"))
+
+    def entries(self, status=None, limit=50):
+        """
+        列出队列中的邮件，最新的在前
+
+        返回:
+            [(id, status, attempts, next_attempt, to_email, subject, last_error), ...]
+        """
+        query = "SELECT id, status, attempts, next_attempt, to_email, subject, last_error FROM outbox"
+        params = ()
+        if status:
+            query += " WHERE status = ?"
+            params = (status,)
+        return self._db.execute(query + " ORDER BY id DESC LIMIT ?", params + (limit,)).fetchall()
+
+    def retry(self, ids=None, dead=False):
+        """把指定的邮件（或全部死信）重新放回队列，尝试次数清零，返回放回的邮件数"""
+        now = time.time()
+        with self._db:
+            if dead:
+                cursor = self._db.execute("UPDATE outbox SET status = ?, attempts = 0, next_attempt = ?"
+                                          " WHERE status = ?", (PENDING, now, DEAD))
+            else:
+                cursor = self._db.executemany("UPDATE outbox SET status = ?, attempts = 0, next_attempt = ?"
+                                              " WHERE id = ? AND status != ?",
+                                              [(PENDING, now, id_, SENT) for id_ in ids or ()])
+            return cursor.rowcount
+
+    def purge(self, days):
+        """删除 days 天前已发送的邮件，返回删除的邮件数"""
+        with self._db:
+            cursor = self._db.execute("DELETE FROM outbox WHERE status = ? AND sent_at < ?",
+                                      (SENT, time.time() - days * 86400))
+            return cursor.rowcount
+
+
+def _format_time(timestamp):
+    """把时间戳显示为北京时间"""
+    from birthday_core import BEIJING_TZ
+    return datetime.fromtimestamp(timestamp, BEIJING_TZ).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def spool_path(path=None):
+    """发送队列数据库路径：参数 > 环境变量 MAIL_SPOOL > mail_spool.db"""
+    return path or os.getenv('MAIL_SPOOL') or DEFAULT_SPOOL
+
+
+def add_arguments(parser):
+    """为提醒脚本添加 --spool 参数"""
+    parser.add_argument('--spool', action='store_true',
+                        help="只把邮件放入发送队列（环境变量 MAIL_SPOOL，默认 mail_spool.db）后立即结束，"
+                             "由 python mail_spool.py flush 投递")
+
+
+def spool_messages(messages, day, roster, recipients, key=sent_ledger.person_key):
+    """
+    把提醒脚本生成的邮件放入发送队列
+
+    返回:
+        退出代码，0表示成功，1表示无法写入队列
+    """
+    log = get_log()
+    path = spool_path()
+    try:
+        with MailSpool(path) as spool:
+            added = spool.enqueue(messages, day, roster, recipients, key)
+    except Exception as e:  # sqlite3 的异常类型需要导入后才能引用
+        log.error(f"无法写入发送队列 {path}: {e}", event='spool_failed', path=path, error=str(e))
+        return 1
+    log.info(f"已放入发送队列 {added} 封邮件" + (f"（{len(messages) - added} 封已在队列中）"
+                                            if added != len(messages) else ''),
+             event='spool_enqueue', path=path, queued=added, duplicates=len(messages) - added)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生日提醒发送队列")
+    parser.add_argument('--spool', metavar='FILE', help="发送队列数据库，默认取环境变量 MAIL_SPOOL 或 mail_spool.db")
+    parser.add_argument('--env', default='email.env', metavar='FILE',
+                        help="启动时加载的邮箱配置文件（存在且安装了 python-dotenv 时），默认 email.env")
+    commands = parser.add_subparsers(dest='command', required=True)
+    flush = commands.add_parser('flush', help="投递到期的邮件")
+    flush.add_argument('--limit', type=int, help="本次最多投递的邮件数")
+    flush.add_argument('--max-attempts', type=int, default=int(os.getenv('SPOOL_MAX_ATTEMPTS') or MAX_ATTEMPTS),
+                       help=f"每封邮件最多尝试的次数，之后移入死信，默认取环境变量 SPOOL_MAX_ATTEMPTS 或 {MAX_ATTEMPTS}")
+    sent_ledger.add_arguments(flush)
+    run_log.add_arguments(flush)
+    run_metrics.add_arguments(flush)
+    listing = commands.add_parser('list', help="列出队列中的邮件（最新的在前）")
+    listing.add_argument('--status', choices=[PENDING, SENDING, SENT, DEAD], help="只列出该状态的邮件")
+    listing.add_argument('--limit', type=int, default=50, help="最多列出的邮件数，默认50")
+    commands.add_parser('stats', help="各状态的邮件数")
+    retry = commands.add_parser('retry', help="把邮件重新放回队列（尝试次数清零）")
+    retry.add_argument('ids', nargs='*', type=int, help="邮件编号")
+    retry.add_argument('--dead', action='store_true', help="放回全部死信")
+    purge = commands.add_parser('purge', help="删除已发送的旧邮件")
+    purge.add_argument('--days', type=float, default=30, help="删除多少天前发送的邮件，默认30")
+    args = parser.parse_args()
+
+    if os.path.exists(args.env):
+        try:
+            from dotenv import load_dotenv
+        except ImportError:
+            pass  # GitHub Actions 等环境直接使用环境变量
+        else:
+            load_dotenv(args.env)
+    log = run_log.configure(args.verbosity, args.log_json) if args.command == 'flush' else run_log.get_log()
+
+    with MailSpool(spool_path(args.spool)) as spool:
+        if args.command == 'flush':
+            ledger = sent_ledger.from_args(args)
+            sent, retried, dead = spool.flush(args.limit, args.max_attempts, ledger)
+            if ledger is not None:
+                ledger.close()
+            log.info(f"发送队列: 成功 {sent} 封, 等待重试 {retried} 封, 移入死信 {dead} 封", event='spool_flush',
+                     sent=sent, retried=retried, dead=dead)
+            metrics = run_metrics.get_metrics()
+            metrics.labels['mode'] = 'spool'
+            metrics.set('exit_code', 1 if retried or dead else 0)
+            log.info(metrics.summary(), event='finish', **metrics.to_dict())
+            run_metrics.export(metrics, args)
+            return 1 if retried or dead else 0
+        if args.command == 'list':
+            for id_, status, attempts, next_attempt, to_email, subject, last_error in spool.entries(args.status,
+                                                                                               args.limit):
+                when = f"下次 {_format_time(next_attempt)}" if status in (PENDING, SENDING) else ''
+                print(f"{id_:>6} {status:<8} 尝试{attempts}次 {to_email} {subject} {when}"
+                      + (f" 错误: {last_error}" if last_error and status != SENT else ''))
+        elif args.command == 'stats':
+            counts = spool.stats()
+            print(', '.join(f"{status} {counts.get(status, 0)}" for status in (PENDING, SENDING, SENT, DEAD)))
+        elif args.command == 'retry':
+            if not args.ids and not args.dead:
+                parser.error("请指定邮件编号或 --dead")
+            print(f"已放回队列 {spool.retry(args.ids, args.dead)} 封邮件")
+        elif args.command == 'purge':
+            print(f"已删除 {spool.purge(args.days)} 封已发送的邮件")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+# 生日提醒系统 - 邮件模板
+# 项目在https://github.com/inkcoo/birthdays_reminder开源免费
+#
+# 邮件的 HTML 骨架和样式放在 templates/ 目录的模板文件中，变量写作 ${名称}:
+#     layout.html        整体页面（标题、样式、页脚），${content} 为正文
+#     single.html        一人过生日时的正文
+#     list.html          多人过生日时的正文，${items} 为名单
+#     list_item.html     名单中的一项
+#     digest.html        近期生日摘要的正文，${items} 为名单
+#     digest_item.html   摘要名单中的一项
+# 设置环境变量 MAIL_TEMPLATE_DIR 指向自己的目录，即可用同名文件替换其中任意模板，
+# 没有提供的模板仍使用默认模板，不需要修改代码。
+#
+# 每个模板文件只在第一次使用（或文件修改后）解析一次，拆成“固定文本, 变量名”片段；
+# 渲染时把片段和变量值依次放进列表再一次性拼接，名单再长也是线性耗时。
+# 变量值默认做 HTML 转义，姓名、部门中的 < > & 等字符不会破坏邮件格式。
+import os  # 用于定位模板文件和读取环境变量
+from html import escape  # 用于转义变量值
+from string import Template  # 借用 ${名称} 占位符的解析规则
+
+DEFAULT_TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+
+def _escape_value(value):
+    return escape(str(value))
+
+
+class CompiledTemplate:
+    """
+    解析后的模板
+
+    参数:
+        text: 模板文本，变量写作 ${名称} 或 $名称，$$ 表示字面的 $
+        name: 模板名称，用于错误提示
+    """
+
+    def __init__(self, text, name='<string>'):
+        self.name = name
+        self._parts = []  # [(固定文本, 变量名或None), ...]
+        position = 0
+        literal = []
+        for match in Template.pattern.finditer(text):
+            literal.append(text[position:match.start()])
+            position = match.end()
+            if match.group('escaped') is not None:
+                literal.append('$')
+                continue
+            field = match.group('named') or match.group('braced')
+            if field is None:
+                line_no = text.count('\n', 0, match.start()) + 1
+                raise ValueError(f"模板 {name} 中有无法识别的占位符 (第{line_no}行)")
+            self._parts.append((''.join(literal), field))
+            literal = []
+        literal.append(text[position:])
+        self._parts.append((''.join(literal), None))
+        self.fields = {field for _, field in self._parts if field}
+
+    def render(self, values):
+        """
+        渲染模板
+
+        参数:
+            values: {变量名: 已转义的字符串}
+
+        返回:
+            渲染结果字符串
+        """
+        return self.render_each((values,))
+
+    def render_each(self, rows, convert=None):
+        """
+        把多组变量逐个渲染并拼接为一个字符串（用于名单）
+
+        参数:
+            rows: {变量名: 字符串} 的序列
+            convert: 可选，插入前对每个变量值调用的函数（如转义）
+        """
+        chunks = []
+        append = chunks.append
+        parts = self._parts
+        try:
+            for values in rows:
+                for literal, field in parts:
+                    append(literal)
+                    if field is not None:
+                        append(values[field] if convert is None else convert(values[field]))
+        except KeyError as e:
+            raise ValueError(f"渲染模板 {self.name} 时缺少变量 {e.args[0]}") from None
+        return ''.join(chunks)
+
+
+class MailTemplates:
+    """
+    邮件模板集合：按名称查找模板文件，解析结果缓存，文件修改后自动重新解析
+
+    参数:
+        directory: 自定义模板目录，为None时使用环境变量 MAIL_TEMPLATE_DIR（未设置则只用默认模板）
+
+    用法:
+        templates = MailTemplates()
+        items = templates.render_each('list_item.html', [{'name': '张三'}, {'name': '李四'}])
+        content = templates.render('list.html', raw={'items': items})
+        body = templates.render('layout.html', heading='生日提醒', ..., raw={'content': content})
+    """
+
+    def __init__(self, directory=None):
+        directory = directory or os.getenv('MAIL_TEMPLATE_DIR')
+        self.directories = [directory, DEFAULT_TEMPLATE_DIR] if directory else [DEFAULT_TEMPLATE_DIR]
+        self._cache = {}  # 名称 -> (路径, 修改时间, CompiledTemplate)
+
+    def get(self, name):
+        """返回名为 name 的已解析模板"""
+        for directory in self.directories:
+            path = os.path.join(directory, name)
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+            cached = self._cache.get(name)
+            if cached is not None and cached[0] == path and cached[1] == mtime:
+                return cached[2]
+            with open(path, 'r', encoding='utf-8') as file:
+                template = CompiledTemplate(file.read().rstrip('\n'), path)
+            self._cache[name] = (path, mtime, template)
+            return template
+        raise FileNotFoundError(f"找不到邮件模板 {name}（查找目录: {', '.join(self.directories)}）")
+
+    def render(self, template_name, /, raw=None, **values):
+        """
+        渲染一个模板
+
+        参数:
+            template_name: 模板文件名
+            raw: 可选，{变量名: 已是 HTML 的字符串}，原样插入不转义（如渲染好的名单）
+            **values: 其余变量，转换为字符串并做 HTML 转义
+
+        返回:
+            渲染结果字符串
+        """
+        values = {key: _escape_value(value) for key, value in values.items()}
+        if raw:
+            values.update(raw)
+        return self.get(template_name).render(values)
+
+    def render_each(self, template_name, rows):
+        """
+        用同一个模板渲染多组变量并拼接（线性耗时）
+
+        参数:
+            template_name: 模板文件名
+            rows: 变量字典的序列，值会做 HTML 转义
+
+        返回:
+            拼接后的字符串
+        """
+        return self.get(template_name).render_each(rows, _escape_value)
+
+
+_default_templates = None
+
+
+def default_templates():
+    """返回进程内共用的 MailTemplates（常驻进程中也只解析一次模板）"""
+    global _default_templates
+    if _default_templates is None:
+        _default_templates = MailTemplates()
+    return _default_templates
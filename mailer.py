@@ -0,0 +1,143 @@
+# 生日提醒系统 - 邮件发送会话
+# 项目在https://github.com/inkcoo/birthdays_reminder开源免费
+import os  # 用于访问环境变量
+import time  # 用于计时
+import smtplib  # 用于发送邮件
+from email.mime.text import MIMEText  # 用于构建邮件内容
+from run_log import get_log  # 运行日志
+from run_metrics import get_metrics  # 运行指标（连接、登录、发送耗时）
+
+
+# 连接方式及其默认端口
+DEFAULT_PORTS = {'ssl': 465, 'starttls': 587, 'plain': 25}
+
+
+class MailerSession:
+    """
+    SMTP 邮件发送会话：一次连接、一次登录，发送多封邮件
+
+    参数（未指定时从环境变量读取）:
+        host: SMTP 服务器，环境变量 SMTP_HOST，默认 smtp.qq.com
+        port: 端口，环境变量 SMTP_PORT，默认 ssl 为465、starttls 为587、plain 为25
+        user: 发件人邮箱，环境变量 SMTP_USER
+        password: 邮箱授权码，环境变量 SMTP_PASSWORD
+        security: 连接方式，环境变量 SMTP_SECURITY：
+                  ssl（默认，QQ 邮箱的方式）、starttls（明文连接后升级为 TLS）、
+                  plain（不加密，仅用于本地测试用的 SMTP 服务器）
+        timeout: 网络超时秒数
+
+    用法:
+        with MailerSession() as mailer:
+            mailer.send(subject, body, 'a@example.com')
+            mailer.send(subject, body, 'b@example.com')
+
+    第一次发送时才建立连接；服务器中途断开（SMTPServerDisconnected）时自动重连并重发一次。
+    """
+
+    def __init__(self, host=None, port=None, user=None, password=None, security=None, timeout=30):
+        self.security = (security or os.getenv('SMTP_SECURITY') or 'ssl').strip().lower()
+        if self.security not in DEFAULT_PORTS:
+            raise ValueError(f"不支持的 SMTP_SECURITY: {self.security}（可选 ssl / starttls / plain）")
+        self.host = host or os.getenv('SMTP_HOST') or "smtp.qq.com"  # 默认QQ邮箱SMTP服务器
+        self.port = int(port or os.getenv('SMTP_PORT') or DEFAULT_PORTS[self.security])
+        self.user = user or os.getenv('SMTP_USER')  # 发件人邮箱
+        self.password = password or os.getenv('SMTP_PASSWORD')  # 邮箱授权码
+        self.timeout = timeout
+        self.last_error = None  # 最近一次发送失败的原因
+        self._server = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def connect(self):
+        """建立连接并登录（已连接时不重复登录）"""
+        if self._server is not None:
+            return
+        metrics = get_metrics()
+        started = time.perf_counter()
+        if self.security == 'ssl':
+            server = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.security == 'starttls':
+                server.starttls()
+            server.ehlo_or_helo_if_needed()
+            metrics.add('smtp_connect', time.perf_counter() - started)
+            if server.has_extn('auth'):  # 本地测试服务器可能不需要登录
+                started = time.perf_counter()
+                server.login(self.user, self.password)  # 登录邮箱
+                metrics.add('smtp_login', time.perf_counter() - started)
+        except Exception:
+            server.close()
+            raise
+        self._server = server
+
+    def _discard(self):
+        """丢弃已断开的连接（不再发送 QUIT）"""
+        server, self._server = self._server, None
+        if server is not None:
+            server.close()
+
+    def close(self):
+        """退出登录并关闭连接"""
+        server, self._server = self._server, None
+        if server is None:
+            return
+        try:
+            server.quit()
+        except smtplib.SMTPResponseException as e:
+            # QQ邮箱在退出时偶尔返回异常响应，此时邮件已经发出，可忽略
+            get_log().detail(f"关闭邮件连接时遇到异常响应(可忽略): {e}")
+            server.close()
+        except Exception:
+            server.close()
+
+    def _sendmail(self, to_email, message):
+        started = time.perf_counter()
+        self._server.sendmail(self.user, [to_email], message)
+        get_metrics().add('smtp_send', time.perf_counter() - started, 1)
+
+    def send(self, subject, body, to_email):
+        """
+        发送一封 HTML 邮件
+
+        参数:
+            subject: 邮件主题
+            body: 邮件正文内容（HTML）
+            to_email: 收件人邮箱地址
+
+        返回:
+            True表示发送成功，False表示发送失败
+        """
+        if not all([self.user, self.password]):
+            self.last_error = "邮件配置不完整，请设置 SMTP_USER 和 SMTP_PASSWORD"
+            get_log().error(f"错误：{self.last_error}", event='mail_config_error')
+            return False
+
+        # 创建邮件内容对象，支持HTML格式
+        msg = MIMEText(body, 'html', 'utf-8')
+        msg['Subject'] = subject  # 设置邮件主题
+        msg['From'] = self.user  # 设置发件人
+        msg['To'] = to_email  # 设置收件人
+        message = msg.as_string()
+
+        try:
+            try:
+                self.connect()
+                self._sendmail(to_email, message)
+            except smtplib.SMTPServerDisconnected:
+                # 服务器关闭了空闲连接，重新连接后再发一次
+                self._discard()
+                self.connect()
+                self._sendmail(to_email, message)
+            return True
+        except Exception as e:
+            self.last_error = str(e) or type(e).__name__
+            get_log().error(f"邮件发送失败: {e}", event='mail_error', to_email=to_email, error=self.last_error)
+            if isinstance(e, smtplib.SMTPServerDisconnected) or not isinstance(e, smtplib.SMTPException):
+                self._discard()  # 连接已不可用，下次发送时重新连接
+            return False
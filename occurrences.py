@@ -0,0 +1,117 @@
+# 生日提醒系统 - 近期生日查询（“未来 N 天谁过生日”）
+# 项目在https://github.com/inkcoo/birthdays_reminder开源免费
+#
+# 为每个人算出从今天起下一次过生日的公历日期（农历生日换算成对应年份的公历日期），
+# 按日期排序后保存；任意天数的查询只需二分查找加切片，不必对每一天重新扫描全部名册。
+from bisect import bisect_left  # 用于二分查找
+from datetime import date, timedelta  # 用于处理日期
+import lunar_table  # 预先生成的农历/公历转换表
+
+
+def lunar_birthday(lunar_year, month, day, is_leap=False):
+    """
+    计算农历生日在某个农历年对应的公历日期
+
+    规则（与每日提醒一致）:
+        三十日出生而该月只有29天时，在二十九日（该月最后一天）过生日；
+        当年有同一个月的闰月时，闰月的同月同日也算生日，这一年会提醒两次。
+
+    参数:
+        lunar_year: 农历年
+        month, day: 生日的农历月、日
+        is_leap: 是否计算闰月里的那一次
+
+    返回:
+        datetime.date；该年没有这个月（或闰月）、日期不合法或超出转换表范围时返回None
+    """
+    length = lunar_table.month_length(lunar_year, month, is_leap)
+    if length is None or not 1 <= day <= 30:
+        return None
+    return lunar_table.to_solar(lunar_year, month, min(day, length), is_leap)
+
+
+def next_occurrence(calendar_type, month, day, today):
+    """
+    计算某个生日从 today（含当天）起下一次出现的公历日期
+
+    参数:
+        calendar_type: a=公历, b=农历
+        month, day: 生日的月、日
+        today: datetime.date，起算日期
+
+    返回:
+        datetime.date；生日在转换表范围内不存在时返回None
+        （与每日提醒的判断一致：公历2月29日只在闰年出现，农历生日的规则见 lunar_birthday()）
+    """
+    if calendar_type == 'a':
+        for year in range(today.year, today.year + 8):  # 2月29日最多隔8年（如2096→2104）
+            try:
+                candidate = date(year, month, day)
+            except ValueError:
+                continue  # 该年没有这一天（如平年的2月29日）
+            if candidate >= today:
+                return candidate
+        return None
+
+    lunar_year = lunar_table.to_lunar(today.year, today.month, today.day).year
+    for year in range(lunar_year, lunar_year + 4):
+        candidates = []
+        for is_leap in (False, True):
+            candidate = lunar_birthday(year, month, day, is_leap)
+            if candidate is not None and candidate >= today:
+                candidates.append(candidate)
+        if candidates:
+            return min(candidates)
+    return None
+
+
+class UpcomingIndex:
+    """
+    按下一次生日日期排序的索引
+
+    参数:
+        roster: RosterColumns 名册
+        today: datetime.date，起算日期
+
+    同一个 (类型, 月, 日) 只换算一次，最多约 750 种，因此构建代价约等于遍历一遍名册。
+
+    用法:
+        upcoming = UpcomingIndex(roster, clock.today)
+        for occurrence, row in upcoming.window(7):   # 未来7天（含今天）
+            record = roster[row]
+    """
+
+    def __init__(self, roster, today):
+        self.today = today
+        resolved = {}
+        entries = []
+        for row, key in enumerate(zip(roster.months, roster.days)):
+            key = ('b' if roster.is_lunar(row) else 'a',) + key
+            occurrence = resolved.get(key, False)
+            if occurrence is False:
+                occurrence = resolved[key] = next_occurrence(*key, today)
+            if occurrence is not None:
+                entries.append((occurrence, row))
+        entries.sort()
+        self._dates = [occurrence for occurrence, _ in entries]
+        self._entries = entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def window(self, days):
+        """
+        查询从今天起 days 天内（含今天）过生日的人
+
+        参数:
+            days: 天数，1 表示只查今天；超过一年时每人仍只列出下一次生日
+
+        返回:
+            [(公历日期, 行号), ...]，按日期排序
+        """
+        end = bisect_left(self._dates, self.today + timedelta(days=days))
+        return self._entries[:end]
+
+    def between(self, start, end):
+        """查询 [start, end) 区间内过生日的人，返回 [(公历日期, 行号), ...]"""
+        return self._entries[bisect_left(self._dates, start):bisect_left(self._dates, end)]
@@ -0,0 +1,124 @@
+# 生日提醒系统 - 多进程并行解析大生日文件
+# 项目在https://github.com/inkcoo/birthdays_reminder开源免费
+#
+# 几 GB 的合并名册逐行解析很慢（其中农历生日还要换算出生当天的公历日期）。
+# 这里把文件按字节切成若干段，每段的起点都对齐到换行之后，交给进程池分别解析成
+# RosterColumns，再按原来的顺序合并为一个名册。每段只统计自己的行数，合并时
+# 加上前面各段的行数，格式不正确的行仍按整个文件的行号提示。
+#
+# 进程数由参数或环境变量 PARSE_WORKERS 指定，默认为 CPU 核数；
+# 文件较小（每个进程分不到 MIN_BYTES_PER_WORKER）或只有一个进程时直接逐行解析。
+import os  # 用于读取文件大小和 CPU 核数
+from itertools import repeat
+from birthday_core import BIRTHDAY_LINE, BirthdayRecord
+from roster_store import RosterColumns
+from run_log import get_log
+
+MIN_BYTES_PER_WORKER = 4 << 20  # 每个进程至少分到 4MB（约 20 万行）才值得启动进程池
+CHUNKS_PER_WORKER = 4  # 每个进程分几段，段数多一些，先做完的进程可以接着做下一段
+
+
+def resolve_workers(workers=None):
+    """确定进程数：参数 > 环境变量 PARSE_WORKERS > CPU 核数"""
+    workers = workers or os.getenv('PARSE_WORKERS')
+    if workers:
+        return max(1, int(workers))
+    return os.cpu_count() or 1
+
+
+def split_ranges(filename, parts):
+    """
+    把文件切成约 parts 段字节范围，每段（除第一段外）都从某个换行之后开始
+
+    返回:
+        [(起始位置, 结束位置), ...]，首尾相接覆盖整个文件
+    """
+    size = os.path.getsize(filename)
+    parts = max(1, min(parts, size))
+    boundaries = [0]
+    with open(filename, 'rb') as file:
+        for i in range(1, parts):
+            position = size * i // parts
+            if position <= boundaries[-1]:
+                continue
+            file.seek(position - 1)
+            file.readline()  # 读到下一个换行（position-1 恰好是换行时不跳过下一行）
+            position = file.tell()
+            if position >= size:
+                break
+            if position > boundaries[-1]:
+                boundaries.append(position)
+    boundaries.append(size)
+    return list(zip(boundaries, boundaries[1:]))
+
+
+def parse_range(filename, start, end):
+    """
+    解析文件中 [start, end) 这一段（在子进程中运行）
+
+    返回:
+        (RosterColumns, 格式不正确的行 [(段内行号, 内容), ...], 段内行数)
+    """
+    with open(filename, 'rb') as file:
+        file.seek(start)
+        text = file.read(end - start).decode('utf-8')
+    if '\r' in text:  # 与文本模式读取一致：\r\n 和单独的 \r 都算换行
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    lines = text.split('\n')
+    if lines[-1] == '':
+        lines.pop()  # 段末的换行之后没有内容
+
+    roster = RosterColumns()
+    append = roster.append
+    match_line = BIRTHDAY_LINE.fullmatch
+    bad_lines = []
+    for line_no, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        match = match_line(line)
+        if match is None:
+            bad_lines.append((line_no, line))
+            continue
+        name, year, month, day, calendar_type, department = match.groups()
+        append(BirthdayRecord(name, int(year) if year else None, int(month), int(day),
+                              calendar_type, department))
+    return roster, bad_lines, len(lines)
+
+
+def read_roster(filename, errors=None, workers=None):
+    """
+    读取生日文件为 RosterColumns，大文件用多进程并行解析
+
+    参数:
+        filename: 包含生日数据的文件名
+        errors: 可选列表，格式不正确的行会以 (行号, 内容) 追加到其中
+        workers: 进程数，为None时使用环境变量 PARSE_WORKERS 或 CPU 核数
+
+    返回:
+        RosterColumns，记录顺序与文件中的顺序相同
+    """
+    workers = resolve_workers(workers)
+    size = os.path.getsize(filename)
+    workers = min(workers, size // MIN_BYTES_PER_WORKER)
+    if workers <= 1:
+        return RosterColumns.from_file(filename, errors)
+
+    from concurrent.futures import ProcessPoolExecutor  # 只在并行解析时导入
+    ranges = split_ranges(filename, workers * CHUNKS_PER_WORKER)
+    log = get_log()
+    roster = None
+    line_base = 0  # 前面各段的总行数
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        starts, ends = zip(*ranges)
+        # map 按提交顺序返回结果，前面的段一解析完就开始合并
+        for part, bad_lines, line_count in pool.map(parse_range, repeat(filename), starts, ends):
+            for line_no, line in bad_lines:
+                line_no += line_base
+                log.warning(f"跳过格式不正确的行 (第{line_no}行): {line}",
+                            event='bad_line', line_no=line_no, line=line)
+                if errors is not None:
+                    errors.append((line_no, line))
+            roster = part if roster is None else roster.extend(part)
+            line_base += line_count
+    return roster
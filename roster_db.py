@@ -0,0 +1,328 @@
+# 生日提醒系统 - SQLite 生日数据库（可选的名册存储方式，适合多人维护的大名册）
+# 项目在https://github.com/inkcoo/birthdays_reminder开源免费
+#
+# birthdays.txt 适合一个小组织手工维护；几万人以上、由多人同时编辑、还要供其他系统查询的名册，
+# 每次增删一个人都要重写几 MB 的文本文件。这里把名册存放在 SQLite 数据库中:
+#     people 表每人一行，按 (calendar_type, month, day) 和 department 建立索引；
+#     每日提醒、近期生日摘要和按部门查询都是走索引的 SQL 查询，只读取需要的那几行；
+#     增删一个人只修改一行，多个进程可以同时读写（SQLite 负责加锁）。
+# 与 birthdays.txt 的四种格式互相转换: import 导入（默认替换全部记录），export 导出。
+#
+# 提醒脚本加 --roster-db FILE 参数（或设置环境变量 ROSTER_DB）时从数据库而不是 birthdays.txt 读取名册。
+#
+# 用法:
+#     python roster_db.py import birthdays.txt               # 导入（替换数据库中的全部记录）
+#     python roster_db.py import new.txt --append            # 追加
+#     python roster_db.py export birthdays.txt               # 导出为生日文件
+#     python roster_db.py add 张三-1990-10-12-a-技术部        # 增加一人
+#     python roster_db.py remove 张三                         # 删除一人（同名多人时需要 --all 或写出整行）
+#     python roster_db.py list --date 2025-10-18             # 某天过生日的人
+#     python roster_db.py list --upcoming 7                  # 未来7天过生日的人
+#     python roster_db.py list --department 技术部            # 某个部门的人
+import os  # 用于访问环境变量和处理文件
+import sys  # 用于退出程序
+import argparse  # 用于解析命令行参数
+from datetime import timedelta
+from birthday_core import BirthdayRecord, RunClock, format_birthday_line, iter_birthdays, parse_birthday_line, \
+    parse_date
+from today_scan import today_targets
+from run_log import get_log
+
+DEFAULT_DATABASE = 'birthdays.db'
+MAX_UPCOMING_DAYS = 8 * 366  # 超过8年时每人都已出现过一次（公历2月29日最多隔8年）
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS people (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    year INTEGER,
+    month INTEGER NOT NULL,
+    day INTEGER NOT NULL,
+    calendar_type TEXT NOT NULL CHECK (calendar_type IN ('a', 'b')),
+    department TEXT
+)
+"""
+_INDEXES = {
+    'people_date': "CREATE INDEX IF NOT EXISTS people_date ON people (calendar_type, month, day)",
+    'people_department': "CREATE INDEX IF NOT EXISTS people_department ON people (department)",
+}
+_COLUMNS = "name, year, month, day, calendar_type, department"
+_INSERT = f"INSERT INTO people ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)"
+
+
+def _match_keys(keys):
+    """
+    把 (类型, 月, 日) 集合写成 WHERE 条件
+
+    同一类型、同一月份的日期合并为 day IN (...)，每一项都能使用 people_date 索引
+
+    返回:
+        (SQL 条件, 参数列表)
+    """
+    groups = {}
+    for calendar_type, month, day in keys:
+        groups.setdefault((calendar_type, month), set()).add(day)
+    clauses, params = [], []
+    for (calendar_type, month), days in sorted(groups.items()):
+        clauses.append(f"(calendar_type = ? AND month = ? AND day IN ({', '.join('?' * len(days))}))")
+        params += [calendar_type, month, *sorted(days)]
+    return ' OR '.join(clauses) or '0', params
+
+
+class RosterDB:
+    """
+    SQLite 生日数据库
+
+    参数:
+        path: 数据库文件，不存在时自动创建
+        shared: 为True时允许在其他线程中使用同一个连接（如多线程的查询服务），由调用者负责加锁
+
+    查询接口与生日日历、列式名册相同，可以直接替换:
+        database = RosterDB('birthdays.db')
+        today_birthdays = database.on(clock.today)            # 同 OccurrenceCalendar.on()
+        upcoming = database.upcoming(clock.today, 7)          # 同 RosterColumns.upcoming()
+    """
+
+    def __init__(self, path, shared=False):
+        import sqlite3  # 只在使用数据库时导入
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=not shared)
+        with self._db:
+            self._db.execute(_SCHEMA)
+            for statement in _INDEXES.values():
+                self._db.execute(statement)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self._db.close()
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM people").fetchone()[0]
+
+    def _select(self, where, params=(), order='id'):
+        rows = self._db.execute(f"SELECT {_COLUMNS} FROM people WHERE {where} ORDER BY {order}", params)
+        return [BirthdayRecord(*row) for row in rows]
+
+    def records(self):
+        """按导入（添加）顺序逐条生成全部记录"""
+        for row in self._db.execute(f"SELECT {_COLUMNS} FROM people ORDER BY id"):
+            yield BirthdayRecord(*row)
+
+    def on(self, day):
+        """
+        查找某天过生日的人
+
+        参数:
+            day: datetime.date
+
+        返回:
+            BirthdayRecord 列表，与 birthday_core.find_birthdays() 的结果和顺序相同
+            （公历生日在前，农历生日在后，同类按导入顺序）
+        """
+        where, params = _match_keys(today_targets(RunClock(day)))
+        return self._select(where, params, order='calendar_type, day, id')
+
+    def upcoming(self, today, days):
+        """
+        查询从 today 起 days 天内（含当天）过生日的人
+
+        逐日算出每天对应的 (类型, 月, 日)，只用一次索引查询取回这些记录
+
+        返回:
+            [(公历日期, BirthdayRecord), ...]，按日期排序，与 occurrences.UpcomingIndex.window() 相同
+            （超过一年时每人仍只列出下一次生日）
+        """
+        first_day = {}  # (类型, 月, 日) -> 从 today 起第一次对应的公历日期
+        for offset in range(min(days, MAX_UPCOMING_DAYS)):
+            day = today + timedelta(days=offset)
+            try:
+                keys = today_targets(RunClock(day))
+            except ValueError:
+                break  # 超出农历转换表范围
+            for key in keys:
+                first_day.setdefault(key, day)
+        if not first_day:
+            return []
+        where, params = _match_keys(first_day)
+        rows = self._db.execute(f"SELECT id, {_COLUMNS} FROM people WHERE {where}", params)
+        entries = [(first_day[row[5], row[3], row[4]], row[0], BirthdayRecord(*row[1:])) for row in rows]
+        entries.sort(key=lambda entry: entry[:2])
+        return [(occurrence, record) for occurrence, _, record in entries]
+
+    def ages(self, clock):
+        """所有人今天的年龄，与 records() 的顺序对应，未知为-1（见 RosterColumns.ages()）"""
+        from roster_store import RosterColumns
+        return RosterColumns.from_records(self.records()).ages(clock)
+
+    def department(self, name):
+        """返回某个部门的全部记录（按导入顺序）"""
+        return self._select("department = ?", (name,))
+
+    def add(self, record):
+        """增加一条 BirthdayRecord，返回其编号"""
+        with self._db:
+            return self._db.execute(_INSERT, tuple(record)).lastrowid
+
+    def find(self, name):
+        """按姓名查找，返回 [(编号, BirthdayRecord), ...]"""
+        rows = self._db.execute(f"SELECT id, {_COLUMNS} FROM people WHERE name = ? ORDER BY id", (name,))
+        return [(row[0], BirthdayRecord(*row[1:])) for row in rows]
+
+    def remove(self, ids):
+        """按编号删除记录，返回删除的条数"""
+        with self._db:
+            return self._db.executemany("DELETE FROM people WHERE id = ?", [(id_,) for id_ in ids]).rowcount
+
+    def import_file(self, filename, replace=True, errors=None):
+        """
+        从生日文件批量导入（四种格式见 birthday_core.iter_birthdays()）
+
+        在一个事务中完成，导入失败时数据库保持原样；替换导入时先删除索引，插入完成后再重建，
+        比逐行维护索引快得多
+
+        参数:
+            filename: 生日文件
+            replace: 为True时先删除数据库中的全部记录
+            errors: 可选列表，用于收集格式不正确的行 (行号, 内容)
+
+        返回:
+            导入的记录数
+        """
+        db = self._db
+        before = len(self)
+        with db:
+            db.execute("BEGIN")
+            if replace:
+                for name in _INDEXES:
+                    db.execute(f"DROP INDEX IF EXISTS {name}")
+                db.execute("DELETE FROM people")
+                before = 0
+            db.executemany(_INSERT, iter_birthdays(filename, errors))
+            for statement in _INDEXES.values():
+                db.execute(statement)  # 重建索引（追加导入时索引未删除，直接跳过）
+        return len(self) - before
+
+    def export_file(self, filename):
+        """
+        把全部记录按导入顺序写成生日文件（先写临时文件再替换）
+
+        返回:
+            导出的记录数
+        """
+        temp_path = f"{filename}.{os.getpid()}.tmp"
+        count = 0
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                for record in self.records():
+                    file.write(format_birthday_line(record) + '\n')
+                    count += 1
+            os.replace(temp_path, filename)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return count
+
+
+def add_arguments(parser):
+    """为提醒脚本添加 --roster-db 参数"""
+    parser.add_argument('--roster-db', metavar='FILE',
+                        help="从 SQLite 生日数据库（由 python roster_db.py import 生成）而不是 birthdays.txt 读取名册，"
+                             "默认取环境变量 ROSTER_DB")
+
+
+def from_args(args, shared=False):
+    """
+    按 --roster-db 参数或环境变量 ROSTER_DB 打开生日数据库
+
+    参数:
+        args: 解析后的命令行参数
+        shared: 见 RosterDB
+
+    返回:
+        RosterDB，未配置时返回None
+
+    异常:
+        FileNotFoundError: 数据库文件不存在（不自动创建空数据库，以免路径写错时当作没有人过生日）
+    """
+    path = args.roster_db or os.getenv('ROSTER_DB')
+    if not path:
+        return None
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"找不到生日数据库 {path}，请先运行 python roster_db.py import birthdays.txt")
+    return RosterDB(path, shared)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite 生日数据库")
+    parser.add_argument('--db', metavar='FILE',
+                        help=f"生日数据库，默认取环境变量 ROSTER_DB 或 {DEFAULT_DATABASE}")
+    commands = parser.add_subparsers(dest='command', required=True)
+    importer = commands.add_parser('import', help="从生日文件导入（默认替换全部记录）")
+    importer.add_argument('file', help="生日文件，如 birthdays.txt")
+    importer.add_argument('--append', action='store_true', help="追加到现有记录之后，不删除原有记录")
+    exporter = commands.add_parser('export', help="导出为生日文件")
+    exporter.add_argument('file', help="导出的文件（已存在时覆盖）")
+    adder = commands.add_parser('add', help="增加一人")
+    adder.add_argument('line', help="生日文件中一行的格式，如 张三-1990-10-12-a-技术部")
+    remover = commands.add_parser('remove', help="删除一人")
+    remover.add_argument('who', help="姓名，或生日文件中一行的格式（只删除完全相同的记录）")
+    remover.add_argument('--all', action='store_true', help="同名多人时全部删除")
+    listing = commands.add_parser('list', help="查询生日")
+    query = listing.add_mutually_exclusive_group(required=True)
+    query.add_argument('--date', type=parse_date, help="某天（格式 YYYY-MM-DD）过生日的人")
+    query.add_argument('--upcoming', type=int, metavar='N', help="从今天（北京时间）起 N 天内过生日的人")
+    query.add_argument('--department', help="某个部门的人")
+    args = parser.parse_args()
+
+    path = args.db or os.getenv('ROSTER_DB') or DEFAULT_DATABASE
+    if args.command != 'import' and not os.path.exists(path):
+        parser.error(f"找不到生日数据库 {path}，请先导入生日文件")
+    with RosterDB(path) as database:
+        if args.command == 'import':
+            errors = []
+            count = database.import_file(args.file, replace=not args.append, errors=errors)
+            print(f"已导入 {count} 条记录到 {path}" + (f"，跳过 {len(errors)} 行格式不正确的行" if errors else '')
+                  + f"，共 {len(database)} 条")
+        elif args.command == 'export':
+            print(f"已导出 {database.export_file(args.file)} 条记录到 {args.file}")
+        elif args.command == 'add':
+            record = parse_birthday_line(args.line.strip())
+            if record is None:
+                parser.error(f"格式不正确: {args.line}（应为 姓名-[年-]月-日-类型[-部门]）")
+            database.add(record)
+            print(f"已增加: {format_birthday_line(record)}")
+        elif args.command == 'remove':
+            record = parse_birthday_line(args.who.strip())
+            name = record.name if record is not None else args.who.strip()
+            matches = [(id_, found) for id_, found in database.find(name) if record is None or found == record]
+            if not matches:
+                get_log().error(f"没有找到: {args.who}")
+                return 1
+            if len(matches) > 1 and record is None and not args.all:
+                for _, found in matches:
+                    print(format_birthday_line(found))
+                get_log().error(f"有 {len(matches)} 条同名记录，请写出整行或加 --all")
+                return 1
+            database.remove([id_ for id_, _ in matches])
+            for _, found in matches:
+                print(f"已删除: {format_birthday_line(found)}")
+        elif args.command == 'list':
+            if args.date:
+                lines = [format_birthday_line(record) for record in database.on(args.date)]
+            elif args.upcoming:
+                lines = [f"{occurrence.isoformat()} {format_birthday_line(record)}"
+                         for occurrence, record in database.upcoming(RunClock().today, args.upcoming)]
+            else:
+                lines = [format_birthday_line(record) for record in database.department(args.department)]
+            for line in lines:
+                print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
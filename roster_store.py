@@ -0,0 +1,401 @@
+# 生日提醒系统 - 列式生日名册（用于几十万到几百万条记录的大名册）
+# 项目在https://github.com/inkcoo/birthdays_reminder开源免费
+#
+# 每条记录不再是一个对象，而是分散存放在几个紧凑数组中:
+#     姓名      UTF-8 字节串拼接 + 偏移数组
+#     年/月/日  array('H') / array('B')，年份为0表示未填写
+#     类型      位图，第 i 位为1表示第 i 条是农历生日
+#     部门      字符串池 + 编号数组，编号0表示未填写
+# 另外预先算好每人出生那天的公历年份和月日，年龄计算只剩整数比较。
+# 安装了 NumPy 时，“今天谁过生日”“所有人今天几岁”会用向量运算一次算完；
+# 没有 NumPy 时自动退回逐条比较，结果相同。
+#
+# load_roster() 会把列式名册和日期索引保存为生日文件旁边的解析快照
+# （如 birthdays.txt.cache），文件内容不变时直接载入快照而不重新解析。
+import os  # 用于读取文件状态
+import pickle  # 用于保存解析快照
+import hashlib  # 用于计算文件内容哈希
+from array import array  # 用于紧凑存储整数列
+from bisect import bisect_right  # 用于由姓名位置找到行号
+import lunar_table  # 预先生成的农历/公历转换表
+from birthday_core import BirthdayRecord, iter_birthdays
+from run_log import get_log
+
+try:
+    import numpy as np  # 可选依赖，用于向量化查询
+except ImportError:
+    np = None
+
+# 快照格式变化时递增版本号，旧快照会被自动忽略
+SNAPSHOT_SUFFIX = '.cache'
+SNAPSHOT_VERSION = 1
+
+
+class RosterColumns:
+    """
+    列式存储的生日名册
+
+    用法:
+        roster = RosterColumns.from_file('birthdays.txt')
+        rows = roster.birthdays_on(clock)   # 今天过生日的行号
+        ages = roster.ages(clock)           # 所有人今天的年龄，未知为-1
+        upcoming = roster.upcoming(clock.today, 7)   # 未来7天的 (公历日期, 记录)
+        record = roster[rows[0]]            # 取回 BirthdayRecord
+    """
+
+    def __init__(self):
+        self._names = bytearray()  # 所有姓名的 UTF-8 字节拼接
+        self._name_offsets = array('Q', [0])  # 第 i 个姓名为 _names[offsets[i]:offsets[i+1]]
+        self.years = array('H')  # 出生年份，0 表示未填写
+        self.months = array('B')
+        self.days = array('B')
+        self._lunar_bits = bytearray()  # 日历类型位图，1=农历
+        self.department_ids = array('I')  # 部门编号，0 表示未填写
+        self.departments = [None]  # 部门字符串池，编号即下标
+        self._department_lookup = {}
+        self.birth_years = array('H')  # 出生当天的公历年份，0 表示无法计算年龄
+        self.birth_md = array('H')  # 出生当天的公历 月*32+日
+
+    @classmethod
+    def from_records(cls, records):
+        """由 BirthdayRecord 序列构建"""
+        roster = cls()
+        for record in records:
+            roster.append(record)
+        return roster
+
+    @classmethod
+    def from_file(cls, filename, errors=None):
+        """直接从生日文件构建，不保留中间的记录对象"""
+        return cls.from_records(iter_birthdays(filename, errors))
+
+    def __len__(self):
+        return len(self.months)
+
+    def append(self, record):
+        """追加一条 BirthdayRecord"""
+        i = len(self.months)
+        self._names += record.name.encode('utf-8')
+        self._name_offsets.append(len(self._names))
+        self.years.append(record.year or 0)
+        self.months.append(record.month)
+        self.days.append(record.day)
+
+        if i % 8 == 0:
+            self._lunar_bits.append(0)
+        if record.calendar_type == 'b':
+            self._lunar_bits[i >> 3] |= 1 << (i & 7)
+
+        department_id = 0
+        if record.department is not None:
+            department_id = self._department_lookup.get(record.department)
+            if department_id is None:
+                department_id = len(self.departments)
+                self.departments.append(record.department)
+                self._department_lookup[record.department] = department_id
+        self.department_ids.append(department_id)
+
+        # 预先换算出生当天的公历日期，农历生日也只换算这一次
+        birth_year, birth_md = 0, 0
+        if record.year is not None:
+            if record.calendar_type == 'a':
+                birth_year, birth_md = record.year, record.month * 32 + record.day
+            else:
+                try:
+                    solar = lunar_table.to_solar(record.year, record.month, record.day)
+                    birth_year, birth_md = solar.year, solar.month * 32 + solar.day
+                except ValueError:
+                    pass  # 农历日期不存在或超出范围，视为无法计算年龄
+        self.birth_years.append(birth_year)
+        self.birth_md.append(birth_md)
+
+    def extend(self, other):
+        """
+        把另一个名册的记录追加到末尾（用于合并并行解析的各段结果）
+
+        参数:
+            other: RosterColumns，合并后 other 的第 i 条成为本名册的第 len(self)+i 条
+        """
+        count = len(self)
+        base = len(self._names)
+        self._names += other._names
+        self._name_offsets.extend(map(base.__add__, other._name_offsets[1:]))
+        self.years.extend(other.years)
+        self.months.extend(other.months)
+        self.days.extend(other.days)
+        self.birth_years.extend(other.birth_years)
+        self.birth_md.extend(other.birth_md)
+
+        # 位图按位拼接：count 不是8的倍数时整体移位
+        if count % 8 == 0:
+            self._lunar_bits += other._lunar_bits
+        else:
+            bits = (int.from_bytes(self._lunar_bits, 'little')
+                    | int.from_bytes(other._lunar_bits, 'little') << count)
+            self._lunar_bits = bytearray(bits.to_bytes((count + len(other) + 7) // 8, 'little'))
+
+        # 部门编号换算到本名册的字符串池
+        mapping = [0]
+        for department in other.departments[1:]:
+            department_id = self._department_lookup.get(department)
+            if department_id is None:
+                department_id = len(self.departments)
+                self.departments.append(department)
+                self._department_lookup[department] = department_id
+            mapping.append(department_id)
+        self.department_ids.extend(map(mapping.__getitem__, other.department_ids))
+        return self
+
+    def delete(self, rows):
+        """
+        删除若干行（原地修改，其后的行号依次前移）
+
+        各列按下标删除（整段内存移动），姓名偏移整体减去被删姓名的长度（有 NumPy 时为向量运算），
+        删除几行的开销与名册大小有关，但都在 C 中完成
+
+        参数:
+            rows: 要删除的行号
+        """
+        for i in sorted(set(rows), reverse=True):
+            start, stop = self._name_offsets[i], self._name_offsets[i + 1]
+            del self._names[start:stop]
+            del self._name_offsets[i + 1]
+            shift = stop - start
+            if shift and np is not None:
+                tail = np.frombuffer(self._name_offsets, dtype=np.uint64)[i + 1:]
+                tail -= shift
+                del tail  # 释放对数组缓冲区的引用，之后数组才能改变长度
+            elif shift:
+                self._name_offsets[i + 1:] = array('Q', map((-shift).__add__, self._name_offsets[i + 1:]))
+            for column in (self.years, self.months, self.days, self.department_ids, self.birth_years,
+                           self.birth_md):
+                del column[i]
+            # 位图中第 i 位之后的各位整体前移一位
+            bits = int.from_bytes(self._lunar_bits, 'little')
+            bits = bits & ((1 << i) - 1) | bits >> (i + 1) << i
+            self._lunar_bits = bytearray(bits.to_bytes((len(self) + 7) // 8, 'little'))
+
+    def find(self, record):
+        """
+        查找与 record 完全相同的行
+
+        在拼接的姓名字节串中查找姓名（C 中完成，不逐条构建记录），再核对其余字段
+
+        返回:
+            行号列表（按名册顺序）
+        """
+        encoded = record.name.encode('utf-8')
+        offsets = self._name_offsets
+        rows = []
+        position = self._names.find(encoded)
+        while position != -1:
+            i = bisect_right(offsets, position) - 1
+            if offsets[i] == position and offsets[i + 1] - position == len(encoded) and self[i] == record:
+                rows.append(i)
+            position = self._names.find(encoded, position + 1)
+        return rows
+
+    def is_lunar(self, i):
+        return bool(self._lunar_bits[i >> 3] >> (i & 7) & 1)
+
+    def name(self, i):
+        return self._names[self._name_offsets[i]:self._name_offsets[i + 1]].decode('utf-8')
+
+    def __getitem__(self, i):
+        """取回第 i 条记录"""
+        return BirthdayRecord(
+            self.name(i),
+            self.years[i] or None,
+            self.months[i],
+            self.days[i],
+            'b' if self.is_lunar(i) else 'a',
+            self.departments[self.department_ids[i]],
+        )
+
+    def records(self, rows=None):
+        """按行号逐条取回记录，rows为None时返回全部"""
+        for i in (range(len(self)) if rows is None else rows):
+            yield self[i]
+
+    def build_index(self):
+        """
+        构建按日期查找的索引
+
+        返回:
+            字典，键为 (类型, 月, 日)，值为当天过生日的行号列表，
+            可直接用于 birthday_core.find_birthdays()
+        """
+        index = {}
+        for i, key in enumerate(zip(self.months, self.days)):
+            calendar_type = 'b' if self.is_lunar(i) else 'a'
+            index.setdefault((calendar_type,) + key, []).append(i)
+        return index
+
+    def _lunar_mask(self):
+        bits = np.frombuffer(bytes(self._lunar_bits), dtype=np.uint8)
+        return np.unpackbits(bits, bitorder='little')[:len(self)].astype(bool)
+
+    def birthdays_on(self, clock):
+        """
+        查找今天过生日的行号
+
+        参数:
+            clock: RunClock 对象，提供今天的公历和农历日期
+
+        返回:
+            行号列表（按名册顺序）
+        """
+        today, lunar_today = clock.today, clock.lunar_today
+        if np is not None:
+            months = np.frombuffer(self.months, dtype=np.uint8)
+            days = np.frombuffer(self.days, dtype=np.uint8)
+            lunar = self._lunar_mask()
+            mask = ((~lunar & (months == today.month) & (days == today.day))
+                    | (lunar & (months == lunar_today.month) & np.isin(days, clock.lunar_days)))
+            return np.flatnonzero(mask).tolist()
+
+        solar_keys = {(today.month, today.day)}
+        lunar_keys = {(lunar_today.month, day) for day in clock.lunar_days}
+        return [i for i, key in enumerate(zip(self.months, self.days))
+                if key in (lunar_keys if self.is_lunar(i) else solar_keys)]
+
+    def upcoming(self, today, days):
+        """
+        查询从 today 起 days 天内（含当天）过生日的人
+
+        返回:
+            [(公历日期, BirthdayRecord), ...]，按日期排序，见 occurrences.UpcomingIndex.window()
+        """
+        from occurrences import UpcomingIndex  # 近期生日查询
+        return [(occurrence, self[row]) for occurrence, row in UpcomingIndex(self, today).window(days)]
+
+    def ages(self, clock):
+        """
+        计算所有人今天的年龄
+
+        参数:
+            clock: RunClock 对象
+
+        返回:
+            与名册等长的年龄序列（有 NumPy 时为 ndarray），无年份或无法计算的为-1
+        """
+        today = clock.today
+        today_md = today.month * 32 + today.day
+        if np is not None:
+            birth_years = np.frombuffer(self.birth_years, dtype=np.uint16).astype(np.int32)
+            birth_md = np.frombuffer(self.birth_md, dtype=np.uint16)
+            ages = today.year - birth_years - (today_md < birth_md)
+            ages[birth_years == 0] = -1
+            return ages
+
+        return array('h', (today.year - year - (today_md < md) if year else -1
+                           for year, md in zip(self.birth_years, self.birth_md)))
+
+
+def _file_digest(filename):
+    """计算文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_snapshot(snapshot_path):
+    """读取快照头，返回 (快照信息, 读取数据的函数)；快照不存在或损坏时返回 (None, None)"""
+    try:
+        with open(snapshot_path, 'rb') as file:
+            header = pickle.load(file)
+            offset = file.tell()
+        if not isinstance(header, dict) or header.get('version') != SNAPSHOT_VERSION:
+            return None, None
+    except Exception:
+        return None, None
+
+    def load_payload():
+        with open(snapshot_path, 'rb') as file:
+            file.seek(offset)
+            return pickle.load(file)
+    return header, load_payload
+
+
+def _write_snapshot(snapshot_path, header, payload):
+    """写入快照（先写临时文件再替换，避免中途失败留下损坏的快照）"""
+    temp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'wb') as file:
+            pickle.dump(header, file, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(payload, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, snapshot_path)
+    except OSError as e:
+        get_log().warning(f"无法写入解析快照 {snapshot_path}: {e}",
+                          event='snapshot_write_failed', path=snapshot_path)
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def load_roster(filename, errors=None, use_cache=True, workers=None):
+    """
+    读取生日名册并构建日期索引，优先使用文件旁边的解析快照
+
+    快照以文件大小、修改时间和内容哈希为键：大小和修改时间都没变时直接使用；
+    修改时间变了（例如重新 checkout）但内容哈希相同时也直接使用，并更新快照；
+    内容有变化时重新解析并覆盖快照。
+
+    参数:
+        filename: 包含生日数据的文件名
+        errors: 可选列表，用于收集格式不正确的行 (行号, 内容)
+        use_cache: 为False时不读也不写快照
+        workers: 需要重新解析时的进程数，为None时使用环境变量 PARSE_WORKERS 或 CPU 核数
+                 （小文件总是逐行解析，见 parallel_load.read_roster()）
+
+    返回:
+        (RosterColumns 名册, RosterColumns.build_index() 生成的索引)
+    """
+    from parallel_load import read_roster  # 大文件多进程并行解析
+
+    if not use_cache:
+        roster = read_roster(filename, errors, workers)
+        return roster, roster.build_index()
+
+    snapshot_path = filename + SNAPSHOT_SUFFIX
+    stat = os.stat(filename)
+    header, load_payload = _read_snapshot(snapshot_path)
+    digest = None
+    if header is not None and header['size'] == stat.st_size:
+        if header['mtime_ns'] == stat.st_mtime_ns:
+            digest = header['sha256']
+        else:
+            digest = _file_digest(filename)
+
+    if digest is not None and digest == header['sha256']:
+        try:
+            roster, index, bad_lines = load_payload()
+        except Exception:
+            pass  # 快照损坏，重新解析
+        else:
+            for line_no, line in bad_lines:
+                get_log().warning(f"跳过格式不正确的行 (第{line_no}行): {line}",
+                                  event='bad_line', line_no=line_no, line=line)
+            if errors is not None:
+                errors.extend(bad_lines)
+            if header['mtime_ns'] != stat.st_mtime_ns:  # 内容未变，只更新修改时间
+                header['mtime_ns'] = stat.st_mtime_ns
+                _write_snapshot(snapshot_path, header, (roster, index, bad_lines))
+            return roster, index
+
+    if digest is None:
+        digest = _file_digest(filename)
+    bad_lines = []
+    roster = read_roster(filename, bad_lines, workers)
+    index = roster.build_index()
+    if errors is not None:
+        errors.extend(bad_lines)
+    header = {
+        'version': SNAPSHOT_VERSION,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': digest,
+    }
+    _write_snapshot(snapshot_path, header, (roster, index, bad_lines))
+    return roster, index
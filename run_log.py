@@ -0,0 +1,149 @@
+# 生日提醒系统 - 运行日志：输出级别、缓冲输出和 JSON Lines 结构化日志
+# 项目在https://github.com/inkcoo/birthdays_reminder开源免费
+#
+# 三个输出级别（命令行参数 --quiet / --summary / --verbose）:
+#     QUIET      只输出警告和错误
+#     SUMMARY    默认，输出运行概况、今日生日总结和投递结果
+#     VERBOSE    另外输出每条不是今天生日的记录、每封邮件等细节
+# 日志先放在内存缓冲区中，攒满一批、遇到错误或程序结束时才一次性写出，
+# 而不是每条记录都写一次标准输出。
+#
+# 带事件名（event）的记录是结构化日志，可另外写入 JSON Lines 文件（--log-json 文件名），
+# 每行一个 JSON 对象: {"time": ..., "level": ..., "event": ..., "message": ..., 其他字段}
+# JSON 文件至少记录 SUMMARY 级别，--quiet 只减少控制台输出。
+# 不带事件名的记录（分隔线、标题等）只输出到控制台。
+#
+# 本模块不使用标准库 logging：导入 logging 要十几毫秒，会超出每日提醒的启动预算
+# （见 benchmarks/check_startup.py），这里只需要级别过滤和缓冲两项功能。
+import sys  # 用于写标准输出
+import time  # 用于记录时间戳
+import atexit  # 用于程序结束时写出缓冲区
+import threading  # 并发发送邮件时多个线程同时写日志
+from datetime import datetime
+
+QUIET, SUMMARY, VERBOSE = 0, 1, 2
+
+# 记录级别: (名称, 需要的最低输出级别)
+DETAIL = ('detail', VERBOSE)
+INFO = ('info', SUMMARY)
+WARNING = ('warning', QUIET)
+ERROR = ('error', QUIET)
+
+
+class RunLog:
+    """
+    带缓冲的运行日志
+
+    参数:
+        verbosity: 输出级别 QUIET / SUMMARY / VERBOSE
+        json_path: 可选，结构化日志（JSON Lines）文件路径，追加写入
+        stream: 控制台输出流，默认为标准输出
+        capacity: 缓冲区攒够多少条记录写出一次
+    """
+
+    def __init__(self, verbosity=SUMMARY, json_path=None, stream=None, capacity=512):
+        self.verbosity = verbosity
+        self.json_path = json_path
+        self.json_verbosity = max(verbosity, SUMMARY)
+        self.stream = stream
+        self.capacity = capacity
+        self._lines = []  # 待写出的控制台文本
+        self._records = []  # 待写出的结构化记录
+        self._lock = threading.Lock()
+
+    def enabled(self, verbosity):
+        """控制台或 JSON 文件是否会输出该级别的记录（用于跳过不必要的格式化）"""
+        return verbosity <= self.verbosity or (self.json_path is not None and verbosity <= self.json_verbosity)
+
+    def detail(self, message, event=None, **fields):
+        """细节（仅 --verbose），如每条不是今天生日的记录"""
+        self._emit(DETAIL, message, event, fields)
+
+    def info(self, message, event=None, **fields):
+        """运行概况"""
+        self._emit(INFO, message, event, fields)
+
+    def warning(self, message, event=None, **fields):
+        """警告，--quiet 时也输出"""
+        self._emit(WARNING, message, event, fields)
+
+    def error(self, message, event=None, **fields):
+        """错误，--quiet 时也输出"""
+        self._emit(ERROR, message, event, fields)
+
+    def _emit(self, level, message, event, fields):
+        name, verbosity = level
+        to_console = verbosity <= self.verbosity
+        to_json = event is not None and self.json_path is not None and verbosity <= self.json_verbosity
+        if not (to_console or to_json):
+            return
+        with self._lock:
+            if to_console:
+                self._lines.append(message)
+            if to_json:
+                self._records.append((time.time(), name, event, message, fields))
+            full = len(self._lines) + len(self._records) >= self.capacity
+        if full or level is ERROR:  # 错误立即写出，以免与异常信息错位
+            self.flush()
+
+    def flush(self):
+        """写出缓冲区中的全部记录"""
+        with self._lock:
+            lines, self._lines = self._lines, []
+            records, self._records = self._records, []
+        if lines:
+            stream = self.stream or sys.stdout
+            stream.write('\n'.join(lines) + '\n')
+            stream.flush()
+        if records:
+            import json  # 只在需要结构化日志时导入
+            from birthday_core import BEIJING_TZ  # birthday_core 也使用本模块，在这里才导入
+            chunks = []
+            for created, name, event, message, fields in records:
+                record = {'time': datetime.fromtimestamp(created, BEIJING_TZ).isoformat(timespec='milliseconds'),
+                          'level': name, 'event': event, 'message': message}
+                record.update(fields)
+                chunks.append(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+            with open(self.json_path, 'a', encoding='utf-8') as file:
+                file.write(''.join(chunks))
+
+
+_log = RunLog()
+atexit.register(lambda: _log.flush())
+
+
+def get_log():
+    """返回当前进程的运行日志（未调用 configure() 时为 SUMMARY 级别、只输出到控制台）"""
+    return _log
+
+
+def configure(verbosity=SUMMARY, json_path=None, stream=None):
+    """
+    设置当前进程的运行日志
+
+    参数:
+        verbosity: 输出级别 QUIET / SUMMARY / VERBOSE
+        json_path: 可选，结构化日志（JSON Lines）文件路径
+        stream: 可选，控制台输出流，默认为标准输出
+
+    返回:
+        新的 RunLog 对象
+    """
+    global _log
+    _log.flush()
+    _log = RunLog(verbosity, json_path, stream)
+    return _log
+
+
+def add_arguments(parser):
+    """为命令行解析器添加 --quiet / --summary / --verbose / --log-json 参数"""
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('-q', '--quiet', dest='verbosity', action='store_const', const=QUIET,
+                       help="只输出警告和错误")
+    group.add_argument('--summary', dest='verbosity', action='store_const', const=SUMMARY,
+                       help="输出运行概况和今日生日总结（默认）")
+    group.add_argument('-v', '--verbose', dest='verbosity', action='store_const', const=VERBOSE,
+                       help="另外输出每条不是今天生日的记录和每封邮件的投递结果")
+    parser.set_defaults(verbosity=SUMMARY)
+    parser.add_argument('--log-json', metavar='FILE',
+                        help="把结构化日志以 JSON Lines 格式追加写入该文件")
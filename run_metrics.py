@@ -0,0 +1,202 @@
+# 生日提醒系统 - 运行指标：分阶段计时、记录数和峰值内存
+# 项目在https://github.com/inkcoo/birthdays_reminder开源免费
+#
+# 每次运行按阶段累计耗时和处理条数:
+#     load            读取/解析生日列表（或载入生日日历、解析快照）
+#     match           查找今天（或未来 N 天）过生日的人
+#     format          生成显示文字（计算年龄、农历换算）
+#     render          渲染邮件正文
+#     smtp_connect    建立 SMTP 连接（含 SSL/STARTTLS 握手）
+#     smtp_login      登录邮箱
+#     smtp_send       发送邮件（每位收件人一次）
+#     deliver         投递全部邮件（并发，包含上面三项）
+# 运行结束时可写入 JSON 文件（--metrics 文件名）和 Prometheus textfile collector
+# 文件（--prometheus 文件名，由 node_exporter 读取），便于判断一次运行慢在名册太大、
+# 农历换算还是 SMTP 握手，并据此告警。
+import os  # 用于写文件
+import sys  # 用于判断操作系统
+import time  # 用于计时
+import threading  # SMTP 计时来自多个发送线程
+from run_log import get_log
+
+# 导出到 Prometheus 的指标名前缀
+METRIC_PREFIX = 'birthday_reminder'
+
+# 常用数值的说明（Prometheus 的 HELP）
+VALUE_HELP = {
+    'rosters': "名册数（批量模式）",
+    'records': "生日记录数",
+    'birthdays_today': "今天过生日的人数",
+    'birthdays_upcoming': "未来 N 天过生日的人数",
+    'mails_sent': "发送成功的邮件数",
+    'mails_failed': "发送失败的邮件数",
+    'mails_skipped': "今天已发送过而跳过的邮件数",
+    'exit_code': "退出代码",
+}
+
+
+def peak_memory_bytes():
+    """返回本进程的峰值常驻内存（字节），无法获取时返回None"""
+    try:
+        import resource  # Windows 没有 resource 模块
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # Linux 的单位是 KB，macOS 是字节
+
+
+class _Phase:
+    """RunMetrics.phase() 返回的计时器，用于 with 语句"""
+
+    def __init__(self, metrics, name, count):
+        self.metrics = metrics
+        self.name = name
+        self.count = count
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.metrics.add(self.name, time.perf_counter() - self.started, self.count)
+
+
+class RunMetrics:
+    """
+    一次运行的指标
+
+    用法:
+        metrics = RunMetrics()
+        with metrics.phase('load') as phase:
+            birthdays = read_birthdays('birthdays.txt')
+            phase.count = len(birthdays)
+        metrics.set('birthdays_today', 3)
+        metrics.write_json('metrics.json')
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self._started = time.perf_counter()
+        self.phases = {}  # 阶段名 -> [累计秒数, 处理条数, 次数]
+        self.values = {}  # 其他数值，如记录数、发送成功/失败的邮件数
+        self.labels = {}  # 附加标签，如运行模式、日期
+        self._lock = threading.Lock()
+
+    def phase(self, name, count=0):
+        """对一个阶段计时，with 块内可修改返回对象的 count 记录处理条数"""
+        return _Phase(self, name, count)
+
+    def add(self, name, seconds, count=0):
+        """累加一个阶段的耗时和处理条数（线程安全）"""
+        with self._lock:
+            entry = self.phases.setdefault(name, [0.0, 0, 0])
+            entry[0] += seconds
+            entry[1] += count
+            entry[2] += 1
+
+    def set(self, name, value):
+        """记录一个数值"""
+        self.values[name] = value
+
+    def to_dict(self):
+        """返回全部指标（JSON 可序列化）"""
+        return {
+            'started': self.started,
+            'duration_seconds': round(time.perf_counter() - self._started, 6),
+            'peak_memory_bytes': peak_memory_bytes(),
+            'labels': dict(self.labels),
+            'values': dict(self.values),
+            'phases': {name: {'seconds': round(seconds, 6), 'count': count, 'calls': calls}
+                       for name, (seconds, count, calls) in self.phases.items()},
+        }
+
+    def summary(self):
+        """返回一行文字摘要，如 “运行时长 0.52秒 (load 0.10秒/1000条, smtp_connect 0.31秒) 峰值内存 35.2MB”"""
+        data = self.to_dict()
+        parts = []
+        for name, phase in data['phases'].items():
+            parts.append(f"{name} {phase['seconds']:.2f}秒" + (f"/{phase['count']}条" if phase['count'] else ''))
+        text = f"运行时长 {data['duration_seconds']:.2f}秒"
+        if parts:
+            text += f" ({', '.join(parts)})"
+        if data['peak_memory_bytes']:
+            text += f" 峰值内存 {data['peak_memory_bytes'] / 1048576:.1f}MB"
+        return text
+
+    def write_json(self, path):
+        """把指标写入 JSON 文件（先写临时文件再替换，读取方不会读到一半）"""
+        import json  # 只在导出指标时导入
+        _write_atomic(path, json.dumps(self.to_dict(), ensure_ascii=False, indent=2) + '\n')
+
+    def write_prometheus(self, path):
+        """按 Prometheus textfile collector 的格式写入指标（文件名应以 .prom 结尾）"""
+        data = self.to_dict()
+        labels = ''.join(f',{key}="{_escape_label(value)}"' for key, value in sorted(self.labels.items()))
+        lines = [
+            f"# HELP {METRIC_PREFIX}_phase_seconds 各阶段累计耗时（秒）",
+            f"# TYPE {METRIC_PREFIX}_phase_seconds gauge",
+        ]
+        for name, phase in data['phases'].items():
+            lines.append(f'{METRIC_PREFIX}_phase_seconds{{phase="{name}"{labels}}} {phase["seconds"]}')
+        lines += [
+            f"# HELP {METRIC_PREFIX}_phase_items 各阶段处理条数",
+            f"# TYPE {METRIC_PREFIX}_phase_items gauge",
+        ]
+        for name, phase in data['phases'].items():
+            lines.append(f'{METRIC_PREFIX}_phase_items{{phase="{name}"{labels}}} {phase["count"]}')
+        plain = '{' + labels[1:] + '}' if labels else ''
+        gauges = [('duration_seconds', data['duration_seconds'], "本次运行总耗时（秒）"),
+                  ('last_run_timestamp_seconds', round(self.started, 3), "本次运行开始时间（Unix 时间戳）")]
+        if data['peak_memory_bytes'] is not None:
+            gauges.append(('peak_memory_bytes', data['peak_memory_bytes'], "峰值常驻内存（字节）"))
+        gauges += [(name, value, VALUE_HELP.get(name, name)) for name, value in sorted(data['values'].items())
+                   if isinstance(value, (int, float)) and not isinstance(value, bool)]
+        for name, value, help_text in gauges:
+            lines += [f"# HELP {METRIC_PREFIX}_{name} {help_text}",
+                      f"# TYPE {METRIC_PREFIX}_{name} gauge",
+                      f"{METRIC_PREFIX}_{name}{plain} {value}"]
+        _write_atomic(path, '\n'.join(lines) + '\n')
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _write_atomic(path, text):
+    temp_path = f"{path}.tmp{os.getpid()}"
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        file.write(text)
+    os.replace(temp_path, path)
+
+
+_metrics = RunMetrics()
+
+
+def get_metrics():
+    """返回当前运行的指标（邮件模块等在这里记录 SMTP 耗时）"""
+    return _metrics
+
+
+def reset():
+    """开始新的一次运行（常驻进程每次提醒前调用），返回新的 RunMetrics"""
+    global _metrics
+    _metrics = RunMetrics()
+    return _metrics
+
+
+def add_arguments(parser):
+    """为命令行解析器添加 --metrics / --prometheus 参数"""
+    parser.add_argument('--metrics', metavar='FILE', help="把本次运行的分阶段耗时、记录数和峰值内存写入 JSON 文件")
+    parser.add_argument('--prometheus', metavar='FILE',
+                        help="同时写入 Prometheus textfile collector 格式的指标文件（如 birthday_reminder.prom）")
+
+
+def export(metrics, args):
+    """按命令行参数导出指标，导出失败只提示不影响退出代码"""
+    for path, write in ((args.metrics, metrics.write_json), (args.prometheus, metrics.write_prometheus)):
+        if not path:
+            continue
+        try:
+            write(path)
+        except OSError as e:
+            get_log().warning(f"无法写入运行指标 {path}: {e}", event='metrics_write_failed', path=path)
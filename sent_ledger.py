@@ -0,0 +1,153 @@
+# 生日提醒系统 - 发送记录：重新运行或重试时不重复发送
+# 项目在https://github.com/inkcoo/birthdays_reminder开源免费
+#
+# GitHub Actions 任务重新运行、当天手动触发 workflow_dispatch，或部分邮件发送失败后重试时，
+# 原先会把所有提醒邮件再发一遍。这里把每封发送成功的邮件按
+#     (提醒日期, 名册, 收件人, 生日记录)
+# 逐条追加到 SQLite 数据库（默认 sent_ledger.db，可用环境变量 SENT_LEDGER 或 --ledger 指定），
+# 发送前先一次读出当天已发送的记录放入集合，每人每位收件人的检查都是 O(1)：
+# 收件人的生日已全部发送过时跳过整封邮件，只发过一部分时只发送还没有发过的人。
+#
+# 记录只追加不修改；--no-ledger 可在需要时强制全部重新发送。
+import os  # 用于访问环境变量
+from run_log import get_log
+from run_metrics import get_metrics
+
+DEFAULT_LEDGER = 'sent_ledger.db'
+DEFAULT_ROSTER = 'birthdays.txt'  # 单名册运行时的名册名称
+UPCOMING_SUFFIX = '#upcoming'  # 近期生日摘要与当天提醒分开记录
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sent (
+    day TEXT NOT NULL,
+    roster TEXT NOT NULL,
+    recipient TEXT NOT NULL,
+    person TEXT NOT NULL,
+    sent_at TEXT NOT NULL DEFAULT (datetime('now')),
+    PRIMARY KEY (day, roster, recipient, person)
+) WITHOUT ROWID
+"""
+_INSERT = "INSERT OR IGNORE INTO sent (day, roster, recipient, person) VALUES (?, ?, ?, ?)"
+
+
+def person_key(birthday):
+    """生日记录在发送记录中的键：记录的全部字段，如 “张三|1990|10|12|a|技术部”"""
+    return '|'.join('' if value is None else str(value) for value in birthday)
+
+
+def occurrence_key(item):
+    """近期生日摘要中 (公历日期, 生日记录) 的键，同一人在不同日期过生日算作不同的记录"""
+    occurrence, birthday = item
+    return f"{occurrence.isoformat()}|{person_key(birthday)}"
+
+
+class SentLedger:
+    """
+    已发送邮件的记录
+
+    参数:
+        path: SQLite 数据库文件，不存在时自动创建
+
+    用法:
+        ledger = SentLedger('sent_ledger.db')
+        recipients = ledger.pending(clock.today, 'birthdays.txt', recipients)   # 去掉已发送的
+        results = deliver([Message(email, *build_email(birthdays, clock)) for email, birthdays in recipients.items()])
+        ledger.record_results(clock.today, 'birthdays.txt', recipients, results)
+    """
+
+    def __init__(self, path):
+        import sqlite3  # 只在发送邮件时导入
+        self.path = path
+        self._db = sqlite3.connect(path)
+        with self._db:
+            self._db.execute(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self._db.close()
+
+    def sent_on(self, day, roster):
+        """返回 day（datetime.date）当天该名册已发送的 {(收件人, 记录的键), ...}"""
+        rows = self._db.execute("SELECT recipient, person FROM sent WHERE day = ? AND roster = ?",
+                                (day.isoformat(), roster))
+        return set(rows)
+
+    def pending(self, day, roster, recipients, key=person_key):
+        """
+        去掉已发送过的生日
+
+        参数:
+            day: 提醒日期（datetime.date）
+            roster: 名册名称
+            recipients: {收件人邮箱: [生日记录, ...]}
+            key: 从列表元素取记录键的函数，默认 person_key
+
+        返回:
+            {收件人邮箱: [还没有发送过的元素, ...]}，已全部发送过的收件人不再出现
+        """
+        sent = self.sent_on(day, roster)
+        if not sent:
+            return recipients
+        remaining = {}
+        skipped = partial = 0
+        for email, items in recipients.items():
+            items_left = [item for item in items if (email, key(item)) not in sent]
+            if not items_left:
+                skipped += 1
+                continue
+            remaining[email] = items_left
+            partial += len(items_left) != len(items)
+        if skipped or partial:
+            get_log().info(f"发送记录: {skipped} 封邮件今天已发送过，跳过；{partial} 封只发送还没有发过的生日",
+                           event='ledger_skip', roster=roster, skipped=skipped, partial=partial)
+        metrics = get_metrics()
+        metrics.set('mails_skipped', metrics.values.get('mails_skipped', 0) + skipped)  # 批量模式按名册累加
+        return remaining
+
+    def record_results(self, day, roster, recipients, results, key=person_key):
+        """
+        按投递结果记录发送成功的邮件
+
+        参数:
+            recipients: 生成邮件时使用的 {收件人邮箱: [元素, ...]}，顺序与邮件相同
+            results: deliver() 返回的 DeliveryResult 列表
+        """
+        self._insert([(day.isoformat(), roster, email, key(item))
+                      for (email, items), result in zip(recipients.items(), results) if result.ok
+                      for item in items])
+
+    def record(self, day, roster, recipient, keys):
+        """记录一封发送成功的邮件，keys 为其中各条生日记录的键（发送队列投递时使用）"""
+        self._insert([(day.isoformat(), roster, recipient, key) for key in keys])
+
+    def _insert(self, rows):
+        try:
+            with self._db:
+                self._db.executemany(_INSERT, rows)
+        except Exception as e:  # 邮件已经发出，写入失败只提示
+            get_log().warning(f"无法写入发送记录 {self.path}: {e}", event='ledger_failed', path=self.path)
+
+
+def add_arguments(parser):
+    """为命令行解析器添加 --ledger / --no-ledger 参数"""
+    parser.add_argument('--ledger', metavar='FILE',
+                        help=f"发送记录数据库，默认取环境变量 SENT_LEDGER 或 {DEFAULT_LEDGER}")
+    parser.add_argument('--no-ledger', action='store_true',
+                        help="不检查也不写入发送记录，今天已发送过的邮件也重新发送")
+
+
+def from_args(args):
+    """按命令行参数打开发送记录，--no-ledger 时返回None；无法打开时只提示，不影响发送"""
+    if args.no_ledger:
+        return None
+    path = args.ledger or os.getenv('SENT_LEDGER') or DEFAULT_LEDGER
+    try:
+        return SentLedger(path)
+    except Exception as e:  # sqlite3 的异常类型需要导入后才能引用
+        get_log().warning(f"无法打开发送记录 {path}，本次不检查重复发送: {e}", event='ledger_failed', path=path)
+        return None